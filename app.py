@@ -1,20 +1,45 @@
+import importlib.util
 import os
-import pickle
+import tempfile
+from datetime import datetime, timedelta, timezone
+
 import streamlit as st
 from streamlit_option_menu import option_menu
 from translations import translations
 from flags import get_flag
 
-from database import engine, SessionLocal
-from models import Base
+from database import SessionLocal
+from migrations import ensure_schema
+from tracing import span
+from diagnosis_writer import get_writer, PendingDiagnosis
+from features import (
+    DIABETES_FEATURE_ORDER,
+    DIABETES_DEFAULTS,
+    HEART_FEATURE_ORDER,
+    HEART_DEFAULTS,
+    PARK_FEATURE_ORDER,
+    PARK_DEFAULTS,
+    RESULT_MESSAGE_KEYS,
+    build_feature_vector,
+)
 from crud import (
-    get_diagnoses_by_user_name,
     get_or_create_user,
-    seed_default_diseases,
+    user_cache_key,
     create_diagnosis_with_single_candidate,
-    get_recent_diagnoses,
-    get_diagnoses_by_user_email,
-    delete_diagnosis_by_id
+    create_diagnosis_with_candidates,
+    DiagnosisCandidate,
+    search_diagnoses,
+    delete_diagnosis_by_id,
+    history_next_cursor,
+    get_daily_stats,
+    get_probability_histogram,
+    histogram_percentile,
+    list_symptoms,
+    create_symptom,
+    update_symptom,
+    delete_symptom,
+    get_diagnosis_symptoms,
+    find_diagnoses_by_symptoms,
 )
 
 # ------------------------------------------------------------
@@ -26,26 +51,11 @@ st.set_page_config(
     page_icon="⚕️"
 )
 
-# Crear tablas si no existen
-Base.metadata.create_all(bind=engine)
-
-# Cargar enfermedades base
-with SessionLocal() as db:
-    seed_default_diseases(db)
-
-# ------------------------------------------------------------
-# CARGAR MODELOS DE ML
-# ------------------------------------------------------------
-working_dir = os.path.dirname(os.path.abspath(__file__))
-diabetes_model = pickle.load(
-    open(os.path.join(working_dir, "saved_models", "diabetes_model.sav"), "rb")
-)
-heart_disease_model = pickle.load(
-    open(os.path.join(working_dir, "saved_models", "heart_disease_model.sav"), "rb")
-)
-parkinsons_model = pickle.load(
-    open(os.path.join(working_dir, "saved_models", "parkinsons_model.sav"), "rb")
-)
+# Conexión, tablas e índices y enfermedades base: solo la primera vez por proceso
+db_ok, db_error = ensure_schema()
+if not db_ok:
+    st.error(f"❌ No se pudo conectar a la base de datos: {db_error}")
+    st.stop()
 
 # ------------------------------------------------------------
 # SIDEBAR DE NAVEGACIÓN
@@ -71,13 +81,24 @@ with st.sidebar:
             t["diabetes_prediction"],
             t["heart_disease_prediction"],
             t["parkinsons_prediction"],
+            t["full_panel"],
             t["history"],  # NUEVO: opción de historial
+            t["symptoms"],
+            t["dashboard"],
         ],
         menu_icon="hospital-fill",
-        icons=["activity", "heart", "person", "clock-history"],
+        icons=["activity", "heart", "person", "clipboard2-pulse", "clock-history",
+               "thermometer-half", "bar-chart"],
         default_index=0
     )
 
+    # Estado del escritor en segundo plano
+    writer = get_writer()
+    if writer.backlog():
+        st.caption(f"⏳ Diagnósticos pendientes por guardar: {writer.backlog()}")
+    if writer.failed:
+        st.warning(f"⚠️ {writer.failed} diagnósticos no se pudieron guardar: {writer.last_error}")
+
 # ------------------------------------------------------------
 # FORMULARIO DE PACIENTE (REGISTRO EN BD)
 # ------------------------------------------------------------
@@ -121,39 +142,119 @@ with col_u5:
         help="Género registrado en la historia clínica (M: masculino, F: femenino, O: otro)."
     )
 
+@st.cache_data(ttl=300, show_spinner=False)
+def load_symptom_catalog() -> list:
+    """
+    Nombres del catálogo de síntomas. Streamlit re-ejecuta app.py en cada
+    interacción: se consulta una vez y se reutiliza hasta que esta app lo
+    modifique (ver la página de síntomas) o pasen 5 minutos (cambios hechos
+    por otros procesos, como seed_dummy_data.py --symptoms).
+    """
+    with SessionLocal() as db:
+        return [symptom.name for symptom in list_symptoms(db)]
+
+
+symptom_catalog = load_symptom_catalog()
+user_symptoms = st.multiselect(
+    "Síntomas (opcional)",
+    options=symptom_catalog,
+    help="Síntomas que refiere el paciente. Se guardan junto con el diagnóstico; "
+         "el catálogo se administra en la página de síntomas."
+)
+
 # ------------------------------------------------------------
-# FUNCIÓN AUXILIAR PARA GUARDAR RESULTADOS
+# FUNCIONES AUXILIARES: PREDECIR Y GUARDAR RESULTADOS
 # ------------------------------------------------------------
-def save_diagnosis(disease_code: str, prediction_result, message: str):
-    """Guarda un diagnóstico en la base de datos."""
+def predict(disease_code: str, user_input):
+    """Puntúa una fila con el modelo de la enfermedad. Retorna (label, probability, model_hash)."""
+    # Import diferido: NumPy, sklearn y el modelo solo se cargan al predecir,
+    # nunca en el arranque ni en la página de historial
+    with span("app.predict", disease=disease_code):
+        from inference_executor import get_executor
+        return get_executor().submit_one(disease_code, user_input).result()
+
+
+def predict_panel(inputs: dict) -> dict:
+    """
+    Puntúa varias enfermedades a la vez: {código: vector} -> {código:
+    (label, probability, model_hash)}. Los modelos corren a la vez: en el pool
+    de procesos con INFERENCE_WORKERS > 0 y en hilos de este proceso si no.
+    """
+    with span("app.predict", disease="PANEL"):
+        from inference_executor import get_executor
+        futures = get_executor().submit_panel(inputs)
+        return {code: future.result() for code, future in futures.items()}
+
+
+def _pending_diagnosis(**fields):
+    """
+    PendingDiagnosis con los datos del paciente del formulario. Los ids de
+    pacientes ya resueltos en esta sesión (los deja el escritor al guardar)
+    evitan buscar otra vez al mismo paciente en las siguientes predicciones.
+    """
+    user_ids = st.session_state.setdefault("user_ids", {})
+    email = user_email or None
+    age = int(user_age) if user_age is not None else None
+    phone_number = user_phone or None
+    cache_key = user_cache_key(user_name, email, age, user_gender, phone_number)
+    return PendingDiagnosis(
+        name=user_name,
+        email=email,
+        age=age,
+        gender=user_gender,
+        phone_number=phone_number,
+        user_id=user_ids.get(cache_key),
+        user_cache=user_ids,
+        symptoms=tuple(user_symptoms),
+        **fields,
+    ), cache_key
+
+
+def _store_diagnosis(pending: PendingDiagnosis, cache_key: str):
+    """
+    Encola el diagnóstico para que el escritor en segundo plano lo guarde, sin
+    esperar a la base de datos. Si la cola está llena se guarda de inmediato.
+    """
+    with span("app.save", mode="queued"):
+        queued = get_writer().submit(pending)
+    if queued:
+        st.success("✅ Diagnóstico enviado para guardarse en la base de datos.")
+        return
+
     db = SessionLocal()
     try:
-        user = get_or_create_user(
+        user_id = pending.user_id or get_or_create_user(
             db,
-            name=user_name,
-            email=user_email or None,
-            age=int(user_age) if user_age is not None else None,
-            gender=user_gender,
-            phone_number=user_phone or None,
-        )
-
-        if hasattr(prediction_result["model"], "predict_proba"):
-            probas = prediction_result["model"].predict_proba(
-                [prediction_result["input"]]
-            )[0]
-            positive_proba = float(probas[1])
+            name=pending.name,
+            email=pending.email,
+            age=pending.age,
+            gender=pending.gender,
+            phone_number=pending.phone_number,
+        ).id
+
+        if pending.candidates:
+            create_diagnosis_with_candidates(
+                db=db,
+                user_id=user_id,
+                candidates=pending.candidates,
+                final_description=pending.description,
+                symptoms=pending.symptoms,
+            )
         else:
-            positive_proba = 1.0 if prediction_result["value"] == 1 else 0.0
-
-        create_diagnosis_with_single_candidate(
-            db=db,
-            user_id=user.id,
-            disease_code=disease_code,
-            probability=positive_proba,
-            final_description=message,
-        )
+            create_diagnosis_with_single_candidate(
+                db=db,
+                user_id=user_id,
+                disease_code=pending.disease_code,
+                probability=pending.probability,
+                final_description=pending.description,
+                features=pending.features,
+                model_hash=pending.model_hash,
+                symptoms=pending.symptoms,
+            )
 
-        db.commit()
+        with span("db.commit"):
+            db.commit()
+        pending.user_cache[cache_key] = user_id
         st.success("✅ Diagnóstico guardado correctamente en la base de datos.")
     except Exception as e:
         db.rollback()
@@ -161,77 +262,27 @@ def save_diagnosis(disease_code: str, prediction_result, message: str):
     finally:
         db.close()
 
-# ------------------------------------------------------------
-# CONFIGURACIÓN DE CAMPOS Y VALORES POR DEFECTO
-# ------------------------------------------------------------
 
-# Diabetes: orden estándar Pima
-DIABETES_FEATURE_ORDER = [
-    "Pregnancies",
-    "Glucose",
-    "BloodPressure",
-    "SkinThickness",
-    "Insulin",
-    "BMI",
-    "DiabetesPedigreeFunction",
-    "Age",
-]
-
-DIABETES_DEFAULTS = {
-    "Pregnancies": 0.0,
-    "SkinThickness": 20.0,
-    "Insulin": 80.0,
-    "DiabetesPedigreeFunction": 0.5,
-}
-
-# Heart disease: orden estándar UCI
-HEART_FEATURE_ORDER = [
-    "age",
-    "sex",
-    "cp",
-    "trestbps",
-    "chol",
-    "fbs",
-    "restecg",
-    "thalach",
-    "exang",
-    "oldpeak",
-    "slope",
-    "ca",
-    "thal",
-]
-
-HEART_DEFAULTS = {
-    "fbs": 0.0,
-    "restecg": 0.0,
-    "slope": 1.0,
-    "thal": 2.0,
-}
-
-# Parkinson: 22 características originales
-PARK_FEATURE_ORDER = [
-    "fo", "fhi", "flo", "jitter_percent", "jitter_abs",
-    "RAP", "PPQ", "DDP", "shimmer", "shimmer_dB",
-    "APQ3", "APQ5", "APQ", "DDA", "NHR", "HNR",
-    "RPDE", "DFA", "spread1", "spread2", "D2", "PPE",
-]
-
-PARK_DEFAULTS = {
-    "flo": 100.0,
-    "jitter_abs": 0.0001,
-    "RAP": 0.003,
-    "PPQ": 0.003,
-    "DDP": 0.01,
-    "APQ3": 0.015,
-    "APQ5": 0.02,
-    "APQ": 0.025,
-    "DDA": 0.04,
-    "RPDE": 0.5,
-    "DFA": 0.75,
-    "spread1": -5.0,
-    "spread2": 0.5,
-    "D2": 2.0,
-}
+def save_diagnosis(disease_code: str, probability: float, message: str,
+                   features=None, model_hash: str = None):
+    """Guarda el resultado de una enfermedad (un diagnóstico con un detalle)."""
+    _store_diagnosis(*_pending_diagnosis(
+        disease_code=disease_code,
+        probability=probability,
+        description=message,
+        features=features,
+        model_hash=model_hash,
+    ))
+
+
+def save_panel(candidates, message: str):
+    """Guarda el panel completo como un solo diagnóstico con un detalle por enfermedad."""
+    _store_diagnosis(*_pending_diagnosis(
+        disease_code=None,
+        probability=None,
+        description=message,
+        candidates=tuple(candidates),
+    ))
 
 # ------------------------------------------------------------
 # BLOQUES DE PREDICCIÓN
@@ -318,9 +369,9 @@ if selected == t["diabetes_prediction"]:
         }
 
         user_input = [features[f] for f in DIABETES_FEATURE_ORDER]
-        diab_prediction = diabetes_model.predict([user_input])
+        diab_prediction, diab_probability, model_hash = predict("DIAB", user_input)
 
-        if diab_prediction[0] == 1:
+        if diab_prediction == 1:
             diab_diagnosis = t["positive_diabetes"]
         else:
             diab_diagnosis = t["negative_diabetes"]
@@ -331,11 +382,7 @@ if selected == t["diabetes_prediction"]:
             "⚠️ Este resultado es orientativo y no sustituye la valoración de un profesional de la salud."
         )
 
-        save_diagnosis(
-            "DIAB",
-            {"model": diabetes_model, "input": user_input, "value": diab_prediction[0]},
-            diab_diagnosis,
-        )
+        save_diagnosis("DIAB", diab_probability, diab_diagnosis, user_input, model_hash)
 
 # ========== HEART DISEASE ==========
 elif selected == t["heart_disease_prediction"]:
@@ -481,9 +528,9 @@ elif selected == t["heart_disease_prediction"]:
         }
 
         user_input = [features[f] for f in HEART_FEATURE_ORDER]
-        heart_prediction = heart_disease_model.predict([user_input])
+        heart_prediction, heart_probability, model_hash = predict("HEART", user_input)
 
-        if heart_prediction[0] == 1:
+        if heart_prediction == 1:
             heart_diagnosis = t["positive_heart"]
         else:
             heart_diagnosis = t["negative_heart"]
@@ -494,11 +541,7 @@ elif selected == t["heart_disease_prediction"]:
             "⚠️ Este resultado es orientativo y no reemplaza el diagnóstico médico profesional."
         )
 
-        save_diagnosis(
-            "HEART",
-            {"model": heart_disease_model, "input": user_input, "value": heart_prediction[0]},
-            heart_diagnosis,
-        )
+        save_diagnosis("HEART", heart_probability, heart_diagnosis, user_input, model_hash)
 
 # ========== PARKINSON ==========
 elif selected == t["parkinsons_prediction"]:
@@ -600,7 +643,7 @@ elif selected == t["parkinsons_prediction"]:
             "PPQ": PARK_DEFAULTS["PPQ"],
             "DDP": PARK_DEFAULTS["DDP"],
             "shimmer": float(shimmer),
-            "shimmer_dB": 0.02,
+            "shimmer_dB": PARK_DEFAULTS["shimmer_dB"],
             "APQ3": PARK_DEFAULTS["APQ3"],
             "APQ5": PARK_DEFAULTS["APQ5"],
             "APQ": PARK_DEFAULTS["APQ"],
@@ -616,9 +659,9 @@ elif selected == t["parkinsons_prediction"]:
         }
 
         user_input = [features[f] for f in PARK_FEATURE_ORDER]
-        parkinsons_prediction = parkinsons_model.predict([user_input])
+        parkinsons_prediction, parkinsons_probability, model_hash = predict("PARK", user_input)
 
-        if parkinsons_prediction[0] == 1:
+        if parkinsons_prediction == 1:
             parkinsons_diagnosis = t["positive_parkinson"]
         else:
             parkinsons_diagnosis = t["negative_parkinson"]
@@ -629,38 +672,204 @@ elif selected == t["parkinsons_prediction"]:
             "⚠️ Este resultado es orientativo y no reemplaza la valoración de un neurólogo."
         )
 
-        save_diagnosis(
-            "PARK",
-            {"model": parkinsons_model, "input": user_input, "value": parkinsons_prediction[0]},
-            parkinsons_diagnosis,
+        save_diagnosis("PARK", parkinsons_probability, parkinsons_diagnosis, user_input, model_hash)
+
+# ========== PANEL COMPLETO ==========
+elif selected == t["full_panel"]:
+    st.title(t["title_full_panel"])
+    st.markdown(t["full_panel_intro"])
+
+    with st.form("panel_form"):
+        age = st.number_input(
+            t["age"],
+            min_value=18,
+            max_value=100,
+            value=min(max(int(user_age), 18), 100),
+            help="Edad del paciente en años (la usan los modelos de diabetes y cardíaco).",
         )
 
+        st.subheader(t["diabetes_prediction"])
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            pregnancies = st.number_input(t["pregnancies"], min_value=0, max_value=20, value=0)
+            glucose = st.number_input(t["glucose_level"], min_value=0, max_value=300, value=110)
+        with col2:
+            blood_pressure = st.number_input(t["blood_pressure"], min_value=0, max_value=200, value=80)
+            bmi = st.number_input(t["bmi"], min_value=10.0, max_value=60.0, value=25.0, step=0.1)
+        with col3:
+            dpf = st.number_input(
+                t["diabetes_pedigree_function"], min_value=0.0, max_value=3.0, value=0.5, step=0.01
+            )
+
+        st.subheader(t["heart_disease_prediction"])
+        if selected_language == "es":
+            sex_label, sex_options = "Sexo biológico", ["Masculino", "Femenino"]
+            cp_label = "Tipo de dolor en el pecho"
+            cp_options = ["0 - Típico anginoso", "1 - Atípico anginoso",
+                          "2 - No anginoso", "3 - Asintomático"]
+            exang_label, exang_options = "Angina inducida por ejercicio", ["No", "Sí"]
+        else:
+            sex_label, sex_options = "Biological sex", ["Male", "Female"]
+            cp_label = "Chest pain type"
+            cp_options = ["0 - Typical angina", "1 - Atypical angina",
+                          "2 - Non-anginal", "3 - Asymptomatic"]
+            exang_label, exang_options = "Exercise induced angina", ["No", "Yes"]
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            sex_str = st.selectbox(sex_label, options=sex_options)
+            cp_str = st.selectbox(cp_label, options=cp_options)
+            exang_str = st.selectbox(exang_label, options=exang_options)
+        with col2:
+            trestbps = st.number_input(t["trestbps"], min_value=80, max_value=220, value=130)
+            chol = st.number_input(t["chol"], min_value=100, max_value=600, value=220)
+            thalach = st.number_input(t["thalach"], min_value=60, max_value=220, value=150)
+        with col3:
+            oldpeak = st.number_input(t["oldpeak"], min_value=0.0, max_value=10.0, value=1.0, step=0.1)
+            ca = st.number_input(t["ca"], min_value=0, max_value=4, value=0)
+
+        st.subheader(t["parkinsons_prediction"])
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            fo = st.number_input(t["fo"], min_value=50.0, max_value=300.0, value=150.0, step=1.0)
+            fhi = st.number_input(t["fhi"], min_value=50.0, max_value=400.0, value=200.0, step=1.0)
+        with col2:
+            jitter_percent = st.number_input(
+                t["jitter_percent"], min_value=0.0, max_value=1.0, value=0.01, step=0.001
+            )
+            shimmer = st.number_input(t["shimmer"], min_value=0.0, max_value=1.0, value=0.03, step=0.001)
+        with col3:
+            nhr = st.number_input(t["NHR"], min_value=0.0, max_value=1.0, value=0.03, step=0.001)
+            hnr = st.number_input(t["HNR"], min_value=0.0, max_value=50.0, value=20.0, step=0.1)
+        with col4:
+            rpde = st.number_input(t["RPDE"], min_value=0.0, max_value=1.0, value=0.5, step=0.01)
+            ppe = st.number_input(t["PPE"], min_value=0.0, max_value=1.0, value=0.3, step=0.01)
+
+        submit_panel = st.form_submit_button(t["button_full_panel"])
+
+    if submit_panel:
+        # Las características que el formulario no pide salen de *_DEFAULTS
+        inputs = {
+            "DIAB": build_feature_vector("DIAB", {
+                "Pregnancies": pregnancies,
+                "Glucose": glucose,
+                "BloodPressure": blood_pressure,
+                "BMI": bmi,
+                "DiabetesPedigreeFunction": dpf,
+                "Age": age,
+            }),
+            "HEART": build_feature_vector("HEART", {
+                "age": age,
+                "sex": 1.0 if sex_str in ["Masculino", "Male"] else 0.0,
+                "cp": float(cp_str.split(" - ")[0]),
+                "trestbps": trestbps,
+                "chol": chol,
+                "thalach": thalach,
+                "exang": 1.0 if exang_str in ["Sí", "Yes"] else 0.0,
+                "oldpeak": oldpeak,
+                "ca": ca,
+            }),
+            "PARK": build_feature_vector("PARK", {
+                "fo": fo,
+                "fhi": fhi,
+                "jitter_percent": jitter_percent,
+                "shimmer": shimmer,
+                "NHR": nhr,
+                "HNR": hnr,
+                "RPDE": rpde,
+                "PPE": ppe,
+            }),
+        }
+        results = predict_panel(inputs)
+
+        st.markdown("---")
+        candidates = []
+        messages = []
+        for code, (label, probability, model_hash) in results.items():
+            positive_key, negative_key = RESULT_MESSAGE_KEYS[code]
+            message = t[positive_key] if label == 1 else t[negative_key]
+            if label == 1:
+                st.warning(message)
+            else:
+                st.success(message)
+            messages.append(message)
+            candidates.append(DiagnosisCandidate(code, probability, inputs[code], model_hash))
+        st.caption(
+            "⚠️ Estos resultados son orientativos y no sustituyen la valoración de un profesional de la salud."
+        )
+
+        save_panel(candidates, "\n".join(messages))
+
 # ========== HISTORIAL ==========
 elif selected == t["history"]:
     st.title(t["history"])
     st.markdown(t["history_intro"])
 
     with st.form("history_form"):
-        filter_name = st.text_input(t["history_filter_name"])
-        filter_email = st.text_input(t["history_filter_email"])
+        col_f1, col_f2 = st.columns(2)
+        with col_f1:
+            filter_name = st.text_input(t["history_filter_name"])
+        with col_f2:
+            filter_email = st.text_input(t["history_filter_email"])
+
+        col_f3, col_f4, col_f5, col_f6 = st.columns(4)
+        with col_f3:
+            filter_disease = st.selectbox(
+                t["history_filter_disease"],
+                options=["", "DIAB", "HEART", "PARK"],
+                format_func=lambda code: code or t["history_filter_all"],
+            )
+        with col_f4:
+            filter_status = st.selectbox(
+                t["history_filter_status"],
+                options=["", "pending", "confirmed", "discarded"],
+                format_func=lambda status: status or t["history_filter_all"],
+            )
+        with col_f5:
+            filter_date_from = st.date_input(t["history_filter_date_from"], value=None)
+        with col_f6:
+            filter_date_to = st.date_input(t["history_filter_date_to"], value=None)
+
         limit = st.slider(
-            "Número máximo de registros a mostrar",
+            "Número de registros por página",
             min_value=10,
             max_value=200,
             value=50,
             step=10,
-            help="Controla cuántos diagnósticos se muestran en la tabla."
+            help="Controla cuántos diagnósticos se muestran en cada página de la tabla."
         )
         submit_history = st.form_submit_button(t["history_show_button"])
 
+    # Los filtros (combinables) y la pila de cursores (uno por página visitada)
+    # se guardan en la sesión para avanzar/retroceder sin reenviar el formulario.
     if submit_history:
+        st.session_state.history_filters = {
+            "name": filter_name.strip() or None,
+            "email": filter_email.strip() or None,
+            "disease_code": filter_disease or None,
+            "status": filter_status or None,
+            "date_from": datetime.combine(filter_date_from, datetime.min.time()) if filter_date_from else None,
+            # Fecha final inclusiva: hasta el inicio del día siguiente
+            "date_to": (
+                datetime.combine(filter_date_to + timedelta(days=1), datetime.min.time())
+                if filter_date_to else None
+            ),
+        }
+        st.session_state.history_limit = limit
+        st.session_state.history_cursors = [None]
+
+    history_filters = st.session_state.get("history_filters")
+    if history_filters is not None:
+        cursors = st.session_state.history_cursors
+        page_limit = st.session_state.history_limit
+        # Incluir en la consulta los diagnósticos que aún están en la cola
+        get_writer().flush(timeout=5)
         with SessionLocal() as db:
-            if filter_name.strip():
-                rows = get_diagnoses_by_user_name(db, filter_name.strip(), limit=limit)
-            elif filter_email.strip():
-                rows = get_diagnoses_by_user_email(db, filter_email.strip(), limit=limit)
-            else:
-                rows = get_recent_diagnoses(db, limit=limit)
+            rows = search_diagnoses(
+                db, **history_filters, limit=page_limit, cursor=cursors[-1]
+            )
+            symptoms_by_diagnosis = get_diagnosis_symptoms(db, [r.id for r in rows])
+        next_cursor = history_next_cursor(rows, page_limit)
 
         if not rows:
             st.info(t["history_empty"])
@@ -678,10 +887,72 @@ elif selected == t["history"]:
                         "Código": r.disease_code,
                         "Probabilidad": float(r.probability),
                         "Estado": r.status,
+                        t["symptoms"]: ", ".join(symptoms_by_diagnosis.get(r.id, [])),
                     }
                 )
             st.dataframe(data, use_container_width=True)
 
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if st.button(t["history_prev"], disabled=len(cursors) == 1, key="history_prev"):
+                cursors.pop()
+                st.rerun()
+        with col_page:
+            st.caption(f"{t['history_page']} {len(cursors)}")
+        with col_next:
+            if st.button(t["history_next"], disabled=next_cursor is None, key="history_next"):
+                cursors.append(next_cursor)
+                st.rerun()
+
+        # Exportación completa (todas las páginas) con los mismos filtros. Se
+        # escribe por lotes a un archivo temporal; el botón de descarga lo
+        # entrega desde la memoria de este proceso, así que hay un tope de filas
+        # y bytes (history_export.UI_MAX_*) y más allá se indica el comando CLI.
+        export_formats = ["CSV"] + (["Parquet"] if importlib.util.find_spec("pyarrow") else [])
+        col_format, col_export = st.columns([1, 1])
+        with col_format:
+            export_format = st.selectbox(t["history_export_format"], export_formats,
+                                         key="history_export_format")
+        with col_export:
+            st.write("")
+            prepare_export = st.button(t["history_export_button"], key="history_export")
+
+        if prepare_export:
+            from history_export import (
+                ExportTooLarge, UI_MAX_BYTES, UI_MAX_ROWS, cli_command, export_history,
+            )
+
+            suffix = ".parquet" if export_format == "Parquet" else ".csv"
+            file_name = f"historial_{datetime.now():%Y%m%d_%H%M}{suffix}"
+            export_file = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+            export_file.close()
+            try:
+                try:
+                    with SessionLocal() as db:
+                        exported = export_history(db, export_file.name, max_rows=UI_MAX_ROWS,
+                                                  **history_filters)
+                    too_large = os.path.getsize(export_file.name) > UI_MAX_BYTES
+                except ExportTooLarge:
+                    too_large = True
+
+                if too_large:
+                    st.warning(t["history_export_too_large"].format(
+                        rows=f"{UI_MAX_ROWS:,}", mb=UI_MAX_BYTES // (1024 * 1024)))
+                    st.code(cli_command(file_name, **history_filters), language="bash")
+                else:
+                    with open(export_file.name, "rb") as f:
+                        st.download_button(
+                            t["history_export_download"],
+                            data=f,
+                            file_name=file_name,
+                            mime="application/octet-stream" if suffix == ".parquet" else "text/csv",
+                            on_click="ignore",
+                            key="history_download",
+                        )
+                    st.caption(f"{exported} {t['history_export_done']}")
+            finally:
+                os.remove(export_file.name)
+
     ####################
     # PARA BORRAR UN REGISTRO
     ####################
@@ -724,3 +995,212 @@ elif selected == t["history"]:
             if st.button("Cancelar", key="cancel_delete"):
                 st.session_state.delete_id = None
                 st.info("Operación cancelada.")
+
+
+# ========== SÍNTOMAS ==========
+# Las búsquedas por combinación de síntomas las responde el índice invertido
+# en memoria (symptom_index.py), no un JOIN por síntoma.
+elif selected == t["symptoms"]:
+    st.title(t["symptoms"])
+    st.markdown(t["symptoms_intro"])
+
+    st.subheader(t["symptoms_search"])
+    with st.form("symptoms_search_form"):
+        search_symptoms = st.multiselect(t["symptoms_search_select"], options=symptom_catalog)
+        col_s1, col_s2 = st.columns(2)
+        with col_s1:
+            search_days = st.number_input(
+                t["symptoms_search_days"],
+                min_value=0,
+                max_value=3650,
+                value=30,
+                help="0 = sin límite de fecha.",
+            )
+        with col_s2:
+            search_limit = st.slider(t["symptoms_search_limit"], min_value=10, max_value=200,
+                                     value=50, step=10)
+        submit_search = st.form_submit_button(t["symptoms_search_button"])
+
+    if submit_search:
+        if not search_symptoms:
+            st.warning(t["symptoms_search_required"])
+        else:
+            # Incluir los diagnósticos que aún están en la cola
+            get_writer().flush(timeout=5)
+            date_from = (
+                datetime.now(timezone.utc) - timedelta(days=int(search_days))
+                if search_days else None
+            )
+            with SessionLocal() as db:
+                total, rows = find_diagnoses_by_symptoms(
+                    db, search_symptoms, date_from=date_from, limit=search_limit,
+                )
+                symptoms_by_diagnosis = get_diagnosis_symptoms(db, [r.id for r in rows])
+
+            st.caption(f"{total:,} {t['symptoms_search_total']}")
+            if rows:
+                st.dataframe(
+                    [
+                        {
+                            "ID diagnóstico": r.id,
+                            "Fecha / hora": r.generated_at,
+                            "Paciente": r.user_name,
+                            "Enfermedad": r.disease_name,
+                            "Probabilidad": float(r.probability),
+                            "Estado": r.status,
+                            t["symptoms"]: ", ".join(symptoms_by_diagnosis.get(r.id, [])),
+                        }
+                        for r in rows
+                    ],
+                    use_container_width=True,
+                )
+
+    st.markdown("---")
+    st.subheader(t["symptoms_catalog"])
+    with SessionLocal() as db:
+        catalog = list_symptoms(db)
+    if catalog:
+        st.dataframe(
+            [{"ID": s.id, t["symptoms_name"]: s.name, t["symptoms_description"]: s.description}
+             for s in catalog],
+            use_container_width=True,
+        )
+    else:
+        st.info(t["symptoms_empty"])
+
+    with st.form("symptoms_add_form", clear_on_submit=True):
+        col_a1, col_a2 = st.columns([1, 2])
+        with col_a1:
+            new_symptom_name = st.text_input(t["symptoms_name"])
+        with col_a2:
+            new_symptom_description = st.text_input(t["symptoms_description"])
+        submit_add_symptom = st.form_submit_button(t["symptoms_add_button"])
+
+    if submit_add_symptom:
+        with SessionLocal() as db:
+            try:
+                create_symptom(db, new_symptom_name, new_symptom_description)
+                db.commit()
+                load_symptom_catalog.clear()
+                st.rerun()
+            except ValueError as e:
+                db.rollback()
+                st.error(f"❌ {e}")
+
+    if catalog:
+        with st.form("symptoms_edit_form"):
+            edit_symptom = st.selectbox(t["symptoms_edit_select"], options=catalog,
+                                        format_func=lambda s: s.name)
+            col_e1, col_e2 = st.columns([1, 2])
+            with col_e1:
+                edit_name = st.text_input(t["symptoms_new_name"])
+            with col_e2:
+                edit_description = st.text_input(t["symptoms_description"])
+            col_e3, col_e4 = st.columns(2)
+            with col_e3:
+                submit_edit_symptom = st.form_submit_button(t["symptoms_edit_button"])
+            with col_e4:
+                submit_delete_symptom = st.form_submit_button(t["symptoms_delete_button"])
+
+        if submit_edit_symptom or submit_delete_symptom:
+            with SessionLocal() as db:
+                try:
+                    if submit_delete_symptom:
+                        delete_symptom(db, edit_symptom.id)
+                    else:
+                        update_symptom(db, edit_symptom.id, name=edit_name or None,
+                                       description=edit_description or None)
+                    db.commit()
+                    load_symptom_catalog.clear()
+                    st.rerun()
+                except ValueError as e:
+                    db.rollback()
+                    st.error(f"❌ {e}")
+
+
+# ------------------------------------------------------------
+# TABLERO
+# ------------------------------------------------------------
+# Solo lee las tablas daily_* (una fila por día/enfermedad/estado y 100 buckets
+# por día/enfermedad), así el tiempo de carga depende del rango de fechas y no
+# del tamaño del historial.
+elif selected == t["dashboard"]:
+    st.title(t["dashboard"])
+    st.markdown(t["dashboard_intro"])
+
+    today = datetime.now(timezone.utc).date()
+    col_d1, col_d2, col_d3 = st.columns(3)
+    with col_d1:
+        dashboard_from = st.date_input(t["history_filter_date_from"],
+                                       value=today - timedelta(days=29), key="dashboard_from")
+    with col_d2:
+        dashboard_to = st.date_input(t["history_filter_date_to"], value=today, key="dashboard_to")
+    with col_d3:
+        dashboard_disease = st.selectbox(
+            t["history_filter_disease"],
+            options=["", "DIAB", "HEART", "PARK"],
+            format_func=lambda code: code or t["history_filter_all"],
+            key="dashboard_disease",
+        )
+
+    # Incluir los diagnósticos que aún están en la cola
+    get_writer().flush(timeout=5)
+    with SessionLocal() as db:
+        stats = get_daily_stats(db, dashboard_from, dashboard_to, dashboard_disease or None)
+        histograms = get_probability_histogram(db, dashboard_from, dashboard_to,
+                                               dashboard_disease or None)
+
+    if not stats:
+        st.info(t["dashboard_empty"])
+    else:
+        total = sum(r.diagnoses_count for r in stats)
+        probability_sum = sum(r.probability_sum_e4 for r in stats) / 10_000
+        overall = [sum(bucket) for bucket in zip(*histograms.values())]
+
+        col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+        col_m1.metric(t["dashboard_total"], f"{total:,}")
+        col_m2.metric(t["dashboard_avg_probability"], f"{probability_sum / total:.3f}")
+        # Sin histograma para el rango (p. ej. un backfill parcial) no hay percentiles
+        p50, p90 = histogram_percentile(overall, 0.5), histogram_percentile(overall, 0.9)
+        col_m3.metric(t["dashboard_p50"], "—" if p50 is None else f"{p50:.3f}")
+        col_m4.metric(t["dashboard_p90"], "—" if p90 is None else f"{p90:.3f}")
+
+        codes = sorted({r.disease_code for r in stats})
+        per_day = {}
+        per_disease = {}
+        per_status = {}
+        for r in stats:
+            per_day.setdefault(r.day, dict.fromkeys(codes, 0))[r.disease_code] += r.diagnoses_count
+            entry = per_disease.setdefault(r.disease_code, [0, 0])
+            entry[0] += r.diagnoses_count
+            entry[1] += r.probability_sum_e4
+            per_status.setdefault(r.status, dict.fromkeys(codes, 0))[r.disease_code] += r.diagnoses_count
+
+        st.subheader(t["dashboard_per_day"])
+        days = sorted(per_day)
+        st.bar_chart(
+            {"day": days, **{code: [per_day[day][code] for day in days] for code in codes}},
+            x="day",
+            y=codes,
+        )
+
+        st.subheader(t["dashboard_by_disease"])
+        st.dataframe(
+            [
+                {
+                    "Código": code,
+                    t["dashboard_total"]: n,
+                    t["dashboard_avg_probability"]: round(total_e4 / 10_000 / n, 4),
+                    "p50": histogram_percentile(histograms.get(code, []), 0.5),
+                    "p90": histogram_percentile(histograms.get(code, []), 0.9),
+                }
+                for code, (n, total_e4) in sorted(per_disease.items())
+            ],
+            use_container_width=True,
+        )
+
+        st.subheader(t["dashboard_by_status"])
+        st.dataframe(
+            [{"Estado": status, **counts} for status, counts in sorted(per_status.items())],
+            use_container_width=True,
+        )
@@ -0,0 +1,290 @@
+# batch_score.py
+"""
+Puntuación por lotes de pacientes contra los modelos guardados.
+
+Lee un archivo CSV o Parquet por bloques, arma las características con el
+mismo orden y valores por defecto que usa la app, y ejecuta el modelo de forma
+vectorizada sobre cada bloque completo (una sola pasada de inferencia).
+
+Ejemplos:
+    python batch_score.py DIAB pacientes.csv -o resultados.csv
+    python batch_score.py HEART pacientes.parquet -o resultados.parquet \\
+        --id-column patient_id --save --name-column nombre --email-column correo
+"""
+import argparse
+import csv
+import math
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from features import FEATURE_ORDERS, FEATURE_DEFAULTS, RESULT_MESSAGE_KEYS
+from inference_executor import InferenceExecutor, get_executor
+from tabular_files import import_pyarrow, is_parquet, open_result_writer
+from prediction_cache import prediction_cache
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+
+# ------------------------------------------------------------
+# LECTURA POR BLOQUES (formato columnar: nombre -> lista de valores)
+# ------------------------------------------------------------
+def input_columns(path: str) -> list:
+    """Nombres de las columnas del archivo de entrada (sin leer sus filas)."""
+    if is_parquet(path):
+        pa = import_pyarrow()
+        return pa.parquet.ParquetFile(path).schema_arrow.names
+    with open(path, newline="", encoding="utf-8") as f:
+        return [h.strip() for h in next(csv.reader(f), [])]
+
+
+def _csv_columns(header: list, rows: list) -> dict:
+    # Por índice de encabezado: una fila con menos celdas solo pierde las suyas
+    # (quedan vacías y se completan con el valor por defecto de esa fila)
+    return {
+        h: [row[i] if i < len(row) else "" for row in rows]
+        for i, h in enumerate(header)
+    }
+
+
+def iter_input_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Genera bloques {columna: valores} de como máximo chunk_size filas."""
+    if is_parquet(path):
+        pa = import_pyarrow()
+        parquet_file = pa.parquet.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pydict()
+        return
+
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [h.strip() for h in header]
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                yield _csv_columns(header, rows)
+                rows = []
+        if rows:
+            yield _csv_columns(header, rows)
+
+
+def _to_float(value, default):
+    if value is None or value == "":
+        return default
+    value = float(value)
+    # "nan" en el CSV o NaN en Parquet: valor faltante, igual que una celda vacía
+    return default if math.isnan(value) else value
+
+
+def build_feature_block(disease_code: str, columns: dict, n_rows: int,
+                        first_row: int = 1) -> np.ndarray:
+    """
+    Arma la matriz (n_rows, n_features) en el orden del modelo. Las columnas
+    ausentes o vacías se completan con *_DEFAULTS; si no hay valor por defecto
+    o una celda no es numérica se lanza ValueError con la columna y la fila
+    (numerada desde `first_row`, como la columna "row" de la salida).
+    """
+    order = FEATURE_ORDERS[disease_code]
+    defaults = FEATURE_DEFAULTS[disease_code]
+    X = np.empty((n_rows, len(order)), dtype=np.float64)
+
+    for j, feature in enumerate(order):
+        default = defaults.get(feature, np.nan)
+        values = columns.get(feature)
+        if values is None:
+            X[:, j] = default
+            continue
+        for i, value in enumerate(values):
+            try:
+                X[i, j] = _to_float(value, default)
+            except (TypeError, ValueError):
+                raise ValueError(
+                    f"Valor no numérico {value!r} en la columna '{feature}', "
+                    f"fila {first_row + i}"
+                ) from None
+
+    missing = np.isnan(X)
+    if missing.any():
+        rows, cols = np.nonzero(missing)
+        raise ValueError(
+            f"Falta el valor de '{order[cols[0]]}' (sin valor por defecto) "
+            f"en la fila {first_row + rows[0]}"
+        )
+    return X
+
+
+# ------------------------------------------------------------
+# PERSISTENCIA OPCIONAL COMO DIAGNÓSTICOS
+# ------------------------------------------------------------
+def check_can_save(disease_code):
+    """Migra el esquema (con las enfermedades base) y verifica que exista disease_code."""
+    from database import SessionLocal
+    from crud import get_disease_id
+    from migrations import ensure_schema
+
+    ok, error = ensure_schema()
+    if not ok:
+        raise RuntimeError(f"Database unavailable: {error}")
+    with SessionLocal() as db:
+        get_disease_id(db, disease_code)  # ValueError si no existe
+
+
+def save_block(disease_code, columns, X, labels, probas, model_hash, messages,
+               name_column=None, email_column=None):
+    from database import SessionLocal
+    from crud import get_or_create_user, bulk_create_diagnoses, user_cache_key, DiagnosisRecord
+
+    names = columns.get(name_column) if name_column else None
+    emails = columns.get(email_column) if email_column else None
+
+    with SessionLocal() as db:
+        try:
+            users = {}  # user_cache_key -> id: cada paciente se busca una vez por bloque
+            records = []
+            for i, (row, label, proba) in enumerate(zip(X, labels, probas)):
+                name = names[i] if names else None
+                email = (emails[i] or None) if emails else None
+                key = user_cache_key(name, email)
+                user = users.get(key)
+                if user is None:
+                    user = users[key] = get_or_create_user(db, name=name, email=email).id
+                records.append(DiagnosisRecord(
+                    user=user,
+                    disease_code=disease_code,
+                    probability=float(proba),
+                    description=messages[0] if label == 1 else messages[1],
+                    features=row,
+                    model_hash=model_hash,
+                ))
+            bulk_create_diagnoses(db, records)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+
+def output_schema(input_path: str, id_column: str = None) -> list:
+    """
+    Columnas y tipos del archivo de resultados (ver tabular_files). La columna
+    de id conserva el tipo de la entrada: texto en CSV, el del archivo en Parquet.
+    """
+    schema = [("row", "int64")]
+    if id_column:
+        id_type = "string"
+        if is_parquet(input_path):
+            pa = import_pyarrow()
+            id_type = pa.parquet.ParquetFile(input_path).schema_arrow.field(id_column).type
+        schema.append((id_column, id_type))
+    return schema + [("prediction", "int64"), ("probability", "float64")]
+
+
+def run(disease_code, input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE,
+        id_column=None, save=False, name_column=None, email_column=None, lang="es",
+        use_cache=False, workers=None):
+    # Columnas pedidas que no existen: error antes de crear el archivo de salida
+    available = input_columns(input_path)
+    for option, column in (("--id-column", id_column), ("--name-column", name_column),
+                           ("--email-column", email_column)):
+        if column and column not in available:
+            raise ValueError(f"{option}: la columna '{column}' no existe en {input_path}")
+
+    messages = None
+    if save:
+        # Antes de crear el archivo de salida: sin esquema o sin la enfermedad
+        # cada bloque fallaría al guardarse
+        check_can_save(disease_code)
+        from translations import translations
+        t = translations[lang]
+        messages = tuple(t[key] for key in RESULT_MESSAGE_KEYS[disease_code])
+
+    executor = get_executor() if workers is None else InferenceExecutor(workers)
+    executor.warm_up()  # cargar los modelos antes de empezar a medir
+
+    writer = open_result_writer(output_path, output_schema(input_path, id_column))
+    total = 0
+    submitted = 0  # filas ya leídas (numeración de los errores de entrada)
+    started = time.perf_counter()
+
+    def finish(columns, n_rows, X, future):
+        nonlocal total
+        labels, probas, model_hash = future.result()
+
+        out = {"row": list(range(total + 1, total + n_rows + 1))}
+        if id_column:
+            out[id_column] = columns[id_column]
+        out["prediction"] = labels.astype(int).tolist()
+        out["probability"] = np.round(probas, 4).tolist()
+        writer.write(out)
+
+        if save:
+            save_block(disease_code, columns, X, labels, probas, model_hash, messages,
+                       name_column, email_column)
+
+        total += n_rows
+        elapsed = time.perf_counter() - started
+        print(f"{total} filas ({total / elapsed:,.0f} filas/s)", file=sys.stderr)
+
+    # Bloques enviados y aún sin escribir (en orden). Con workers se mantienen
+    # todos ocupados mientras se lee el siguiente bloque.
+    pending = deque()
+    try:
+        for columns in iter_input_chunks(input_path, chunk_size):
+            n_rows = len(next(iter(columns.values()), []))
+            if n_rows == 0:
+                continue
+            X = build_feature_block(disease_code, columns, n_rows, first_row=submitted + 1)
+            submitted += n_rows
+            pending.append((columns, n_rows, X, executor.submit(disease_code, X, use_cache=use_cache)))
+            while len(pending) > executor.workers:
+                finish(*pending.popleft())
+        while pending:
+            finish(*pending.popleft())
+    finally:
+        writer.close()
+        if workers is not None:
+            executor.shutdown()
+    if use_cache and executor.workers <= 0:
+        print(f"Caché de predicciones: {prediction_cache.stats()}", file=sys.stderr)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Puntuación por lotes con los modelos guardados.")
+    parser.add_argument("disease_code", choices=sorted(FEATURE_ORDERS))
+    parser.add_argument("input", help="Archivo CSV o Parquet con una columna por característica")
+    parser.add_argument("-o", "--output", required=True, help="Archivo de salida (.csv o .parquet)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--id-column", help="Columna de entrada que se copia a la salida")
+    parser.add_argument("--save", action="store_true", help="Guardar cada resultado como diagnóstico")
+    parser.add_argument("--name-column", help="Columna con el nombre del paciente (con --save)")
+    parser.add_argument("--email-column", help="Columna con el correo del paciente (con --save)")
+    parser.add_argument("--lang", choices=["es", "en"], default="es")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reutilizar resultados de filas repetidas (caché de predicciones)")
+    parser.add_argument("--workers", type=int,
+                        help="Procesos de inferencia (por defecto INFERENCE_WORKERS; 0 = en este proceso)")
+    args = parser.parse_args(argv)
+
+    run(
+        args.disease_code,
+        args.input,
+        args.output,
+        chunk_size=args.chunk_size,
+        id_column=args.id_column,
+        save=args.save,
+        name_column=args.name_column,
+        email_column=args.email_column,
+        lang=args.lang,
+        use_cache=args.cache,
+        workers=args.workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
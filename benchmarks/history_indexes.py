@@ -0,0 +1,180 @@
+# benchmarks/history_indexes.py
+"""
+Compara el plan de ejecución y el tiempo de las consultas del historial antes y
+después de crear los índices de models.py (vía migrations.upgrade).
+
+Carga datos sintéticos (por defecto 1M diagnósticos) en una base SQLite
+temporal o en la indicada con --database-url, elimina los índices nuevos para
+simular una base antigua, mide, migra y vuelve a medir.
+
+Uso:
+    python benchmarks/history_indexes.py --rows 1000000
+    python benchmarks/history_indexes.py --database-url postgresql://... --output plan.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+NEW_INDEXES = [
+    "ix_users_name_lower",
+    "ix_diagnoses_generated_at_id",
+    "ix_diagnoses_user_generated_at",
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Diagnósticos a generar")
+    parser.add_argument("--users", type=int, default=10_000, help="Pacientes a generar")
+    parser.add_argument("--database-url", help="Base de datos a usar (por defecto SQLite temporal)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por consulta")
+    parser.add_argument("--output", help="Guardar el resultado en este archivo JSON")
+    return parser.parse_args(argv)
+
+
+def load_data(db, n_users, n_rows, seed=42):
+    from sqlalchemy import insert, select, func
+    from models import User, Diagnosis
+    from crud import seed_default_diseases, bulk_create_diagnoses, DiagnosisRecord
+
+    seed_default_diseases(db)
+    if db.execute(select(func.count(Diagnosis.id))).scalar() >= n_rows:
+        return
+
+    rng = random.Random(seed)
+    db.execute(insert(User), [
+        {"name": f"Paciente {i}", "email": f"paciente{i}@example.com", "age": rng.randint(18, 90)}
+        for i in range(n_users)
+    ])
+    user_ids = db.execute(select(User.id)).scalars().all()
+
+    now = datetime.now(timezone.utc)
+    codes = ["DIAB", "HEART", "PARK"]
+    records = (
+        DiagnosisRecord(
+            user=rng.choice(user_ids),
+            disease_code=rng.choice(codes),
+            probability=rng.random(),
+            description="benchmark",
+            generated_at=now - timedelta(seconds=rng.randint(0, 730 * 86400)),
+        )
+        for _ in range(n_rows)
+    )
+    bulk_create_diagnoses(db, records, chunk_size=10_000)
+    db.commit()
+
+
+def capture_sql(engine, fn):
+    """Ejecuta fn() y retorna la última sentencia SQL (y sus parámetros) emitida."""
+    from sqlalchemy import event
+
+    captured = {}
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        captured["sql"], captured["params"] = statement, parameters
+
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+    return captured["sql"], captured["params"]
+
+
+def explain(engine, sql, params) -> list:
+    with engine.connect() as conn:
+        cursor = conn.connection.cursor()
+        if engine.dialect.name == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [row[3] for row in cursor.fetchall()]
+        cursor.execute("EXPLAIN " + sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def measure(engine, SessionLocal, queries, repeat):
+    results = {}
+    for name, fn in queries.items():
+        with SessionLocal() as db:
+            sql, params = capture_sql(engine, lambda: fn(db))
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                fn(db)
+                timings.append((time.perf_counter() - started) * 1000)
+        results[name] = {
+            "median_ms": round(statistics.median(timings), 3),
+            "plan": explain(engine, sql, params),
+        }
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        path = os.path.join(tempfile.gettempdir(), f"meddiag_bench_{args.rows}.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from sqlalchemy import text
+    from database import engine, SessionLocal
+    from models import Base
+    from migrations import upgrade
+    from crud import get_recent_diagnoses, get_diagnoses_by_user_email, get_diagnoses_by_user_name
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for name in NEW_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        load_data(db, args.users, args.rows)
+    print(f"Datos listos en {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    target = args.users // 2
+    queries = {
+        "recent": lambda db: get_recent_diagnoses(db, limit=50),
+        "by_email": lambda db: get_diagnoses_by_user_email(db, f"paciente{target}@example.com", limit=50),
+        "by_name": lambda db: get_diagnoses_by_user_name(db, f"PACIENTE {target}", limit=50),
+    }
+
+    def analyze():
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+    analyze()
+    before = measure(engine, SessionLocal, queries, args.repeat)
+    upgrade(engine)
+    analyze()
+    after = measure(engine, SessionLocal, queries, args.repeat)
+
+    report = {
+        "dialect": engine.dialect.name,
+        "rows": args.rows,
+        "users": args.users,
+        "queries": {name: {"before": before[name], "after": after[name]} for name in queries},
+    }
+    for name, result in report["queries"].items():
+        print(f"\n== {name} ==")
+        for phase in ("before", "after"):
+            print(f"  {phase}: {result[phase]['median_ms']} ms")
+            for line in result[phase]["plan"]:
+                print(f"    {line}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# benchmarks/inference_load.py
+"""
+Prueba de carga del servicio de inferencia (inference_server.py) en localhost.
+
+Lanza el servidor en un hilo con la configuración indicada y dispara
+peticiones concurrentes desde varios clientes con conexiones keep-alive.
+Reporta peticiones por segundo, latencias p50/p95/p99 y el tamaño medio de
+lote alcanzado. Con --compare repite la prueba sin micro-lotes
+(--max-batch 1) para ver la diferencia.
+
+Uso:
+    python benchmarks/inference_load.py --clients 32 --requests 200 --compare
+    python benchmarks/inference_load.py --url http://127.0.0.1:8000   # servidor ya levantado
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--disease", default="HEART", choices=["DIAB", "HEART", "PARK"])
+    parser.add_argument("--clients", type=int, default=32, help="Clientes concurrentes")
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por cliente")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--compare", action="store_true", help="Repetir sin micro-lotes")
+    parser.add_argument("--url", help="Usar un servidor ya levantado en vez de uno interno")
+    return parser.parse_args(argv)
+
+
+def random_input(disease_code: str, rng: random.Random) -> list:
+    from features import FEATURE_ORDERS
+    # Valores únicos por petición para que el caché de predicciones no intervenga
+    return [rng.uniform(0, 200) for _ in FEATURE_ORDERS[disease_code]]
+
+
+def client(host, port, disease_code, n_requests, seed, latencies, errors):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    for _ in range(n_requests):
+        body = json.dumps({"input": random_input(disease_code, rng)}).encode()
+        start = time.perf_counter()
+        try:
+            conn.request("POST", f"/predict/{disease_code}", body,
+                         {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(repr(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def run_load(host, port, args) -> dict:
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(target=client, args=(host, port, args.disease, args.requests,
+                                              seed, latencies, errors))
+        for seed in range(args.clients)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    conn.request("GET", "/stats")
+    stats = json.loads(conn.getresponse().read())
+    conn.close()
+
+    latencies.sort()
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(q[49] * 1000, 2),
+        "p95_ms": round(q[94] * 1000, 2),
+        "p99_ms": round(q[98] * 1000, 2),
+        "avg_batch_size": round(stats["batchers"][args.disease]["avg_batch_size"], 1),
+    }
+
+
+def run_with_server(args, max_batch, max_wait_ms) -> dict:
+    from inference_server import create_server
+
+    server = create_server("127.0.0.1", 0, max_batch, max_wait_ms)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        return run_load("127.0.0.1", server.server_address[1], args)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Sin caché: cada petición debe pasar por el modelo
+    os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+
+    if args.url:
+        url = urlparse(args.url)
+        results = {"external": run_load(url.hostname, url.port or 80, args)}
+    else:
+        results = {
+            f"batched (max_batch={args.max_batch}, max_wait_ms={args.max_wait_ms})":
+                run_with_server(args, args.max_batch, args.max_wait_ms),
+        }
+        if args.compare:
+            results["unbatched (max_batch=1)"] = run_with_server(args, 1, 0)
+
+    for name, result in results.items():
+        print(f"{name}:")
+        for key, value in result.items():
+            print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
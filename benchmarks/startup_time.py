@@ -0,0 +1,146 @@
+# benchmarks/startup_time.py
+"""
+Mide el arranque en frío de app.py: importaciones (python -X importtime) y
+tiempo hasta el primer render de cada página, cada uno en un proceso nuevo.
+
+Para cada página se lanza `python -X importtime` con un hijo que renderiza
+app.py una vez con streamlit.testing (AppTest), y se reporta:
+  - segundos hasta el primer render (incluye imports, conexión y esquema) y
+    de una re-ejecución posterior (lo que cuesta cada interacción)
+  - módulos propios y de terceros que más tardan en importarse
+  - si sklearn / numpy llegaron a importarse
+
+Uso:
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --repeat 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Página -> índice en el option_menu de app.py
+PAGES = {"diabetes": 0, "heart": 1, "parkinsons": 2, "history": 3}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="+", choices=sorted(PAGES), default=["diabetes", "history"])
+    parser.add_argument("--repeat", type=int, default=3, help="Procesos en frío por página")
+    parser.add_argument("--database-url", help="Base de datos a usar (por defecto SQLite temporal)")
+    parser.add_argument("--top", type=int, default=10, help="Imports más lentos a mostrar")
+    parser.add_argument("--output", help="Guardar el resultado en este archivo JSON")
+    parser.add_argument("--child", choices=sorted(PAGES), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def child(page: str):
+    """Proceso hijo: primer render de app.py en la página indicada."""
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+
+    from streamlit.testing.v1 import AppTest
+    import streamlit_option_menu
+    # El menú es un componente web: en AppTest se reemplaza por la opción elegida
+    streamlit_option_menu.option_menu = lambda title, options, **kwargs: options[PAGES[page]]
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    render_started = time.perf_counter()
+    at.run()
+    finished = time.perf_counter()
+    at.run()  # cada interacción re-ejecuta app.py completo
+    rerun_finished = time.perf_counter()
+
+    print(json.dumps({
+        "first_render_s": finished - started,
+        "script_run_s": finished - render_started,
+        "rerun_s": rerun_finished - finished,
+        "exceptions": [str(e.value) for e in at.exception],
+        "sklearn_imported": "sklearn" in sys.modules,
+        "numpy_imported": "numpy" in sys.modules,
+    }))
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Líneas "import time: self | cumulative | paquete" -> {paquete: segundos}."""
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Solo los imports de primer nivel (sin sangría) para no contar dos veces
+        if not name[1:].startswith(" "):
+            name = name.strip()
+            totals[name] = totals.get(name, 0.0) + int(cumulative) / 1e6
+    return totals
+
+
+def run_page(page: str, database_url: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=database_url, PYTHONWARNINGS="ignore")
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", page],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr[-2000:])
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_wall_s"] = wall
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        child(args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'startup.db')}"
+        report = {}
+        for page in args.pages:
+            runs = [run_page(page, database_url) for _ in range(args.repeat)]
+            imports = {}
+            for run in runs:
+                for name, seconds in run["imports"].items():
+                    imports.setdefault(name, []).append(seconds)
+            slowest = sorted(
+                ((name, statistics.median(values)) for name, values in imports.items()),
+                key=lambda item: item[1], reverse=True,
+            )[:args.top]
+            report[page] = {
+                "first_render_s": round(statistics.median(r["first_render_s"] for r in runs), 3),
+                "script_run_s": round(statistics.median(r["script_run_s"] for r in runs), 3),
+                "rerun_s": round(statistics.median(r["rerun_s"] for r in runs), 3),
+                "process_wall_s": round(statistics.median(r["process_wall_s"] for r in runs), 3),
+                "sklearn_imported": runs[-1]["sklearn_imported"],
+                "numpy_imported": runs[-1]["numpy_imported"],
+                "exceptions": runs[-1]["exceptions"],
+                "slowest_imports_s": {name: round(seconds, 3) for name, seconds in slowest},
+            }
+
+    for page, result in report.items():
+        print(f"{page}:")
+        for key, value in result.items():
+            if key == "slowest_imports_s":
+                print("  slowest imports:")
+                for name, seconds in value.items():
+                    print(f"    {name:<40} {seconds:.3f} s")
+            else:
+                print(f"  {key}: {value}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
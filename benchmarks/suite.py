@@ -0,0 +1,388 @@
+# benchmarks/suite.py
+"""
+Suite de benchmarks repetibles de MedDiag con resultados en JSON.
+
+Grupos de escenarios:
+  - inference: una fila y lotes de 1000 filas con cada modelo de saved_models
+  - crud: guardado de un diagnóstico como save_diagnosis (usuario + diagnóstico
+    + commit) y bulk_create_diagnoses de 1000 filas
+  - history: get_recent_diagnoses (primera y segunda página) y los filtros por
+    correo y por nombre, con 10k y 1M diagnósticos (--history-rows)
+  - startup: arranque en frío de app.py (ver startup_time.py)
+
+Cada grupo corre en un proceso aparte con su propio DATABASE_URL. Sin
+--database-url se usa SQLite: temporal para crud y, para history, un archivo
+por tamaño en el directorio temporal del sistema que se reutiliza entre
+ejecuciones (generar 1M de filas toma más de un minuto). Con --database-url
+(p. ej. un PostgreSQL local) los datos del historial se completan hasta cada
+tamaño, de menor a mayor, con seed_dummy_data.generate.
+
+El JSON incluye el commit de git, versiones y parámetros, y `compare` reporta
+el cambio de la mediana de cada escenario entre dos ejecuciones.
+
+Uso:
+    python benchmarks/suite.py run
+    python benchmarks/suite.py run --groups inference crud --output base.json
+    python benchmarks/suite.py run --groups history --database-url postgresql://localhost/meddiag_bench
+    python benchmarks/suite.py compare base.json nuevo.json --threshold 10
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+GROUPS = ["inference", "crud", "history", "startup"]
+DEFAULT_HISTORY_ROWS = [10_000, 1_000_000]
+HISTORY_PAGE_SIZE = 50
+DIAGNOSES_PER_USER = 10
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Ejecutar los escenarios y guardar el JSON")
+    run.add_argument("--groups", nargs="+", choices=GROUPS, default=GROUPS)
+    run.add_argument("--history-rows", nargs="+", type=int, default=DEFAULT_HISTORY_ROWS)
+    run.add_argument("--database-url", help="Base para crud e history (por defecto SQLite)")
+    run.add_argument("--quick", action="store_true", help="Menos repeticiones (para probar la suite)")
+    run.add_argument("--output", help="Archivo JSON (por defecto benchmarks/results/<fecha>-<commit>.json)")
+
+    compare = commands.add_parser("compare", help="Comparar dos archivos de resultados")
+    compare.add_argument("baseline")
+    compare.add_argument("candidate")
+    compare.add_argument("--threshold", type=float, default=10.0,
+                         help="Porcentaje de aumento de la mediana que cuenta como regresión")
+    compare.add_argument("--min-ms", type=float, default=0.05,
+                         help="Ignorar diferencias absolutas menores (ruido)")
+
+    child = commands.add_parser("child", help=argparse.SUPPRESS)
+    child.add_argument("group", choices=["inference", "crud", "history"])
+    child.add_argument("--rows", type=int)
+    child.add_argument("--quick", action="store_true")
+    return parser.parse_args(argv)
+
+
+# ------------------------------------------------------------
+# MEDICIÓN
+# ------------------------------------------------------------
+
+def measure(fn, repeat: int, warmup: int = 3, rows: int = None) -> dict:
+    """Ejecuta fn() warmup + repeat veces y resume la duración de cada llamada."""
+    for i in range(warmup):
+        fn(i)
+    timings = []
+    for i in range(warmup, warmup + repeat):
+        started = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - started) * 1000)
+    return summarize(timings, rows=rows)
+
+
+def summarize(timings_ms: list, rows: int = None) -> dict:
+    timings_ms = sorted(timings_ms)
+    median = statistics.median(timings_ms)
+    result = {
+        "unit": "ms",
+        "n": len(timings_ms),
+        "median": round(median, 4),
+        "p95": round(timings_ms[min(len(timings_ms) - 1, int(len(timings_ms) * 0.95))], 4),
+        "min": round(timings_ms[0], 4),
+        "mean": round(statistics.fmean(timings_ms), 4),
+    }
+    if rows:
+        result["rows_per_s"] = round(rows / (median / 1000))
+    return result
+
+
+# ------------------------------------------------------------
+# ESCENARIOS (se ejecutan en el proceso hijo)
+# ------------------------------------------------------------
+
+def bench_inference(quick: bool) -> dict:
+    import numpy as np
+    from model_registry import MODEL_FILES, get_model
+    from features import FEATURE_ORDERS
+    from scoring import predict_with_proba
+
+    results = {}
+    rng = np.random.default_rng(0)
+    for code in MODEL_FILES:
+        model = get_model(code)
+        n_features = len(FEATURE_ORDERS[code])
+        rows = rng.uniform(0, 200, size=(1000, n_features))
+        single = [list(row) for row in rows[:100]]
+
+        results[f"inference.single.{code}"] = measure(
+            lambda i: predict_with_proba(model, [single[i % 100]]), 200 if quick else 2000)
+        results[f"inference.batch_1000.{code}"] = measure(
+            lambda i: predict_with_proba(model, rows), 10 if quick else 100, rows=1000)
+    return results
+
+
+def bench_crud(quick: bool) -> dict:
+    from database import SessionLocal
+    from migrations import upgrade
+    from crud import (
+        seed_default_diseases, get_or_create_user, create_diagnosis_with_single_candidate,
+        bulk_create_diagnoses, DiagnosisRecord,
+    )
+    from features import FEATURE_ORDERS
+
+    upgrade()
+    with SessionLocal() as db:
+        seed_default_diseases(db)
+
+    run_id = f"{time.time_ns():x}"
+    rng = random.Random(0)
+    vectors = {code: [rng.uniform(0, 200) for _ in order] for code, order in FEATURE_ORDERS.items()}
+    model_hash = "0" * 64
+
+    def save_diagnosis(email):
+        # Igual que el camino síncrono de save_diagnosis en app.py
+        with SessionLocal() as db:
+            user = get_or_create_user(db, name="Paciente Benchmark", email=email, age=50,
+                                      gender="F", phone_number="3000000000")
+            create_diagnosis_with_single_candidate(
+                db, user.id, "DIAB", rng.random(), "benchmark",
+                features=vectors["DIAB"], model_hash=model_hash,
+            )
+            db.commit()
+
+    def bulk_1000(i):
+        with SessionLocal() as db:
+            user = get_or_create_user(db, name="Paciente Benchmark", email=f"bulk-{run_id}@example.com")
+            codes = [rng.choice(["DIAB", "HEART", "PARK"]) for _ in range(1000)]
+            bulk_create_diagnoses(db, [
+                DiagnosisRecord(user, code, rng.random(), "benchmark",
+                                features=vectors[code], model_hash=model_hash)
+                for code in codes
+            ])
+            db.commit()
+
+    repeat = 30 if quick else 300
+    return {
+        "crud.save_diagnosis.new_user": measure(
+            lambda i: save_diagnosis(f"new-{run_id}-{i}@example.com"), repeat),
+        "crud.save_diagnosis.existing_user": measure(
+            lambda i: save_diagnosis(f"existing-{run_id}@example.com"), repeat),
+        "crud.bulk_create_1000": measure(bulk_1000, 3 if quick else 20, rows=1000),
+    }
+
+
+def bench_history(rows: int, quick: bool) -> dict:
+    from sqlalchemy import func, select, text
+    from database import SessionLocal, engine
+    from migrations import upgrade
+    from models import Diagnosis, User
+    from crud import (
+        get_recent_diagnoses, get_diagnoses_by_user_email, get_diagnoses_by_user_name,
+        history_next_cursor,
+    )
+    from seed_dummy_data import generate
+
+    upgrade()
+    with SessionLocal() as db:
+        existing = db.execute(select(func.count(Diagnosis.id))).scalar_one()
+        if existing < rows:
+            missing = rows - existing
+            print(f"Generando {missing:,} diagnósticos...", file=sys.stderr)
+            generate(db, users=max(1, missing // DIAGNOSES_PER_USER),
+                     per_user=missing / max(1, missing // DIAGNOSES_PER_USER),
+                     days=730, seed=rows)
+            existing = rows
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+        n_users = db.execute(select(func.count(User.id))).scalar_one()
+        target = db.execute(
+            select(User.name, User.email).order_by(User.id).offset(n_users // 2).limit(1)
+        ).one()
+        first_page = get_recent_diagnoses(db, limit=HISTORY_PAGE_SIZE)
+        cursor = history_next_cursor(first_page, HISTORY_PAGE_SIZE)
+
+    def query(fn):
+        def run(i):
+            with SessionLocal() as db:
+                fn(db)
+        return run
+
+    repeat = 10 if quick else 50
+    prefix = f"history.{rows}"
+    return {
+        f"{prefix}.recent": measure(query(
+            lambda db: get_recent_diagnoses(db, limit=HISTORY_PAGE_SIZE)), repeat),
+        f"{prefix}.recent_page2": measure(query(
+            lambda db: get_recent_diagnoses(db, limit=HISTORY_PAGE_SIZE, cursor=cursor)), repeat),
+        f"{prefix}.by_email": measure(query(
+            lambda db: get_diagnoses_by_user_email(db, target.email, limit=HISTORY_PAGE_SIZE)), repeat),
+        f"{prefix}.by_name": measure(query(
+            lambda db: get_diagnoses_by_user_name(db, target.name.upper(), limit=HISTORY_PAGE_SIZE)), repeat),
+        f"{prefix}.rows_in_database": {"unit": "rows", "n": 1, "value": existing},
+    }
+
+
+def child(args):
+    sys.path.insert(0, ROOT)
+    if args.group == "inference":
+        results = bench_inference(args.quick)
+    elif args.group == "crud":
+        results = bench_crud(args.quick)
+    else:
+        results = bench_history(args.rows, args.quick)
+    print(json.dumps(results))
+
+
+def run_child(group: str, database_url: str, quick: bool, rows: int = None) -> dict:
+    command = [sys.executable, os.path.abspath(__file__), "child", group]
+    if rows:
+        command += ["--rows", str(rows)]
+    if quick:
+        command.append("--quick")
+    env = dict(os.environ, DATABASE_URL=database_url, PYTHONWARNINGS="ignore")
+    proc = subprocess.run(command, cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"El grupo {group} falló (código {proc.returncode})")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def bench_startup(database_url: str, quick: bool) -> dict:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from startup_time import run_page
+
+    results = {}
+    for page in ("diabetes", "history"):
+        runs = [run_page(page, database_url) for _ in range(2 if quick else 5)]
+        for key in ("first_render_s", "rerun_s", "process_wall_s"):
+            name = key[:-2]
+            results[f"startup.{page}.{name}"] = summarize([r[key] * 1000 for r in runs])
+    return results
+
+
+# ------------------------------------------------------------
+# METADATOS Y COMPARACIÓN
+# ------------------------------------------------------------
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _version(package: str) -> str:
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        return version(package)
+    except PackageNotFoundError:
+        return None
+
+
+def environment(database_url: str) -> dict:
+    from sqlalchemy.engine import make_url
+
+    return {
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": {name: _version(name) for name in ("sqlalchemy", "numpy", "scikit-learn", "streamlit")},
+        "database": make_url(database_url).render_as_string(hide_password=True) if database_url else "sqlite (temporal)",
+        "model_format": os.environ.get("MODEL_FORMAT", "sav"),
+    }
+
+
+def compare(baseline_path: str, candidate_path: str, threshold: float, min_ms: float) -> int:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(candidate_path, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    print(f"base:      {baseline['environment'].get('git_commit', '?')[:12]}  {baseline_path}")
+    print(f"candidato: {candidate['environment'].get('git_commit', '?')[:12]}  {candidate_path}\n")
+    print(f"{'escenario':<44} {'base ms':>10} {'nuevo ms':>10} {'cambio':>8}")
+
+    regressions = []
+    for name in sorted(baseline["results"].keys() | candidate["results"].keys()):
+        old, new = baseline["results"].get(name), candidate["results"].get(name)
+        if old is None or new is None:
+            print(f"{name:<44} {'(solo en ' + ('nuevo' if old is None else 'base') + ')':>30}")
+            continue
+        if old.get("unit") != "ms":
+            continue
+        change = (new["median"] - old["median"]) / old["median"] * 100 if old["median"] else 0.0
+        flag = ""
+        if change > threshold and new["median"] - old["median"] > min_ms:
+            flag = "  REGRESIÓN"
+            regressions.append(name)
+        elif change < -threshold and old["median"] - new["median"] > min_ms:
+            flag = "  mejora"
+        print(f"{name:<44} {old['median']:>10.3f} {new['median']:>10.3f} {change:>+7.1f}%{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regresiones de más de {threshold:g}%")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "child":
+        child(args)
+        return
+    if args.command == "compare":
+        sys.exit(compare(args.baseline, args.candidate, args.threshold, args.min_ms))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        scratch_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'suite.db')}"
+        for group in args.groups:
+            started = time.perf_counter()
+            if group == "history":
+                for rows in sorted(args.history_rows):
+                    url = args.database_url or "sqlite:///" + os.path.join(
+                        tempfile.gettempdir(), f"meddiag_suite_{rows}.db")
+                    results.update(run_child("history", url, args.quick, rows=rows))
+            elif group == "startup":
+                results.update(bench_startup(f"sqlite:///{os.path.join(tmp, 'startup.db')}", args.quick))
+            else:
+                results.update(run_child(group, scratch_url, args.quick))
+            print(f"{group}: {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+    report = {
+        "environment": environment(args.database_url),
+        "parameters": {"groups": args.groups, "history_rows": sorted(args.history_rows),
+                       "quick": args.quick},
+        "results": results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (report["environment"]["git_commit"] or "nogit")[:12]
+        dirty = "-dirty" if report["environment"]["git_dirty"] else ""
+        output = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{commit}{dirty}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    for name, result in results.items():
+        if result.get("unit") == "ms":
+            extra = f"  ({result['rows_per_s']:,} filas/s)" if "rows_per_s" in result else ""
+            print(f"{name:<44} mediana {result['median']:>9.3f} ms  p95 {result['p95']:>9.3f} ms{extra}")
+    print(f"\nResultados en {output}")
+
+
+if __name__ == "__main__":
+    main()
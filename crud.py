@@ -1,25 +1,185 @@
-from sqlalchemy.orm import Session
-from models import User, Disease, Diagnosis, DiagnosisDetail
-from sqlalchemy import func
+import base64
+import hashlib
+import json
+import threading
+from collections import namedtuple
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from itertools import islice
+
+from sqlalchemy.orm import Session, aliased
+from tracing import traced
+from models import (
+    User, Disease, Diagnosis, DiagnosisDetail, Symptom, DiagnosisSymptom,
+    DailyDiseaseStats, DailyProbabilityHistogram,
+)
+from sqlalchemy import and_, bindparam, delete, func, insert, lambda_stmt, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from features import FEATURE_ORDERS, FEATURE_SCHEMA_VERSION, pack_features, unpack_feature_matrix
+
+# Tamaño por defecto de cada bloque de inserción masiva
+BULK_CHUNK_SIZE = 1000
+
+# Registro para bulk_create_diagnoses. `user` puede ser un User ya persistido
+# o directamente su id; `symptoms` son nombres de síntomas ya registrados;
+# `features` es el vector de entrada del modelo y `model_hash` el hash del .sav;
+# `status` (opcional) reemplaza el estado común del lote.
+DiagnosisRecord = namedtuple(
+    "DiagnosisRecord",
+    ["user", "disease_code", "probability", "description", "symptoms", "generated_at",
+     "features", "model_hash", "status"],
+    defaults=(None, (), None, None, None, None),
+)
+
+# Enfermedad candidata de un diagnóstico con varios detalles (panel completo)
+DiagnosisCandidate = namedtuple(
+    "DiagnosisCandidate",
+    ["disease_code", "probability", "features", "model_hash"],
+    defaults=(None, None),
+)
+
+# Clave de Session.info con los diagnósticos borrados en la transacción actual
+# (symptom_index los descarta después del commit)
+DELETED_DIAGNOSES_KEY = "deleted_diagnosis_ids"
+
+# Caché en memoria de la tabla diseases (código -> id/nombre). Son pocas filas
+# que casi nunca cambian; se carga una vez por base de datos y se invalida
+# explícitamente cuando se agregan enfermedades.
+CachedDisease = namedtuple("CachedDisease", ["id", "name"])
+_disease_cache = {}
+_disease_cache_lock = threading.Lock()
+
+
+def get_disease_map(db: Session) -> dict:
+    """Retorna {disease_code: CachedDisease(id, name)}, consultando la BD solo la primera vez."""
+    engine = db.get_bind().engine
+    diseases = _disease_cache.get(engine)
+    if diseases is None:
+        with _disease_cache_lock:
+            diseases = _disease_cache.get(engine)
+            if diseases is None:
+                rows = db.execute(select(Disease.disease_code, Disease.id, Disease.name))
+                diseases = {code: CachedDisease(id, name) for code, id, name in rows}
+                _disease_cache[engine] = diseases
+    return diseases
+
+
+def get_disease_id(db: Session, disease_code: str) -> int:
+    disease = get_disease_map(db).get(disease_code)
+    if disease is None:
+        # Puede haberla creado otro proceso: recargar una vez antes de fallar
+        invalidate_disease_cache()
+        disease = get_disease_map(db).get(disease_code)
+    if disease is None:
+        raise ValueError(f"Disease with code {disease_code} not found")
+    return disease.id
+
+
+def invalidate_disease_cache():
+    with _disease_cache_lock:
+        _disease_cache.clear()
+
+
+def _dialect_insert(db: Session):
+    """insert() con ON CONFLICT del motor actual, o None si no lo soporta."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+DEFAULT_USER_NAME = "Paciente sin nombre"
+
+
+def user_identity_key(name: str, age: int = None, gender: str = None,
+                      phone_number: str = None) -> str:
+    """
+    Clave estable de un paciente sin correo: SHA-256 del nombre normalizado
+    (minúsculas, espacios colapsados), la edad, el género y los dígitos del
+    teléfono. Los mismos datos en otra predicción dan la misma clave.
+    """
+    normalized = "|".join([
+        " ".join((name or DEFAULT_USER_NAME).casefold().split()),
+        "" if age is None else str(int(age)),
+        (gender or "").upper(),
+        "".join(ch for ch in (phone_number or "") if ch.isdigit()),
+    ])
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def user_cache_key(name: str, email: str = None, age: int = None, gender: str = None,
+                   phone_number: str = None) -> str:
+    """
+    Clave con la que se cachea el id que retorna get_or_create_user. Con correo
+    incluye edad, género y teléfono: si cambian, la clave es otra y el upsert
+    vuelve a ejecutarse para actualizarlos.
+    """
+    if email:
+        return "email:" + "|".join([
+            email,
+            "" if age is None else str(int(age)),
+            gender or "",
+            phone_number or "",
+        ])
+    return f"key:{user_identity_key(name, age, gender, phone_number)}"
+
 
 # 1) Usuario: crear o reutilizar
+@traced("db.get_or_create_user")
 def get_or_create_user(db: Session, name: str, email: str = None,
                        age: int = None, gender: str = None,
                        phone_number: str = None) -> User:
-    user = None
-    if email:
-        user = db.query(User).filter(User.email == email).first()
-
-    if not user:
-        user = User(
-            name=name or "Paciente sin nombre",
-            email=email,
-            age=age,
-            gender=gender,
-            phone_number=phone_number
-        )
-        db.add(user)
-        db.flush()  # para obtener user.id
+    """
+    Retorna el paciente con ese correo o, si no tiene correo, con la misma
+    clave de identidad (user_identity_key), creándolo si no existe.
+
+    En SQLite y PostgreSQL es un solo INSERT ... ON CONFLICT DO UPDATE ...
+    RETURNING: un viaje a la base y sin carrera entre dos sesiones que crean
+    el mismo paciente a la vez. Si el paciente con correo ya existía se
+    actualizan edad, género y teléfono cuando vienen informados.
+    """
+    values = {
+        "name": name or DEFAULT_USER_NAME,
+        "email": email,
+        "age": age,
+        "gender": gender,
+        "phone_number": phone_number,
+        "identity_key": None if email else user_identity_key(name, age, gender, phone_number),
+    }
+    conflict_column = "email" if email else "identity_key"
+
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is not None:
+        users = User.__table__
+        stmt = dialect_insert(User).values(**values)
+        if email:
+            set_ = {
+                column: func.coalesce(stmt.excluded[column], users.c[column])
+                for column in ("age", "gender", "phone_number")
+            }
+        else:
+            # Mismos datos por construcción: DO UPDATE solo para que RETURNING traiga la fila
+            set_ = {"identity_key": stmt.excluded.identity_key}
+        stmt = stmt.on_conflict_do_update(index_elements=[conflict_column], set_=set_)
+        return db.scalars(
+            stmt.returning(User), execution_options={"populate_existing": True}
+        ).one()
+
+    # Otros motores: SELECT y luego INSERT en un savepoint; si otra sesión lo
+    # creó entre medio, el UNIQUE falla y se lee el suyo
+    lookup = select(User).where(getattr(User, conflict_column) == values[conflict_column])
+    user = db.execute(lookup).scalar_one_or_none()
+    if user is None:
+        user = User(**values)
+        try:
+            with db.begin_nested():
+                db.add(user)
+        except IntegrityError:
+            user = db.execute(lookup).scalar_one()
     return user
 
 # 2) Seed básico de enfermedades ligadas a tus 3 modelos
@@ -29,11 +189,26 @@ def seed_default_diseases(db: Session):
         ("HEART", "Riesgo de Enfermedad Cardíaca", "Modelo basado en dataset UCI Heart."),
         ("PARK", "Riesgo de Parkinson", "Modelo basado en parámetros de voz."),
     ]
-    for code, name, desc in defaults:
-        exists = db.query(Disease).filter(Disease.disease_code == code).first()
-        if not exists:
-            db.add(Disease(disease_code=code, name=name, description=desc))
-    db.commit()
+    existing = get_disease_map(db)
+    missing = [
+        Disease(disease_code=code, name=name, description=desc)
+        for code, name, desc in defaults
+        if code not in existing
+    ]
+    if missing:
+        db.add_all(missing)
+        db.commit()
+        invalidate_disease_cache()
+
+def _feature_columns(features, model_hash: str) -> dict:
+    """Columnas de diagnosis_details con el vector de entrada empaquetado."""
+    if features is None:
+        return {"input_vector": None, "feature_schema_version": None, "model_hash": model_hash}
+    return {
+        "input_vector": pack_features(features),
+        "feature_schema_version": FEATURE_SCHEMA_VERSION,
+        "model_hash": model_hash,
+    }
 
 # 3) Crear diagnóstico + detalle (versión simple: 1 enfermedad candidata)
 def create_diagnosis_with_single_candidate(
@@ -41,37 +216,83 @@ def create_diagnosis_with_single_candidate(
     user_id: int,
     disease_code: str,
     probability: float,
-    final_description: str
+    final_description: str,
+    features=None,
+    model_hash: str = None,
+    symptoms=(),
 ) -> Diagnosis:
-    disease = db.query(Disease).filter(Disease.disease_code == disease_code).first()
-    if not disease:
-        raise ValueError(f"Disease with code {disease_code} not found")
-
-    diagnosis = Diagnosis(
-        user_id=user_id,
-        final_description=final_description,
-        status="pending"
+    return create_diagnosis_with_candidates(
+        db,
+        user_id,
+        [DiagnosisCandidate(disease_code, probability, features, model_hash)],
+        final_description,
+        symptoms=symptoms,
     )
-    db.add(diagnosis)
-    db.flush()  # genera diagnosis.id
 
-    detail = DiagnosisDetail(
-        diagnosis_id=diagnosis.id,
-        disease_id=disease.id,
-        probability=round(float(probability), 4)
+
+# Paginación por cursor (keyset) del historial. El orden es
+# (generated_at DESC, diagnóstico DESC, detalle ASC) y el cursor opaco guarda la
+# posición de la última fila de la página, así que cada página cuesta lo mismo
+# sin importar qué tan atrás esté (a diferencia de OFFSET).
+def encode_history_cursor(row) -> str:
+    payload = {"ts": row.generated_at.isoformat(), "id": row.id, "detail": row.detail_id}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_history_cursor(cursor: str) -> dict:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {
+            "ts": datetime.fromisoformat(payload["ts"]),
+            "id": int(payload["id"]),
+            "detail": int(payload["detail"]),
+        }
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid history cursor")
+
+
+def history_next_cursor(rows, limit: int):
+    """Cursor de la página siguiente, o None si esta fue la última."""
+    if len(rows) < limit:
+        return None
+    return encode_history_cursor(rows[-1])
+
+
+# Alias del diagnóstico que marca la posición del cursor
+_cursor_anchor = aliased(Diagnosis, name="cursor_anchor")
+
+
+def _after_cursor(cursor_ts, cursor_id, cursor_detail):
+    """Condiciones para las filas posteriores al cursor en el orden del historial."""
+    # Se compara contra el valor guardado en la BD (no contra el del cursor)
+    # para no depender del formato de fecha del motor; si el diagnóstico ya
+    # no existe se usa la fecha del cursor.
+    anchor_ts = func.coalesce(
+        select(_cursor_anchor.generated_at)
+        .where(_cursor_anchor.id == cursor_id)
+        .scalar_subquery(),
+        cursor_ts,
+    )
+    return (
+        Diagnosis.generated_at <= anchor_ts,
+        or_(
+            Diagnosis.generated_at < anchor_ts,
+            Diagnosis.id < cursor_id,
+            and_(Diagnosis.id == cursor_id, DiagnosisDetail.id > cursor_detail),
+        ),
     )
-    db.add(detail)
 
-    return diagnosis
 
-# 4) Obtener diagnósticos recientes (para historial general)
-def get_recent_diagnoses(db: Session, limit: int = 50):
+def _history_statement(name=None, email=None, disease_code=None, status=None,
+                       date_from=None, date_to=None, cursor=None, limit=50,
+                       diagnosis_ids=None):
     """
-    Retorna los diagnósticos más recientes, incluyendo datos del usuario
-    y de la enfermedad.
+    Construye la consulta del historial con cualquier combinación de filtros.
+    Usa lambda statements: SQLAlchemy compila cada "forma" (combinación de
+    filtros presentes) una sola vez y en adelante solo cambia los parámetros.
     """
-    query = (
-        db.query(
+    stmt = lambda_stmt(lambda: (
+        select(
             Diagnosis.id,
             Diagnosis.generated_at,
             Diagnosis.status,
@@ -80,69 +301,84 @@ def get_recent_diagnoses(db: Session, limit: int = 50):
             User.email.label("user_email"),
             Disease.name.label("disease_name"),
             Disease.disease_code,
-            DiagnosisDetail.probability
+            DiagnosisDetail.probability,
+            DiagnosisDetail.id.label("detail_id"),
         )
         .join(User, Diagnosis.user_id == User.id)
         .join(DiagnosisDetail, DiagnosisDetail.diagnosis_id == Diagnosis.id)
         .join(Disease, DiagnosisDetail.disease_id == Disease.id)
-        .order_by(Diagnosis.generated_at.desc())
-        .limit(limit)
+    ))
+
+    if name:
+        stmt += lambda s: s.where(func.lower(User.name) == func.lower(name))
+    if email:
+        stmt += lambda s: s.where(User.email == email)
+    if disease_code:
+        stmt += lambda s: s.where(Disease.disease_code == disease_code)
+    if status:
+        stmt += lambda s: s.where(Diagnosis.status == status)
+    if date_from:
+        stmt += lambda s: s.where(Diagnosis.generated_at >= date_from)
+    if date_to:
+        stmt += lambda s: s.where(Diagnosis.generated_at < date_to)
+    if diagnosis_ids is not None:
+        stmt += lambda s: s.where(Diagnosis.id.in_(diagnosis_ids))
+
+    if cursor:
+        position = decode_history_cursor(cursor)
+        cursor_ts, cursor_id, cursor_detail = position["ts"], position["id"], position["detail"]
+        stmt += lambda s: s.where(*_after_cursor(cursor_ts, cursor_id, cursor_detail))
+
+    stmt += lambda s: s.order_by(
+        Diagnosis.generated_at.desc(), Diagnosis.id.desc(), DiagnosisDetail.id
     )
-    return query.all()
+    if limit is not None:
+        stmt += lambda s: s.limit(limit)
+    return stmt
+
 
-# 5) Obtener diagnósticos filtrados por correo de usuario
-def get_diagnoses_by_user_email(db: Session, email: str, limit: int = 50):
+# 4) Buscar diagnósticos combinando filtros (historial)
+def search_diagnoses(db: Session, name: str = None, email: str = None,
+                     disease_code: str = None, status: str = None,
+                     date_from: datetime = None, date_to: datetime = None,
+                     limit: int = 50, cursor: str = None):
     """
-    Retorna diagnósticos asociados a un correo concreto.
+    Retorna diagnósticos con datos del usuario y de la enfermedad, del más
+    reciente al más antiguo. Todos los filtros son opcionales y se combinan
+    con AND; `date_to` es exclusivo. `cursor` (de history_next_cursor) pide
+    la página siguiente.
     """
-    query = (
-        db.query(
-            Diagnosis.id,
-            Diagnosis.generated_at,
-            Diagnosis.status,
-            Diagnosis.final_description,
-            User.name.label("user_name"),
-            User.email.label("user_email"),
-            Disease.name.label("disease_name"),
-            Disease.disease_code,
-            DiagnosisDetail.probability
-        )
-        .join(User, Diagnosis.user_id == User.id)
-        .join(DiagnosisDetail, DiagnosisDetail.diagnosis_id == Diagnosis.id)
-        .join(Disease, DiagnosisDetail.disease_id == Disease.id)
-        .filter(User.email == email)
-        .order_by(Diagnosis.generated_at.desc())
-        .limit(limit)
+    stmt = _history_statement(
+        name=name, email=email, disease_code=disease_code, status=status,
+        date_from=date_from, date_to=date_to, cursor=cursor, limit=limit,
     )
-    return query.all()
+    return db.execute(stmt).all()
 
-    # 6) Obtener diagnósticos filtrados por nombre de usuario
-def get_diagnoses_by_user_name(db: Session, name: str, limit: int = 50):
+# 5) Obtener diagnósticos recientes (para historial general)
+def get_recent_diagnoses(db: Session, limit: int = 50, cursor: str = None):
     """
-    Retorna diagnósticos asociados a un nombre concreto.
+    Retorna los diagnósticos más recientes, incluyendo datos del usuario
+    y de la enfermedad. `cursor` (de history_next_cursor) pide la página siguiente.
     """
-    query = (
-        db.query(
-            Diagnosis.id,
-            Diagnosis.generated_at,
-            Diagnosis.status,
-            Diagnosis.final_description,
-            User.name.label("user_name"),
-            User.email.label("user_email"),
-            Disease.name.label("disease_name"),
-            Disease.disease_code,
-            DiagnosisDetail.probability
-        )
-        .join(User, Diagnosis.user_id == User.id)
-        .join(DiagnosisDetail, DiagnosisDetail.diagnosis_id == Diagnosis.id)
-        .join(Disease, DiagnosisDetail.disease_id == Disease.id)
-        .filter(func.lower(User.name) == func.lower(name))
-        .order_by(Diagnosis.generated_at.desc())
-        .limit(limit)
-    )
-    return query.all()
+    return search_diagnoses(db, limit=limit, cursor=cursor)
+
+# 6) Obtener diagnósticos filtrados por correo de usuario
+def get_diagnoses_by_user_email(db: Session, email: str, limit: int = 50,
+                                cursor: str = None):
+    """
+    Retorna diagnósticos asociados a un correo concreto.
+    """
+    return search_diagnoses(db, email=email, limit=limit, cursor=cursor)
 
-# 7) Elimina un diagnóstico y sus detalles asociados por ID
+# 7) Obtener diagnósticos filtrados por nombre de usuario
+def get_diagnoses_by_user_name(db: Session, name: str, limit: int = 50,
+                               cursor: str = None):
+    """
+    Retorna diagnósticos asociados a un nombre concreto (sin distinguir mayúsculas).
+    """
+    return search_diagnoses(db, name=name, limit=limit, cursor=cursor)
+
+# 8) Elimina un diagnóstico y sus detalles asociados por ID
 def delete_diagnosis_by_id(db: Session, diagnosis_id: int) -> bool:
 # Buscar diagnóstico
     diagnosis = db.query(Diagnosis).filter(Diagnosis.id == diagnosis_id).first()
@@ -150,8 +386,604 @@ def delete_diagnosis_by_id(db: Session, diagnosis_id: int) -> bool:
     if not diagnosis:
         return False  # No existe
 
+# Descontarlo de las estadísticas agregadas
+    details = db.execute(
+        select(DiagnosisDetail.disease_id, DiagnosisDetail.probability)
+        .where(DiagnosisDetail.diagnosis_id == diagnosis_id)
+    ).all()
+    _record_stats(db, [
+        (diagnosis.generated_at, disease_id, diagnosis.status, probability, -1)
+        for disease_id, probability in details
+    ])
+
 # Borrar diagnóstico
     db.delete(diagnosis)
+# El índice de síntomas lo descarta cuando se confirme la transacción
+    db.info.setdefault(DELETED_DIAGNOSES_KEY, set()).add(diagnosis_id)
 # commit afuera
     return True
 
+# 9) Crear muchos diagnósticos (1 enfermedad candidata cada uno) por bloques
+@traced("db.bulk_create_diagnoses")
+def bulk_create_diagnoses(db: Session, records, chunk_size: int = BULK_CHUNK_SIZE,
+                          status: str = "pending") -> list:
+    """
+    Inserta diagnósticos, sus detalles y síntomas por bloques: un INSERT
+    multi-fila con RETURNING para los diagnósticos y un executemany para los
+    detalles, en lugar de consultar la enfermedad y hacer flush por registro
+    (los ids de enfermedad salen del caché en memoria).
+    `records` es un iterable de DiagnosisRecord o tuplas
+    (user, disease_code, probability, description, symptoms, generated_at,
+    features, model_hash[, status]); los registros sin status usan `status`.
+    Retorna los ids de los diagnósticos creados, en el mismo orden. Commit afuera.
+    """
+    disease_ids = {code: disease.id for code, disease in get_disease_map(db).items()}
+
+    created_ids = []
+    records = iter(records)
+    while True:
+        chunk = [DiagnosisRecord(*r) for r in islice(records, chunk_size)]
+        if not chunk:
+            break
+        created_ids.extend(_insert_diagnosis_chunk(db, chunk, disease_ids, status))
+    return created_ids
+
+
+# INSERT sobre las tablas (Core) y no sobre las clases: el bulk INSERT del ORM
+# recorre el mapeo fila por fila y es el cuello de botella con millones de filas
+_diagnoses = Diagnosis.__table__
+
+
+def _insert_diagnosis_chunk(db: Session, chunk, disease_ids: dict, status: str) -> list:
+    now = datetime.now(timezone.utc)
+    diagnosis_rows = []
+    for r in chunk:
+        if r.disease_code not in disease_ids:
+            disease_ids[r.disease_code] = get_disease_id(db, r.disease_code)
+        diagnosis_rows.append({
+            "user_id": r.user.id if isinstance(r.user, User) else int(r.user),
+            "final_description": r.description,
+            "status": r.status or status,
+            "generated_at": r.generated_at or now,
+        })
+
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite asigna los rowid en orden dentro de cada INSERT multi-fila, así
+        # que basta con ordenar los ids devueltos (pedir sort_by_parameter_order
+        # haría que SQLAlchemy insertara fila por fila).
+        diagnosis_ids = sorted(
+            db.execute(insert(_diagnoses).returning(_diagnoses.c.id), diagnosis_rows).scalars()
+        )
+    else:
+        diagnosis_ids = db.execute(
+            insert(_diagnoses).returning(_diagnoses.c.id, sort_by_parameter_order=True),
+            diagnosis_rows,
+        ).scalars().all()
+
+    db.execute(
+        insert(DiagnosisDetail.__table__),
+        [
+            {
+                "diagnosis_id": diagnosis_id,
+                "disease_id": disease_ids[r.disease_code],
+                "probability": round(float(r.probability), 4),
+                **_feature_columns(r.features, r.model_hash),
+            }
+            for diagnosis_id, r in zip(diagnosis_ids, chunk)
+        ],
+    )
+    _record_stats(db, [
+        (row["generated_at"], disease_ids[r.disease_code], row["status"], r.probability, 1)
+        for row, r in zip(diagnosis_rows, chunk)
+    ])
+
+    symptom_names = {name for r in chunk for name in (r.symptoms or ())}
+    if symptom_names:
+        symptom_ids = get_symptom_ids(db, symptom_names)
+        db.execute(
+            insert(DiagnosisSymptom.__table__),
+            [
+                {"diagnosis_id": diagnosis_id, "symptom_id": symptom_ids[name]}
+                for diagnosis_id, r in zip(diagnosis_ids, chunk)
+                for name in dict.fromkeys(r.symptoms or ())
+            ],
+        )
+
+    return diagnosis_ids
+
+
+# 10) Vectores de entrada guardados, listos para re-puntuar en bloque
+def get_feature_matrix(db: Session, disease_code: str, after_detail_id: int = 0,
+                       limit: int = None, skip_model_hash: str = None):
+    """
+    Retorna (detail_ids, X, model_hashes) de los detalles de una enfermedad que
+    tienen vector guardado con el esquema actual, en orden de id y a partir de
+    after_detail_id (para recorrer la tabla por bloques). X es una matriz
+    float32 (n, n_features) construida con una sola copia de los blobs.
+    Con skip_model_hash se omiten los ya puntuados por ese modelo.
+    """
+    stmt = (
+        select(DiagnosisDetail.id, DiagnosisDetail.input_vector, DiagnosisDetail.model_hash)
+        .where(
+            DiagnosisDetail.disease_id == get_disease_id(db, disease_code),
+            DiagnosisDetail.input_vector.is_not(None),
+            DiagnosisDetail.feature_schema_version == FEATURE_SCHEMA_VERSION,
+            DiagnosisDetail.id > after_detail_id,
+        )
+        .order_by(DiagnosisDetail.id)
+    )
+    if skip_model_hash is not None:
+        stmt = stmt.where(or_(
+            DiagnosisDetail.model_hash.is_(None),
+            DiagnosisDetail.model_hash != skip_model_hash,
+        ))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    rows = db.execute(stmt).all()
+
+    detail_ids = [row.id for row in rows]
+    X = unpack_feature_matrix(
+        (row.input_vector for row in rows), len(FEATURE_ORDERS[disease_code])
+    )
+    return detail_ids, X, [row.model_hash for row in rows]
+
+
+# 11) Recorrer el historial completo por lotes (exportaciones)
+def iter_history(db: Session, name: str = None, email: str = None,
+                 disease_code: str = None, status: str = None,
+                 date_from: datetime = None, date_to: datetime = None,
+                 batch_size: int = 1000):
+    """
+    Genera listas de hasta batch_size filas (mismas columnas y filtros que
+    search_diagnoses, sin límite). Con yield_per el resultado se lee por
+    partes (cursor del lado del servidor en PostgreSQL), así que la memoria no
+    crece con el total de diagnósticos.
+    """
+    stmt = _history_statement(
+        name=name, email=email, disease_code=disease_code, status=status,
+        date_from=date_from, date_to=date_to, limit=None,
+    )
+    result = db.execute(stmt, execution_options={"yield_per": batch_size})
+    yield from result.partitions()
+
+
+# ------------------------------------------------------------
+# ESTADÍSTICAS AGREGADAS (tablas daily_*)
+# ------------------------------------------------------------
+# Se actualizan en la misma transacción que crea o borra el diagnóstico, con
+# un upsert "sumar al contador" por fila afectada, así el tablero nunca hace
+# GROUP BY sobre el historial completo.
+HISTOGRAM_BUCKETS = 100
+
+
+def _stats_day(generated_at) -> date:
+    if isinstance(generated_at, datetime):
+        if generated_at.tzinfo is not None:
+            generated_at = generated_at.astimezone(timezone.utc)
+        return generated_at.date()
+    return generated_at
+
+
+def _accumulate_stats(counts: dict, histogram: dict, entries):
+    """entries: (generated_at, disease_id, status, probability, +1/-1)."""
+    for generated_at, disease_id, status, probability, sign in entries:
+        day = _stats_day(generated_at)
+        probability_e4 = int(round(float(probability) * 10_000))
+        entry = counts.setdefault((day, disease_id, status), [0, 0])
+        entry[0] += sign
+        entry[1] += sign * probability_e4
+        bucket = min(probability_e4 // 100, HISTOGRAM_BUCKETS - 1)
+        histogram[(day, disease_id, bucket)] = histogram.get((day, disease_id, bucket), 0) + sign
+
+
+def _upsert_increment(db: Session, table, key_columns: list, rows: list):
+    """INSERT de cada fila o, si la clave ya existe, suma sus valores a los guardados."""
+    if not rows:
+        return
+    value_columns = [c for c in rows[0] if c not in key_columns]
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is not None:
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={c: table.c[c] + stmt.excluded[c] for c in value_columns},
+        )
+        db.execute(stmt, rows)
+        return
+
+    # Otros motores: UPDATE y, si no había fila, INSERT
+    for row in rows:
+        result = db.execute(
+            update(table)
+            .where(*[table.c[k] == row[k] for k in key_columns])
+            .values({c: table.c[c] + row[c] for c in value_columns})
+        )
+        if result.rowcount == 0:
+            db.execute(insert(table).values(row))
+
+
+def _write_stats(db: Session, counts: dict, histogram: dict):
+    _upsert_increment(db, DailyDiseaseStats.__table__, ["day", "disease_id", "status"], [
+        {"day": day, "disease_id": disease_id, "status": status,
+         "diagnoses_count": n, "probability_sum_e4": total_e4}
+        for (day, disease_id, status), (n, total_e4) in sorted(counts.items())
+        if n or total_e4
+    ])
+    _upsert_increment(db, DailyProbabilityHistogram.__table__, ["day", "disease_id", "bucket"], [
+        {"day": day, "disease_id": disease_id, "bucket": bucket, "diagnoses_count": n}
+        for (day, disease_id, bucket), n in sorted(histogram.items())
+        if n
+    ])
+
+
+def _record_stats(db: Session, entries):
+    counts, histogram = {}, {}
+    _accumulate_stats(counts, histogram, entries)
+    _write_stats(db, counts, histogram)
+
+
+# 12) Reconstruir las estadísticas agregadas desde el historial (backfill)
+def rebuild_daily_stats(db: Session, batch_size: int = 10_000) -> int:
+    """
+    Vacía las tablas daily_* y las recalcula recorriendo los diagnósticos por
+    lotes (yield_per). Usa el mismo cálculo que las actualizaciones
+    incrementales. Retorna cuántos detalles se procesaron. Commit afuera.
+    """
+    db.execute(delete(DailyDiseaseStats))
+    db.execute(delete(DailyProbabilityHistogram))
+
+    stmt = (
+        select(Diagnosis.generated_at, DiagnosisDetail.disease_id, Diagnosis.status,
+               DiagnosisDetail.probability)
+        .join(DiagnosisDetail, DiagnosisDetail.diagnosis_id == Diagnosis.id)
+    )
+    counts, histogram = {}, {}
+    total = 0
+    for rows in db.execute(stmt, execution_options={"yield_per": batch_size}).partitions():
+        _accumulate_stats(counts, histogram, ((*row, 1) for row in rows))
+        total += len(rows)
+    _write_stats(db, counts, histogram)
+    return total
+
+
+# 13) Tablero: solo lee las tablas agregadas (costo fijo por día consultado)
+def get_daily_stats(db: Session, date_from: date, date_to: date, disease_code: str = None):
+    """Filas (day, disease_code, status, diagnoses_count, probability_sum_e4), ambas fechas inclusive."""
+    stmt = (
+        select(DailyDiseaseStats.day, Disease.disease_code, DailyDiseaseStats.status,
+               DailyDiseaseStats.diagnoses_count, DailyDiseaseStats.probability_sum_e4)
+        .join(Disease, DailyDiseaseStats.disease_id == Disease.id)
+        .where(DailyDiseaseStats.day >= date_from, DailyDiseaseStats.day <= date_to,
+               DailyDiseaseStats.diagnoses_count > 0)
+        .order_by(DailyDiseaseStats.day, Disease.disease_code, DailyDiseaseStats.status)
+    )
+    if disease_code:
+        stmt = stmt.where(Disease.disease_code == disease_code)
+    return db.execute(stmt).all()
+
+
+def get_probability_histogram(db: Session, date_from: date, date_to: date,
+                              disease_code: str = None) -> dict:
+    """Retorna {disease_code: [conteo por bucket de 0.01]} para el rango de fechas."""
+    stmt = (
+        select(Disease.disease_code, DailyProbabilityHistogram.bucket,
+               func.sum(DailyProbabilityHistogram.diagnoses_count))
+        .join(Disease, DailyProbabilityHistogram.disease_id == Disease.id)
+        .where(DailyProbabilityHistogram.day >= date_from,
+               DailyProbabilityHistogram.day <= date_to)
+        .group_by(Disease.disease_code, DailyProbabilityHistogram.bucket)
+    )
+    if disease_code:
+        stmt = stmt.where(Disease.disease_code == disease_code)
+    histograms = {}
+    for code, bucket, n in db.execute(stmt):
+        histograms.setdefault(code, [0] * HISTOGRAM_BUCKETS)[bucket] += int(n)
+    return histograms
+
+
+def histogram_percentile(counts: list, q: float):
+    """Percentil q (0-1) aproximado con el centro del bucket (resolución 0.01)."""
+    total = sum(counts)
+    if total == 0:
+        return None
+    threshold = q * total
+    cumulative = 0
+    for bucket, n in enumerate(counts):
+        cumulative += n
+        if cumulative >= threshold and n:
+            return (bucket + 0.5) / HISTOGRAM_BUCKETS
+    return (len(counts) - 0.5) / HISTOGRAM_BUCKETS
+
+
+# 14) Crear un diagnóstico con varias enfermedades candidatas (panel completo):
+# un solo Diagnosis y un detalle por enfermedad, en la misma transacción
+@traced("db.create_diagnosis")
+def create_diagnosis_with_candidates(
+    db: Session,
+    user_id: int,
+    candidates,
+    final_description: str,
+    generated_at: datetime = None,
+    status: str = "pending",
+    symptoms=(),
+) -> Diagnosis:
+    """
+    `candidates` es un iterable de DiagnosisCandidate o tuplas
+    (disease_code, probability, features, model_hash), sin enfermedades
+    repetidas (uq_diag_disease). `symptoms` son nombres de síntomas ya
+    registrados. Commit afuera.
+    """
+    candidates = [DiagnosisCandidate(*c) for c in candidates]
+    if not candidates:
+        raise ValueError("At least one candidate disease is required")
+    disease_codes = [c.disease_code for c in candidates]
+    if len(set(disease_codes)) != len(disease_codes):
+        raise ValueError(f"Repeated candidate diseases: {disease_codes}")
+
+    diagnosis = Diagnosis(
+        user_id=user_id,
+        final_description=final_description,
+        status=status,
+        # Explícito (no server_default) para saber a qué día sumarlo en las estadísticas
+        generated_at=generated_at or datetime.now(timezone.utc),
+    )
+    db.add(diagnosis)
+    db.flush()  # genera diagnosis.id
+
+    details = [
+        DiagnosisDetail(
+            diagnosis_id=diagnosis.id,
+            disease_id=get_disease_id(db, c.disease_code),
+            probability=round(float(c.probability), 4),
+            **_feature_columns(c.features, c.model_hash),
+        )
+        for c in candidates
+    ]
+    db.add_all(details)
+    _record_stats(db, [
+        (diagnosis.generated_at, detail.disease_id, diagnosis.status, detail.probability, 1)
+        for detail in details
+    ])
+    if symptoms:
+        add_symptoms_to_diagnosis(db, diagnosis.id, symptoms)
+
+    return diagnosis
+
+
+# ------------------------------------------------------------
+# SÍNTOMAS
+# ------------------------------------------------------------
+# Las búsquedas por combinación de síntomas no hacen un JOIN por síntoma:
+# las responde el índice invertido en memoria de symptom_index.py.
+
+# 15) Catálogo de síntomas
+def list_symptoms(db: Session) -> list:
+    return db.scalars(select(Symptom).order_by(Symptom.name)).all()
+
+
+def create_symptom(db: Session, name: str, description: str = None) -> Symptom:
+    name = name.strip()
+    if not name:
+        raise ValueError("Symptom name is required")
+    if db.scalar(select(Symptom.id).where(Symptom.name == name)) is not None:
+        raise ValueError(f"Symptom {name} already exists")
+    symptom = Symptom(name=name, description=description or None)
+    db.add(symptom)
+    db.flush()
+    return symptom
+
+
+def update_symptom(db: Session, symptom_id: int, name: str = None,
+                   description: str = None) -> Symptom:
+    """Renombra o describe un síntoma; retorna None si no existe. Commit afuera."""
+    symptom = db.get(Symptom, symptom_id)
+    if symptom is None:
+        return None
+    if name is not None and name.strip() != symptom.name:
+        name = name.strip()
+        if not name:
+            raise ValueError("Symptom name is required")
+        if db.scalar(select(Symptom.id).where(Symptom.name == name)) is not None:
+            raise ValueError(f"Symptom {name} already exists")
+        symptom.name = name
+    if description is not None:
+        symptom.description = description or None
+    return symptom
+
+
+def delete_symptom(db: Session, symptom_id: int) -> bool:
+    """
+    Borra un síntoma del catálogo. Si ya está registrado en algún diagnóstico
+    lanza ValueError (diagnosis_symptoms lo referencia con RESTRICT).
+    """
+    symptom = db.get(Symptom, symptom_id)
+    if symptom is None:
+        return False
+    in_use = db.scalar(
+        select(DiagnosisSymptom.id).where(DiagnosisSymptom.symptom_id == symptom_id).limit(1)
+    )
+    if in_use is not None:
+        raise ValueError(f"Symptom {symptom.name} is recorded in diagnoses")
+    db.delete(symptom)
+    return True
+
+
+def get_symptom_ids(db: Session, names, create_missing: bool = False) -> dict:
+    """
+    {nombre: id} para los síntomas dados. Con create_missing=True registra los
+    que falten (un INSERT ... ON CONFLICT DO NOTHING); si no, lanza ValueError.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    symptom_ids = dict(
+        db.execute(select(Symptom.name, Symptom.id).where(Symptom.name.in_(names))).all()
+    )
+    missing = names - symptom_ids.keys()
+    if missing and create_missing:
+        dialect_insert = _dialect_insert(db)
+        if dialect_insert is None:
+            db.add_all([Symptom(name=name) for name in sorted(missing)])
+            db.flush()
+        else:
+            db.execute(
+                dialect_insert(Symptom.__table__).on_conflict_do_nothing(
+                    index_elements=["name"]
+                ),
+                [{"name": name} for name in sorted(missing)],
+            )
+        symptom_ids.update(
+            db.execute(select(Symptom.name, Symptom.id).where(Symptom.name.in_(missing))).all()
+        )
+        missing = names - symptom_ids.keys()
+    if missing:
+        raise ValueError(f"Symptoms not found: {', '.join(sorted(missing))}")
+    return symptom_ids
+
+
+# 16) Registrar varios síntomas en un diagnóstico con un solo INSERT
+def add_symptoms_to_diagnosis(db: Session, diagnosis_id: int, symptom_names,
+                              create_missing: bool = False) -> int:
+    """
+    Los síntomas que el diagnóstico ya tenía se ignoran. Retorna cuántos
+    síntomas distintos se pidieron registrar. Commit afuera.
+    """
+    symptom_ids = get_symptom_ids(db, symptom_names, create_missing=create_missing)
+    if not symptom_ids:
+        return 0
+    rows = [
+        {"diagnosis_id": diagnosis_id, "symptom_id": symptom_id}
+        for symptom_id in sorted(symptom_ids.values())
+    ]
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is None:
+        existing = set(db.scalars(
+            select(DiagnosisSymptom.symptom_id).where(DiagnosisSymptom.diagnosis_id == diagnosis_id)
+        ))
+        rows = [row for row in rows if row["symptom_id"] not in existing]
+        if rows:
+            db.execute(insert(DiagnosisSymptom.__table__), rows)
+    else:
+        db.execute(
+            dialect_insert(DiagnosisSymptom.__table__).on_conflict_do_nothing(
+                index_elements=["diagnosis_id", "symptom_id"]
+            ),
+            rows,
+        )
+    return len(symptom_ids)
+
+
+# 17) Síntomas de varios diagnósticos (para mostrarlos junto al historial)
+def get_diagnosis_symptoms(db: Session, diagnosis_ids) -> dict:
+    """{diagnosis_id: [nombres de síntomas]} de los diagnósticos dados."""
+    diagnosis_ids = list(set(diagnosis_ids))
+    if not diagnosis_ids:
+        return {}
+    result = {}
+    rows = db.execute(
+        select(DiagnosisSymptom.diagnosis_id, Symptom.name)
+        .join(Symptom, DiagnosisSymptom.symptom_id == Symptom.id)
+        .where(DiagnosisSymptom.diagnosis_id.in_(diagnosis_ids))
+        .order_by(DiagnosisSymptom.diagnosis_id, Symptom.name)
+    )
+    for diagnosis_id, name in rows:
+        result.setdefault(diagnosis_id, []).append(name)
+    return result
+
+
+# 18) Diagnósticos que tienen TODOS los síntomas dados (en una ventana de tiempo)
+def find_diagnoses_by_symptoms(db: Session, symptom_names, date_from: datetime = None,
+                               date_to: datetime = None, limit: int = 50):
+    """
+    Intersección de las listas del índice invertido (symptom_index) en lugar
+    de un JOIN a diagnosis_symptoms por cada síntoma. `date_to` es exclusivo.
+    Retorna (total, filas del historial de los `limit` diagnósticos más
+    recientes), con las mismas columnas que search_diagnoses.
+    """
+    from symptom_index import find_diagnosis_ids  # diferido: importa NumPy
+
+    names = {name.strip() for name in symptom_names if name and name.strip()}
+    if not names:
+        raise ValueError("At least one symptom is required")
+    symptom_ids = dict(
+        db.execute(select(Symptom.name, Symptom.id).where(Symptom.name.in_(names))).all()
+    )
+    if names - symptom_ids.keys():
+        return 0, []  # un síntoma que no existe no lo tiene ningún diagnóstico
+
+    total, diagnosis_ids = find_diagnosis_ids(
+        db, symptom_ids.values(), date_from=date_from, date_to=date_to, limit=limit,
+    )
+    if not diagnosis_ids:
+        return total, []
+    rows = db.execute(_history_statement(diagnosis_ids=diagnosis_ids, limit=None)).all()
+    return total, rows
+
+
+# 19) Reemplazar probabilidades guardadas (re-puntuación con un modelo nuevo)
+_details = DiagnosisDetail.__table__
+_UPDATE_DETAIL_PROBABILITY = (
+    update(_details)
+    .where(_details.c.id == bindparam("detail_id"))
+    .values(probability=bindparam("new_probability"), model_hash=bindparam("new_model_hash"))
+)
+_UPDATE_FINAL_DESCRIPTION = (
+    update(_diagnoses)
+    .where(_diagnoses.c.id == bindparam("diagnosis_id"))
+    .values(final_description=bindparam("new_description"))
+)
+# Escala de diagnosis_details.probability (Numeric(5, 4))
+_PROBABILITY_SCALE = Decimal("0.0001")
+
+
+def update_detail_probabilities(db: Session, probabilities: dict, model_hash: str,
+                                labels: dict = None, describe=None) -> int:
+    """
+    probabilities: {detail_id: nueva probabilidad}. Solo los detalles cuya
+    probabilidad cambia (comparada a la escala de la columna) reciben un
+    UPDATE por clave primaria (executemany en Core, ~3x más rápido que el bulk
+    UPDATE del ORM) y su corrección de las estadísticas agregadas (se descuenta
+    la probabilidad anterior y se suma la nueva); a los demás solo se les
+    asigna model_hash, con un único UPDATE.
+    Con labels ({detail_id: etiqueta}) y describe(descripción, etiqueta) ->
+    descripción, se regenera además final_description de esos diagnósticos.
+    Todo en la transacción actual. Retorna cuántos detalles cambiaron. Commit afuera.
+    """
+    if not probabilities:
+        return 0
+    # FOR UPDATE (PostgreSQL): nadie cambia la probabilidad entre leerla y reemplazarla
+    old = db.execute(
+        select(_details.c.id, Diagnosis.generated_at, _details.c.disease_id,
+               Diagnosis.status, _details.c.probability, Diagnosis.id,
+               Diagnosis.final_description)
+        .join(Diagnosis, Diagnosis.id == _details.c.diagnosis_id)
+        .where(_details.c.id.in_(list(probabilities)))
+        .with_for_update()
+    ).all()
+
+    changed, unchanged, entries, descriptions = [], [], [], []
+    for detail_id, generated_at, disease_id, status, probability, diagnosis_id, description in old:
+        new_probability = Decimal(float(probabilities[detail_id])).quantize(_PROBABILITY_SCALE)
+        if Decimal(probability).quantize(_PROBABILITY_SCALE) == new_probability:
+            unchanged.append(detail_id)
+            continue
+        changed.append({"detail_id": detail_id, "new_probability": new_probability,
+                        "new_model_hash": model_hash})
+        entries.append((generated_at, disease_id, status, probability, -1))
+        entries.append((generated_at, disease_id, status, new_probability, 1))
+        if describe is not None and labels is not None and description:
+            new_description = describe(description, labels[detail_id])
+            if new_description != description:
+                descriptions.append({"diagnosis_id": diagnosis_id,
+                                     "new_description": new_description})
+
+    if changed:
+        db.execute(_UPDATE_DETAIL_PROBABILITY, changed)
+    if unchanged:
+        db.execute(
+            update(_details).where(_details.c.id.in_(unchanged)).values(model_hash=model_hash)
+        )
+    if descriptions:
+        db.execute(_UPDATE_FINAL_DESCRIPTION, descriptions)
+    _record_stats(db, entries)
+    return len(changed)
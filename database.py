@@ -1,45 +1,101 @@
 # database.py
 import os
-from sqlalchemy import create_engine
+import sys
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
-import streamlit as st
 
 # Carga variables de entorno desde .env
 load_dotenv()
 
-# Función para obtener DATABASE_URL de forma segura
-def get_database_url():
-    # 1. Intentar leer de Streamlit Cloud (si está disponible)
-    try:
-        import streamlit as st
-        if "DATABASE_URL" in st.secrets:
-            return st.secrets["DATABASE_URL"]
-    except:
-        pass  # Streamlit no está disponible, estamos local
+# Función para obtener una configuración de forma segura
+def get_setting(name: str, default=None):
+    # 1. Intentar leer de Streamlit Cloud (si está disponible). Solo si la app
+    # ya importó streamlit: importarlo aquí le sumaría ~230 ms al arranque de
+    # batch_score.py, rescore.py o el servicio de inferencia
+    if "streamlit" in sys.modules:
+        st = sys.modules["streamlit"]
+        try:
+            if name in st.secrets:
+                return st.secrets[name]
+        except Exception:
+            pass  # Sin secrets.toml: se usa el entorno
+
+    # 2. Intentar leer de .env / variables de entorno
+    value = os.getenv(name)
+    if value not in (None, ""):
+        return value
+
+    # 3. Valor por defecto
+    return default
 
-    # 2. Intentar leer de .env
-    db_url = os.getenv("DATABASE_URL")
-    if db_url:
-        return db_url
 
-    # 3. Fallback seguro (solo local)
-    return "sqlite:///./meddiag.db"
+def _get_bool(name: str, default: bool) -> bool:
+    return str(get_setting(name, default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_database_url():
+    # Fallback seguro (solo local)
+    return get_setting("DATABASE_URL", "sqlite:///./meddiag.db")
 
 DATABASE_URL = get_database_url()
 
+# Parámetros del pool (PostgreSQL). Render cierra las conexiones inactivas, por
+# eso se reciclan antes de ese límite y se verifican con pre-ping al tomarlas.
+POOL_SIZE = int(get_setting("DB_POOL_SIZE", 5))
+MAX_OVERFLOW = int(get_setting("DB_MAX_OVERFLOW", 10))
+POOL_TIMEOUT = int(get_setting("DB_POOL_TIMEOUT", 30))
+POOL_RECYCLE = int(get_setting("DB_POOL_RECYCLE", 280))
+POOL_PRE_PING = _get_bool("DB_POOL_PRE_PING", True)
+# Tiempo máximo por sentencia en ms (0 = sin límite)
+STATEMENT_TIMEOUT_MS = int(get_setting("DB_STATEMENT_TIMEOUT_MS", 0))
+# Espera máxima de SQLite cuando otra sesión tiene la base bloqueada
+SQLITE_BUSY_TIMEOUT_MS = int(get_setting("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL permite lectores concurrentes con un escritor; NORMAL es seguro en WAL
+    # y evita un fsync por commit; busy_timeout espera en vez de fallar con
+    # "database is locked".
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
 # Para SQLite necesitamos un argumento extra en check_same_thread
 if DATABASE_URL.startswith("sqlite"):
     engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", _set_sqlite_pragmas)
 else:
-    engine = create_engine(DATABASE_URL)
+    connect_args = {}
+    if STATEMENT_TIMEOUT_MS > 0 and DATABASE_URL.startswith("postgres"):
+        connect_args["options"] = f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=POOL_PRE_PING,
+        connect_args=connect_args,
+    )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-# Probar conexión solo una vez y cerrarla
-try:
-    with engine.connect() as conn:
-        print("Conexión OK:", DATABASE_URL)
-except Exception as e:
-    print("Error de conexión:", e)
\ No newline at end of file
+
+def check_connection():
+    """Verifica la conexión con la base de datos. Retorna (ok, error)."""
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True, None
+    except Exception as e:
+        return False, e
+
+
+if __name__ == "__main__":
+    ok, error = check_connection()
+    print("Conexión OK:" if ok else "Error de conexión:", error or engine.url)
@@ -0,0 +1,233 @@
+# diagnosis_writer.py
+"""
+Escritura diferida (write-behind) de diagnósticos.
+
+La app encola cada diagnóstico y sigue renderizando; un hilo en segundo plano
+los toma de una cola acotada, los agrupa y los guarda en bloque con
+bulk_create_diagnoses, reintentando ante errores transitorios de conexión.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from database import SessionLocal, get_setting
+from crud import (
+    get_or_create_user,
+    bulk_create_diagnoses,
+    create_diagnosis_with_candidates,
+    user_cache_key,
+    DiagnosisRecord,
+)
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(get_setting("WRITER_QUEUE_SIZE", 1000))
+BATCH_SIZE = int(get_setting("WRITER_BATCH_SIZE", 100))
+# Segundos que se espera a que lleguen más diagnósticos antes de escribir un lote
+FLUSH_INTERVAL = float(get_setting("WRITER_FLUSH_INTERVAL", 0.2))
+MAX_RETRIES = int(get_setting("WRITER_MAX_RETRIES", 5))
+
+# Diagnóstico pendiente: datos del paciente + resultado del modelo (y el vector
+# de entrada con el hash del modelo, para poder re-puntuarlo después).
+# `user_id`: id ya resuelto del paciente (se omite la búsqueda). `user_cache`:
+# dict (p. ej. de la sesión de Streamlit) donde el escritor deja el id
+# resuelto bajo user_cache_key, para que la siguiente predicción lo traiga.
+# `candidates`: panel completo, tupla de DiagnosisCandidate que se guarda como
+# un solo diagnóstico con un detalle por enfermedad (disease_code, probability,
+# features y model_hash se ignoran). `symptoms`: nombres de síntomas del
+# catálogo que se registran en el diagnóstico.
+PendingDiagnosis = namedtuple(
+    "PendingDiagnosis",
+    ["name", "email", "age", "gender", "phone_number",
+     "disease_code", "probability", "description", "generated_at",
+     "features", "model_hash", "user_id", "user_cache", "candidates", "symptoms"],
+    defaults=(None, None, None, None, None, None, ()),
+)
+
+
+def _is_transient(error: Exception) -> bool:
+    # Conexión caída, base bloqueada, timeouts: vale la pena reintentar
+    return isinstance(error, OperationalError) or (
+        isinstance(error, DBAPIError) and error.connection_invalidated
+    )
+
+
+class DiagnosisWriter:
+    def __init__(self, session_factory=SessionLocal, queue_size: int = QUEUE_SIZE,
+                 batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL,
+                 max_retries: int = MAX_RETRIES, retry_backoff: float = 0.5):
+        self._session_factory = session_factory
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+
+        self.written = 0
+        self.failed = 0
+        self.last_error = None
+
+    # ---------------- API pública ----------------
+    def submit(self, item: PendingDiagnosis, timeout: float = 0.5) -> bool:
+        """
+        Encola un diagnóstico. Retorna False si la cola sigue llena después de
+        `timeout` segundos (el llamador decide si lo guarda de forma síncrona).
+        """
+        if item.generated_at is None:
+            item = item._replace(generated_at=datetime.now(timezone.utc))
+        self.start()
+        try:
+            self._queue.put(item, timeout=timeout)
+            return True
+        except queue.Full:
+            return False
+
+    def backlog(self) -> int:
+        """Diagnósticos encolados o en escritura que aún no llegan a la BD."""
+        return self._queue.unfinished_tasks
+
+    def flush(self, timeout: float = None) -> bool:
+        """Espera a que la cola se vacíe. Retorna False si se agotó el tiempo."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.backlog():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(
+                    target=self._run, name="diagnosis-writer", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Escribe lo pendiente y detiene el hilo."""
+        if self._thread is None:
+            return
+        self.flush(timeout)
+        self._stopping = True
+        self._thread.join(timeout)
+
+    # ---------------- Hilo escritor ----------------
+    def _run(self):
+        while not self._stopping:
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._write(batch)
+                self.written += len(batch)
+                return
+            except Exception as e:
+                if _is_transient(e) and attempt < self.max_retries:
+                    time.sleep(self.retry_backoff * 2 ** attempt)
+                    continue
+                if not _is_transient(e) and len(batch) > 1:
+                    # Un registro inválido no debe tumbar a todo el lote
+                    for item in batch:
+                        self._write_batch([item])
+                    return
+                self.failed += len(batch)
+                self.last_error = e
+                logger.error("No se pudieron guardar %d diagnósticos: %s", len(batch), e)
+                return
+
+    def _write(self, batch):
+        with span("writer.batch"), self._session_factory() as db:
+            try:
+                users = {}  # user_cache_key -> id del paciente dentro del lote
+                resolved = []
+                records = []
+                for item in batch:
+                    key = user_cache_key(item.name, item.email, item.age, item.gender,
+                                         item.phone_number)
+                    user = item.user_id or users.get(key)
+                    if user is None:
+                        user = get_or_create_user(
+                            db,
+                            name=item.name,
+                            email=item.email,
+                            age=item.age,
+                            gender=item.gender,
+                            phone_number=item.phone_number,
+                        ).id
+                        users[key] = user
+                    if item.user_cache is not None:
+                        resolved.append((item.user_cache, key, user))
+                    if item.candidates:
+                        create_diagnosis_with_candidates(
+                            db, user, item.candidates, item.description,
+                            generated_at=item.generated_at, symptoms=item.symptoms or (),
+                        )
+                        continue
+                    records.append(DiagnosisRecord(
+                        user=user,
+                        disease_code=item.disease_code,
+                        probability=item.probability,
+                        description=item.description,
+                        symptoms=item.symptoms or (),
+                        generated_at=item.generated_at,
+                        features=item.features,
+                        model_hash=item.model_hash,
+                    ))
+                bulk_create_diagnoses(db, records)
+                with span("db.commit"):
+                    db.commit()
+                # Solo después del commit: un id de una transacción revertida no sirve
+                for user_cache, key, user_id in resolved:
+                    user_cache[key] = user_id
+            except Exception:
+                db.rollback()
+                raise
+
+
+# Escritor único por proceso (Streamlit re-ejecuta app.py, pero no este módulo)
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> DiagnosisWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = DiagnosisWriter()
+                atexit.register(_writer.stop)
+    return _writer
@@ -0,0 +1,141 @@
+# features.py
+import struct
+
+# ------------------------------------------------------------
+# CONFIGURACIÓN DE CAMPOS Y VALORES POR DEFECTO
+# ------------------------------------------------------------
+
+# Versión del orden de características. Subirla si cambia algún *_FEATURE_ORDER,
+# para no mezclar vectores guardados con órdenes distintos.
+FEATURE_SCHEMA_VERSION = 1
+
+# Diabetes: orden estándar Pima
+DIABETES_FEATURE_ORDER = [
+    "Pregnancies",
+    "Glucose",
+    "BloodPressure",
+    "SkinThickness",
+    "Insulin",
+    "BMI",
+    "DiabetesPedigreeFunction",
+    "Age",
+]
+
+DIABETES_DEFAULTS = {
+    "Pregnancies": 0.0,
+    "SkinThickness": 20.0,
+    "Insulin": 80.0,
+    "DiabetesPedigreeFunction": 0.5,
+}
+
+# Heart disease: orden estándar UCI
+HEART_FEATURE_ORDER = [
+    "age",
+    "sex",
+    "cp",
+    "trestbps",
+    "chol",
+    "fbs",
+    "restecg",
+    "thalach",
+    "exang",
+    "oldpeak",
+    "slope",
+    "ca",
+    "thal",
+]
+
+HEART_DEFAULTS = {
+    "fbs": 0.0,
+    "restecg": 0.0,
+    "slope": 1.0,
+    "thal": 2.0,
+}
+
+# Parkinson: 22 características originales
+PARK_FEATURE_ORDER = [
+    "fo", "fhi", "flo", "jitter_percent", "jitter_abs",
+    "RAP", "PPQ", "DDP", "shimmer", "shimmer_dB",
+    "APQ3", "APQ5", "APQ", "DDA", "NHR", "HNR",
+    "RPDE", "DFA", "spread1", "spread2", "D2", "PPE",
+]
+
+PARK_DEFAULTS = {
+    "flo": 100.0,
+    "jitter_abs": 0.0001,
+    "RAP": 0.003,
+    "PPQ": 0.003,
+    "DDP": 0.01,
+    "shimmer_dB": 0.02,
+    "APQ3": 0.015,
+    "APQ5": 0.02,
+    "APQ": 0.025,
+    "DDA": 0.04,
+    "RPDE": 0.5,
+    "DFA": 0.75,
+    "spread1": -5.0,
+    "spread2": 0.5,
+    "D2": 2.0,
+}
+
+# Código de enfermedad -> (orden de columnas, valores por defecto)
+FEATURE_ORDERS = {
+    "DIAB": DIABETES_FEATURE_ORDER,
+    "HEART": HEART_FEATURE_ORDER,
+    "PARK": PARK_FEATURE_ORDER,
+}
+
+FEATURE_DEFAULTS = {
+    "DIAB": DIABETES_DEFAULTS,
+    "HEART": HEART_DEFAULTS,
+    "PARK": PARK_DEFAULTS,
+}
+
+# Claves de translations con el mensaje (positivo, negativo) de cada enfermedad
+RESULT_MESSAGE_KEYS = {
+    "DIAB": ("positive_diabetes", "negative_diabetes"),
+    "HEART": ("positive_heart", "negative_heart"),
+    "PARK": ("positive_parkinson", "negative_parkinson"),
+}
+
+
+def required_features(disease_code: str) -> list:
+    """Características sin valor por defecto (deben venir en los datos)."""
+    defaults = FEATURE_DEFAULTS[disease_code]
+    return [f for f in FEATURE_ORDERS[disease_code] if f not in defaults]
+
+
+def build_feature_vector(disease_code: str, values: dict) -> list:
+    """
+    Arma el vector de entrada en el orden del modelo a partir de un dict
+    {característica: valor}; las ausentes se completan con *_DEFAULTS.
+    """
+    defaults = FEATURE_DEFAULTS[disease_code]
+    missing = [f for f in required_features(disease_code) if values.get(f) is None]
+    if missing:
+        raise ValueError(f"Missing features for {disease_code}: {', '.join(missing)}")
+    return [
+        float(values[f]) if values.get(f) is not None else defaults[f]
+        for f in FEATURE_ORDERS[disease_code]
+    ]
+
+
+# ------------------------------------------------------------
+# VECTORES GUARDADOS EN LA BASE DE DATOS
+# ------------------------------------------------------------
+# Cada vector se guarda como float32 little-endian: 4 bytes por característica.
+
+def pack_features(row) -> bytes:
+    return struct.pack(f"<{len(row)}f", *(float(v) for v in row))
+
+
+def unpack_features(blob: bytes):
+    """Vector NumPy float32 de solo lectura sobre el mismo buffer (sin copiar)."""
+    import numpy as np
+    return np.frombuffer(blob, dtype="<f4")
+
+
+def unpack_feature_matrix(blobs, n_features: int):
+    """Une varios vectores en una matriz (n, n_features) con una sola copia."""
+    import numpy as np
+    return np.frombuffer(b"".join(blobs), dtype="<f4").reshape(-1, n_features)
@@ -0,0 +1,142 @@
+# history_export.py
+"""
+Exportación completa del historial de diagnósticos a CSV o Parquet.
+
+Recorre la consulta del historial por lotes (crud.iter_history, con
+yield_per) y escribe cada lote apenas llega: la memoria queda acotada por
+--batch-size sin importar cuántos diagnósticos existan.
+
+La descarga desde la app entrega el archivo a través del proceso de
+Streamlit, que lo tiene completo en memoria: ahí la exportación se limita a
+HISTORY_EXPORT_MAX_ROWS filas y HISTORY_EXPORT_MAX_BYTES bytes, y para
+exportaciones mayores la app muestra el comando equivalente de este script.
+
+Uso:
+    python history_export.py -o historial.csv
+    python history_export.py -o historial.parquet --disease HEART --date-from 2025-01-01
+"""
+import argparse
+import shlex
+import sys
+import time
+from datetime import datetime, timedelta
+
+from database import SessionLocal, get_setting
+from crud import iter_history
+from tabular_files import open_result_writer
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Límites de la descarga desde la app (ver arriba)
+UI_MAX_ROWS = int(get_setting("HISTORY_EXPORT_MAX_ROWS", 100_000))
+UI_MAX_BYTES = int(get_setting("HISTORY_EXPORT_MAX_BYTES", 50 * 1024 * 1024))
+
+# Columnas y tipos del archivo (ver tabular_files): fijos, para que un lote con
+# todos los correos vacíos no cambie el tipo de la columna en Parquet
+EXPORT_SCHEMA = [
+    ("diagnosis_id", "int64"),
+    ("generated_at", "timestamp[us]"),
+    ("status", "string"),
+    ("patient", "string"),
+    ("email", "string"),
+    ("disease", "string"),
+    ("disease_code", "string"),
+    ("probability", "float64"),
+    ("final_description", "string"),
+]
+EXPORT_COLUMNS = [name for name, _ in EXPORT_SCHEMA]
+
+
+def _rows_to_columns(rows) -> dict:
+    return {
+        "diagnosis_id": [r.id for r in rows],
+        "generated_at": [r.generated_at for r in rows],
+        "status": [r.status for r in rows],
+        "patient": [r.user_name for r in rows],
+        "email": [r.user_email for r in rows],
+        "disease": [r.disease_name for r in rows],
+        "disease_code": [r.disease_code for r in rows],
+        "probability": [float(r.probability) for r in rows],
+        "final_description": [r.final_description for r in rows],
+    }
+
+
+class ExportTooLarge(Exception):
+    """La exportación supera max_rows (el archivo queda incompleto)."""
+
+
+def export_history(db, output_path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                   max_rows: int = None, **filters) -> int:
+    """
+    Escribe el historial (con los filtros de search_diagnoses) en output_path;
+    .parquet/.pq -> Parquet (un row group por lote), cualquier otra -> CSV.
+    Con max_rows lanza ExportTooLarge apenas se pasa del límite, sin recorrer
+    el resto. Retorna la cantidad de filas exportadas.
+    """
+    writer = open_result_writer(output_path, EXPORT_SCHEMA)  # sin filas: solo encabezado
+    total = 0
+    try:
+        for rows in iter_history(db, batch_size=batch_size, **filters):
+            if max_rows is not None and total + len(rows) > max_rows:
+                raise ExportTooLarge(f"More than {max_rows} rows to export")
+            writer.write(_rows_to_columns(rows))
+            total += len(rows)
+    finally:
+        writer.close()
+    return total
+
+
+def cli_command(output_path: str, name: str = None, email: str = None,
+                disease_code: str = None, status: str = None,
+                date_from: datetime = None, date_to: datetime = None) -> str:
+    """Comando de este script con los mismos filtros (date_to exclusivo, como en la app)."""
+    args = ["python history_export.py", "-o", shlex.quote(output_path)]
+    for option, value in (("--name", name), ("--email", email),
+                          ("--disease", disease_code), ("--status", status)):
+        if value:
+            args += [option, shlex.quote(value)]
+    if date_from:
+        args += ["--date-from", f"{date_from:%Y-%m-%d}"]
+    if date_to:
+        # --date-to es inclusivo
+        args += ["--date-to", f"{date_to - timedelta(days=1):%Y-%m-%d}"]
+    return " ".join(args)
+
+
+def _parse_date(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta el historial de diagnósticos.")
+    parser.add_argument("-o", "--output", required=True, help="Archivo de salida (.csv o .parquet)")
+    parser.add_argument("--name", help="Nombre del paciente")
+    parser.add_argument("--email", help="Correo del paciente")
+    parser.add_argument("--disease", choices=["DIAB", "HEART", "PARK"])
+    parser.add_argument("--status", choices=["pending", "confirmed", "discarded"])
+    parser.add_argument("--date-from", type=_parse_date, help="Desde (AAAA-MM-DD, inclusive)")
+    parser.add_argument("--date-to", type=_parse_date, help="Hasta (AAAA-MM-DD, inclusive)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        total = export_history(
+            db,
+            args.output,
+            batch_size=args.batch_size,
+            name=args.name,
+            email=args.email,
+            disease_code=args.disease,
+            status=args.status,
+            date_from=args.date_from,
+            # Fecha final inclusiva: hasta el inicio del día siguiente
+            date_to=args.date_to + timedelta(days=1) if args.date_to else None,
+        )
+    elapsed = time.perf_counter() - started
+    print(f"{total} filas exportadas a {args.output} en {elapsed:.1f} s "
+          f"({total / elapsed:,.0f} filas/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
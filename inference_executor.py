@@ -0,0 +1,142 @@
+# inference_executor.py
+"""
+Ejecutor de inferencia en procesos separados.
+
+Con INFERENCE_WORKERS > 0 las predicciones corren en un pool de procesos
+(cada uno carga los modelos de saved_models una sola vez al arrancar), así la
+puntuación no compite por el GIL con la interfaz de Streamlit y se reparte
+entre los núcleos. Con 0 (por defecto) se puntúa en el mismo proceso y los
+futures se devuelven ya resueltos, con la misma interfaz; el panel completo
+(submit_panel) usa ahí un pequeño pool de hilos para correr sus modelos a la
+vez, ya que NumPy y sklearn liberan el GIL durante la mayor parte del cálculo.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from database import get_setting
+from model_registry import MODEL_FILES, get_model, get_model_hash
+from scoring import predict_many
+from tracing import span
+
+WORKERS = int(get_setting("INFERENCE_WORKERS", 0))
+
+
+def _init_worker():
+    # Cada proceso carga los modelos una vez; el registro los recarga si cambian
+    for disease_code in MODEL_FILES:
+        get_model(disease_code)
+
+
+def _score(disease_code: str, rows, use_cache: bool):
+    with span("model.predict", disease=disease_code):
+        labels, probas = predict_many(disease_code, rows, use_cache=use_cache)
+    # El hash sale del proceso que puntuó: el padre no necesita cargar el modelo
+    return labels, probas, get_model_hash(disease_code)
+
+
+def _warm():
+    return True
+
+
+def _score_one(disease_code: str, row, use_cache: bool):
+    labels, probas, model_hash = _score(disease_code, [row], use_cache)
+    return int(labels[0]), float(probas[0]), model_hash
+
+
+class InferenceExecutor:
+    def __init__(self, workers: int = WORKERS):
+        self.workers = workers
+        self._pool = None
+        self._threads = None  # panel en el mismo proceso (workers <= 0)
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: hacer fork de un proceso con hilos (Streamlit) no es seguro
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return self._pool
+
+    def _submit(self, fn, *args) -> Future:
+        if self.workers <= 0:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        try:
+            return self._get_pool().submit(fn, *args)
+        except BrokenProcessPool:
+            # Un worker murió (p. ej. por memoria): se levanta un pool nuevo
+            with self._lock:
+                self._pool = None
+            return self._get_pool().submit(fn, *args)
+
+    def _get_threads(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(
+                    max_workers=len(MODEL_FILES), thread_name_prefix="inference"
+                )
+            return self._threads
+
+    def submit(self, disease_code: str, rows, use_cache: bool = True) -> Future:
+        """Puntúa un bloque de filas. El future resuelve a (labels, positive_probas, model_hash)."""
+        return self._submit(_score, disease_code, rows, use_cache)
+
+    def submit_one(self, disease_code: str, row, use_cache: bool = True) -> Future:
+        """Puntúa una sola fila. El future resuelve a (label, probability, model_hash)."""
+        return self._submit(_score_one, disease_code, list(row), use_cache)
+
+    def submit_panel(self, inputs: dict, use_cache: bool = True) -> dict:
+        """
+        Puntúa una fila por enfermedad a la vez: {código: fila} -> {código:
+        future que resuelve a (label, probability, model_hash)}. Con workers
+        van al pool de procesos; si no, a hilos de este proceso.
+        """
+        if self.workers > 0:
+            return {code: self.submit_one(code, row, use_cache) for code, row in inputs.items()}
+        threads = self._get_threads()
+        return {
+            code: threads.submit(_score_one, code, list(row), use_cache)
+            for code, row in inputs.items()
+        }
+
+    def warm_up(self):
+        """Arranca los procesos (y carga sus modelos) antes de la primera predicción."""
+        if self.workers <= 0:
+            _init_worker()
+            return
+        pool = self._get_pool()
+        for future in [pool.submit(_warm) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+            if self._threads is not None:
+                self._threads.shutdown()
+                self._threads = None
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> InferenceExecutor:
+    """Ejecutor único por proceso (Streamlit re-ejecuta app.py, pero no este módulo)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = InferenceExecutor()
+        return _executor
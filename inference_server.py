@@ -0,0 +1,230 @@
+# inference_server.py
+"""
+Servicio HTTP local de inferencia con micro-lotes.
+
+Las peticiones que llegan a /predict/{DIAB|HEART|PARK} dentro de una ventana
+de pocos milisegundos se agrupan en una sola matriz NumPy por modelo, se
+puntúan con una única llamada vectorizada y cada respuesta recibe su fila.
+
+Uso:
+    python inference_server.py --port 8000 --max-batch 256 --max-wait-ms 5
+
+    curl -X POST localhost:8000/predict/DIAB \\
+        -d '{"features": {"Glucose": 150, "BloodPressure": 80, "BMI": 31, "Age": 50}}'
+
+Cuerpo de la petición: {"features": {nombre: valor}} (las características
+ausentes toman los valores por defecto de features.py) o {"input": [...]}
+con el vector completo en el orden del modelo.
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from features import FEATURE_ORDERS, build_feature_vector
+from model_registry import get_model
+from scoring import predict_many
+from tracing import metrics, span
+
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_WAIT_MS = 5.0
+# Un vector de entrada ocupa unos cientos de bytes: más que esto no es una petición válida
+MAX_BODY_BYTES = 64 * 1024
+
+
+class MicroBatcher:
+    """Agrupa las filas de peticiones concurrentes y las puntúa en bloque."""
+
+    def __init__(self, disease_code: str, max_batch: int = DEFAULT_MAX_BATCH,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.disease_code = disease_code
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self.requests = 0
+        self.batches = 0
+        self._thread = threading.Thread(
+            target=self._run, name=f"batcher-{disease_code}", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, row) -> Future:
+        future = Future()
+        self._queue.put((row, future))
+        return future
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": self.requests / self.batches if self.batches else 0.0,
+        }
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                X = np.array([row for row, _ in batch], dtype=np.float64)
+                with span("model.predict", disease=self.disease_code):
+                    labels, probas = predict_many(self.disease_code, X)
+            except Exception:
+                # Fila por fila: el error solo le llega a la petición que lo causó
+                self._score_one_by_one(batch)
+            else:
+                for (_, future), label, proba in zip(batch, labels, probas):
+                    future.set_result((int(label), float(proba)))
+            self.requests += len(batch)
+            self.batches += 1
+
+    def _score_one_by_one(self, batch):
+        for row, future in batch:
+            try:
+                labels, probas = predict_many(self.disease_code, np.array([row], dtype=np.float64))
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result((int(labels[0]), float(probas[0])))
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 para reutilizar la conexión entre peticiones (keep-alive)
+    protocol_version = "HTTP/1.1"
+    # Cabeceras y cuerpo salen en escrituras separadas: sin TCP_NODELAY, Nagle
+    # y el ACK retardado añaden ~40 ms a cada respuesta
+    disable_nagle_algorithm = True
+    batchers = {}
+    request_timeout = 30.0
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "models": sorted(self.batchers)})
+        elif self.path == "/stats":
+            from prediction_cache import prediction_cache
+            self._send_json(200, {
+                "batchers": {code: b.stats() for code, b in self.batchers.items()},
+                "cache": prediction_cache.stats(),
+            })
+        elif self.path == "/metrics":
+            # Histogramas de tracing.py (vacíos si MEDDIAG_TRACING no está activo)
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        parts = self.path.strip("/").split("/")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self.close_connection = True  # no se sabe dónde termina el cuerpo
+            self._send_json(400, {"error": "Invalid Content-Length header"})
+            return
+        if length > MAX_BODY_BYTES:
+            # Se rechaza sin leer el cuerpo (y se cierra: queda sin consumir)
+            self.close_connection = True
+            self._send_json(413, {"error": f"Request body larger than {MAX_BODY_BYTES} bytes"})
+            return
+        raw = self.rfile.read(length) if length else b""
+
+        if len(parts) != 2 or parts[0] != "predict" or parts[1] not in self.batchers:
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+            return
+        disease_code = parts[1]
+
+        try:
+            payload = json.loads(raw or b"{}")
+            if "input" in payload:
+                row = [float(v) for v in payload["input"]]
+                expected = len(FEATURE_ORDERS[disease_code])
+                if len(row) != expected:
+                    raise ValueError(f"Expected {expected} values, got {len(row)}")
+            else:
+                row = build_feature_vector(disease_code, payload.get("features") or {})
+            # Un NaN o infinito haría fallar a todo el micro-lote en el modelo
+            if not np.isfinite(row).all():
+                raise ValueError("Input values must be finite numbers")
+        except (ValueError, TypeError, AttributeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            label, proba = self.batchers[disease_code].submit(row).result(self.request_timeout)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+
+        self._send_json(200, {
+            "disease_code": disease_code,
+            "prediction": label,
+            "probability": round(proba, 4),
+        })
+
+    def log_message(self, format, *args):
+        pass  # sin un print por petición
+
+
+def create_server(host: str = "127.0.0.1", port: int = 8000,
+                  max_batch: int = DEFAULT_MAX_BATCH,
+                  max_wait_ms: float = DEFAULT_MAX_WAIT_MS) -> ThreadingHTTPServer:
+    for code in FEATURE_ORDERS:
+        get_model(code)  # cargar los modelos antes de aceptar peticiones
+    handler = type("Handler", (InferenceHandler,), {
+        "batchers": {code: MicroBatcher(code, max_batch, max_wait_ms) for code in FEATURE_ORDERS},
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP de inferencia con micro-lotes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH,
+                        help="Filas máximas por llamada al modelo")
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="Ventana para reunir peticiones en un lote (0 = sin esperar)")
+    args = parser.parse_args(argv)
+
+    server = create_server(args.host, args.port, args.max_batch, args.max_wait_ms)
+    print(f"Servicio de inferencia en http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# migrations.py
+"""
+Migración de bases de datos existentes (SQLite o PostgreSQL) al esquema actual.
+
+`Base.metadata.create_all` crea las tablas nuevas con sus índices, pero no
+toca las tablas que ya existen. Este script agrega además las columnas
+(opcionales) y los índices que les falten. Es idempotente: se puede ejecutar
+varias veces.
+
+Al crear las tablas de estadísticas agregadas (daily_*) sobre una base que ya
+tiene diagnósticos, se llenan a partir del historial existente. También carga
+las enfermedades base (DIAB/HEART/PARK) si faltan: sin ellas no se puede
+guardar ningún diagnóstico.
+
+Uso:
+    python migrations.py
+    python migrations.py --rebuild-stats   # recalcula las tablas daily_*
+"""
+import argparse
+import threading
+
+from sqlalchemy import bindparam, inspect, select, text, update
+
+from database import engine as default_engine, check_connection
+from models import Base, DailyDiseaseStats, DailyProbabilityHistogram, User
+from tracing import span
+
+STATS_TABLES = (DailyDiseaseStats.__tablename__, DailyProbabilityHistogram.__tablename__)
+
+# El esquema ya quedó listo en este proceso (ver ensure_schema)
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def _existing_index_names(conn) -> set:
+    if conn.dialect.name == "sqlite":
+        # La reflexión de SQLite omite los índices por expresión (lower(name))
+        rows = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))
+        return {name for (name,) in rows}
+    inspector = inspect(conn)
+    return {
+        index["name"]
+        for table in inspector.get_table_names()
+        for index in inspector.get_indexes(table)
+    }
+
+
+def _add_missing_columns(conn) -> list:
+    """ALTER TABLE ... ADD COLUMN para las columnas nuevas (solo admite nullable)."""
+    inspector = inspect(conn)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable or column.server_default is not None:
+                raise RuntimeError(f"Cannot add column {table.name}.{column.name} automatically")
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _backfill_identity_keys(conn) -> int:
+    """
+    Asigna identity_key a los pacientes sin correo de una base anterior. Si
+    hay duplicados (antes se creaba uno por predicción) solo el más antiguo
+    recibe la clave: los demás conservan sus diagnósticos y quedan en NULL.
+    """
+    from crud import user_identity_key
+
+    users = User.__table__
+    rows = conn.execute(
+        select(users.c.id, users.c.name, users.c.age, users.c.gender, users.c.phone_number)
+        .where(users.c.email.is_(None), users.c.identity_key.is_(None))
+        .order_by(users.c.id)
+    )
+    seen = set()
+    updates = []
+    for user_id, name, age, gender, phone_number in rows:
+        key = user_identity_key(name, age, gender, phone_number)
+        if key not in seen:
+            seen.add(key)
+            updates.append({"user_id": user_id, "key": key})
+    if updates:
+        conn.execute(
+            update(users).where(users.c.id == bindparam("user_id"))
+            .values(identity_key=bindparam("key")),
+            updates,
+        )
+    return len(updates)
+
+
+def upgrade(engine=None) -> list:
+    """
+    Crea las tablas, columnas e índices que falten y carga las enfermedades
+    base. Retorna los nombres creados.
+    """
+    engine = engine or default_engine
+    had_stats = set(STATS_TABLES) <= set(inspect(engine).get_table_names())
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        created = _add_missing_columns(conn)
+        if "users.identity_key" in created:
+            _backfill_identity_keys(conn)  # antes de crear su índice único
+        existing = _existing_index_names(conn)
+        for table in Base.metadata.sorted_tables:
+            for index in sorted(table.indexes, key=lambda i: i.name):
+                if index.name not in existing:
+                    # En PostgreSQL bloquea escrituras en la tabla mientras se construye
+                    index.create(bind=conn)
+                    created.append(index.name)
+
+    if not had_stats:
+        rebuild_stats(engine)
+        created.extend(STATS_TABLES)
+    seed_diseases(engine)
+    return created
+
+
+def seed_diseases(engine=None):
+    """Inserta las enfermedades base que falten (ver crud.seed_default_diseases)."""
+    from sqlalchemy.orm import Session
+    from crud import seed_default_diseases
+
+    with Session(bind=engine or default_engine) as db:
+        seed_default_diseases(db)
+
+
+def rebuild_stats(engine=None) -> int:
+    """Recalcula las tablas daily_* desde el historial. Retorna los detalles procesados."""
+    from sqlalchemy.orm import Session
+    from crud import rebuild_daily_stats
+
+    with Session(bind=engine or default_engine) as db:
+        total = rebuild_daily_stats(db)
+        db.commit()
+    return total
+
+
+def ensure_schema():
+    """
+    Verifica la conexión, migra el esquema y carga las enfermedades base (ver
+    upgrade) una sola vez por proceso: Streamlit re-ejecuta app.py en cada interacción y no hace
+    falta repetirlo. Si falla se reintenta en la siguiente llamada.
+    Retorna (ok, error) como check_connection.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return True, None
+
+    with _schema_lock:
+        if _schema_ready:
+            return True, None
+        with span("startup.check_connection"):
+            ok, error = check_connection()
+        if not ok:
+            return False, error
+        with span("startup.upgrade"):
+            upgrade()
+        _schema_ready = True
+        return True, None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migra el esquema de la base de datos.")
+    parser.add_argument("--rebuild-stats", action="store_true",
+                        help="Recalcular las estadísticas agregadas desde el historial")
+    args = parser.parse_args(argv)
+
+    created = upgrade()
+    if created:
+        print("Tablas, columnas e índices creados:", ", ".join(created))
+    else:
+        print("El esquema ya está actualizado.")
+    if args.rebuild_stats:
+        print(f"Estadísticas recalculadas a partir de {rebuild_stats()} diagnósticos.")
+
+
+if __name__ == "__main__":
+    main()
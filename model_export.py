@@ -0,0 +1,265 @@
+# model_export.py
+"""
+Exporta los modelos de saved_models/ a un formato compacto de arrays NumPy.
+
+Los .sav son pickles completos de estimadores de scikit-learn: cargarlos
+importa todo sklearn y reconstruye sus objetos. Para modelos lineales
+(LogisticRegression, SVC con kernel lineal, opcionalmente precedidos por un
+StandardScaler en un Pipeline) la predicción es un producto punto, así que
+basta con guardar coeficientes, intercepto, clases y parámetros del scaler
+como .npy (memory-mappable) más un meta.json, y predecir con NumPy puro.
+
+Uso:
+    python model_export.py                 # exporta y verifica contra los .sav
+    python model_export.py --rows 200000   # más filas de verificación
+
+Para que la app use los modelos compactos: MODEL_FORMAT=compact.
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+import numpy as np
+
+from model_registry import MODEL_FILES, MODELS_DIR
+
+COMPACT_DIR = os.path.join(MODELS_DIR, "compact")
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+# Diferencia absoluta admitida en decision_function: en los SVC lineales libsvm
+# suma sobre los vectores de soporte y el resultado difiere en ~1e-8
+DECISION_TOLERANCE = 1e-6
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def compact_dir_for(disease_code: str, compact_dir: str = COMPACT_DIR) -> str:
+    return os.path.join(compact_dir, os.path.splitext(MODEL_FILES[disease_code])[0])
+
+
+# ------------------------------------------------------------
+# PREDICTORES EN NUMPY PURO
+# ------------------------------------------------------------
+
+class CompactLinearClassifier:
+    """
+    Clasificador lineal sin sklearn: decision = X @ coef.T + intercept.
+    Reproduce predict/decision_function de LinearClassifierMixin (y de SVC
+    lineal, que no expone predict_proba).
+    """
+
+    def __init__(self, coef, intercept, classes, scaler_mean=None, scaler_scale=None,
+                 meta=None):
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.classes_ = classes
+        self.scaler_mean_ = scaler_mean
+        self.scaler_scale_ = scaler_scale
+        self.meta = meta or {}
+        self.n_features_in_ = coef.shape[1]
+
+    def _transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+        if self.scaler_mean_ is not None:
+            X = X - self.scaler_mean_
+        if self.scaler_scale_ is not None:
+            X = X / self.scaler_scale_
+        return X
+
+    def decision_function(self, X):
+        scores = self._transform(X) @ self.coef_.T + self.intercept_
+        return scores.reshape(-1) if scores.shape[1] == 1 else scores
+
+    def predict(self, X):
+        scores = self.decision_function(X)
+        if scores.ndim == 1:
+            indices = (scores > 0).astype(np.intp)
+        else:
+            indices = scores.argmax(axis=1)
+        return self.classes_.take(indices, axis=0)
+
+
+def _numpy_expit(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _load_expit():
+    # scipy.special.expit usa el exp de libm, igual que sklearn: importarlo (solo
+    # scipy.special, no sklearn) da probabilidades idénticas bit a bit. El exp
+    # vectorizado de NumPy puede diferir en el último bit.
+    try:
+        from scipy.special import expit
+    except ImportError:
+        return _numpy_expit
+    return expit
+
+
+class CompactLogisticRegression(CompactLinearClassifier):
+    """Agrega predict_proba (one-vs-rest, como LogisticRegression binaria)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._expit = _load_expit()  # al cargar, no en la primera predicción
+
+    def predict_proba(self, X):
+        prob = self._expit(self.decision_function(X))
+        if prob.ndim == 1:
+            return np.vstack([1 - prob, prob]).T
+        prob /= prob.sum(axis=1).reshape((prob.shape[0], -1))
+        return prob
+
+
+# ------------------------------------------------------------
+# EXPORTAR / CARGAR
+# ------------------------------------------------------------
+
+def _unwrap(model):
+    """Separa un Pipeline(StandardScaler, lineal) en (scaler, estimador)."""
+    scaler = None
+    steps = getattr(model, "steps", None)
+    if steps is not None:
+        if len(steps) > 2 or (len(steps) == 2 and type(steps[0][1]).__name__ != "StandardScaler"):
+            raise ValueError("Only Pipeline(StandardScaler, linear model) can be exported")
+        scaler = steps[0][1] if len(steps) == 2 else None
+        model = steps[-1][1]
+    return scaler, model
+
+
+def export_model(model, out_dir: str, source_path: str = None) -> dict:
+    """Escribe los arrays del modelo en out_dir. Retorna el meta.json generado."""
+    scaler, estimator = _unwrap(model)
+    kind = type(estimator).__name__
+    if kind == "LogisticRegression":
+        multi_class = getattr(estimator, "multi_class", "auto")
+        if len(estimator.classes_) > 2 and multi_class == "multinomial":
+            raise ValueError("Multinomial LogisticRegression is not supported")
+    elif kind == "SVC":
+        if estimator.kernel != "linear":
+            raise ValueError(f"SVC with kernel={estimator.kernel!r} is not linear")
+        if len(estimator.classes_) > 2:
+            raise ValueError("Multiclass SVC is not supported")
+    else:
+        raise ValueError(f"Unsupported model type {kind}")
+
+    arrays = {
+        "coef": np.ascontiguousarray(estimator.coef_, dtype=np.float64),
+        "intercept": np.ascontiguousarray(estimator.intercept_, dtype=np.float64),
+        "classes": np.asarray(estimator.classes_),
+    }
+    if scaler is not None:
+        if scaler.with_mean:
+            arrays["scaler_mean"] = np.asarray(scaler.mean_, dtype=np.float64)
+        if scaler.with_std:
+            arrays["scaler_scale"] = np.asarray(scaler.scale_, dtype=np.float64)
+
+    os.makedirs(out_dir, exist_ok=True)
+    files = {}
+    for name, array in arrays.items():
+        path = os.path.join(out_dir, f"{name}.npy")
+        np.save(path, array, allow_pickle=False)
+        files[name] = _sha256(path)
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "kind": kind,
+        "n_features": int(arrays["coef"].shape[1]),
+        "arrays": files,
+        "source_sha256": _sha256(source_path) if source_path else None,
+    }
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
+    return meta
+
+
+def load_compact(model_dir: str, mmap: bool = True) -> CompactLinearClassifier:
+    """Carga un modelo exportado; con mmap los arrays se mapean sin copiarlos."""
+    with open(os.path.join(model_dir, META_FILE)) as f:
+        meta = json.load(f)
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported compact model format in {model_dir}")
+
+    mode = "r" if mmap else None
+    # np.asarray: vista ndarray normal sobre el mapa (sin la sobrecarga de np.memmap)
+    arrays = {
+        name: np.asarray(np.load(os.path.join(model_dir, f"{name}.npy"), mmap_mode=mode,
+                                 allow_pickle=False))
+        for name in meta["arrays"]
+    }
+    cls = CompactLogisticRegression if meta["kind"] == "LogisticRegression" else CompactLinearClassifier
+    return cls(
+        arrays["coef"], arrays["intercept"], arrays["classes"],
+        arrays.get("scaler_mean"), arrays.get("scaler_scale"), meta=meta,
+    )
+
+
+def verify(original, compact, n_features: int, rows: int = 100_000, seed: int = 0,
+           tolerance: float = DECISION_TOLERANCE) -> dict:
+    """
+    Compara predicciones del .sav y del modelo compacto sobre datos aleatorios.
+    El valor de decisión (y la probabilidad) debe coincidir hasta `tolerance`.
+    """
+    rng = np.random.default_rng(seed)
+    # Escalas variadas para cubrir rangos clínicos (0-1, decenas, cientos)
+    X = rng.normal(size=(rows, n_features)) * rng.choice([0.01, 1, 10, 100], size=n_features) \
+        + rng.uniform(0, 150, size=n_features)
+
+    result = {
+        "rows": rows,
+        "predict_mismatches": int(np.count_nonzero(original.predict(X) != compact.predict(X))),
+    }
+    dec_orig, dec_comp = original.decision_function(X), compact.decision_function(X)
+    result["decision_bit_identical"] = bool(np.array_equal(dec_orig, dec_comp))
+    result["decision_max_abs_diff"] = float(np.max(np.abs(dec_orig - dec_comp)))
+    within = result["decision_max_abs_diff"] <= tolerance
+    if hasattr(original, "predict_proba"):
+        p_orig, p_comp = original.predict_proba(X), compact.predict_proba(X)
+        result["proba_bit_identical"] = bool(np.array_equal(p_orig, p_comp))
+        result["proba_max_abs_diff"] = float(np.max(np.abs(p_orig - p_comp)))
+        within &= result["proba_max_abs_diff"] <= tolerance
+    result["within_tolerance"] = bool(within)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta los .sav a arrays NumPy compactos.")
+    parser.add_argument("--out", default=COMPACT_DIR, help="Directorio de salida")
+    parser.add_argument("--rows", type=int, default=100_000, help="Filas aleatorias de verificación")
+    parser.add_argument("--tolerance", type=float, default=DECISION_TOLERANCE,
+                        help="Diferencia absoluta máxima admitida en decision_function")
+    parser.add_argument("--no-verify", action="store_true")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for code in MODEL_FILES:
+        source = os.path.join(MODELS_DIR, MODEL_FILES[code])
+        with open(source, "rb") as f:
+            model = pickle.load(f)
+        out_dir = compact_dir_for(code, args.out)
+        meta = export_model(model, out_dir, source_path=source)
+        print(f"{code}: {meta['kind']} -> {out_dir}")
+        if args.no_verify:
+            continue
+
+        report = verify(model, load_compact(out_dir), meta["n_features"], rows=args.rows,
+                        tolerance=args.tolerance)
+        print("   " + ", ".join(f"{k}={v}" for k, v in report.items()))
+        failed |= report["predict_mismatches"] > 0 or not report["within_tolerance"]
+    if failed:
+        sys.exit("Las predicciones del modelo compacto no coinciden con el original")
+
+
+if __name__ == "__main__":
+    main()
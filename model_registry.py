@@ -0,0 +1,187 @@
+# model_registry.py
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+
+from database import get_setting
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Directorio donde viven los modelos serializados (.sav)
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_models")
+
+# Código de enfermedad -> archivo del modelo
+MODEL_FILES = {
+    "DIAB": "diabetes_model.sav",
+    "HEART": "heart_disease_model.sav",
+    "PARK": "parkinsons_model.sav",
+}
+
+# "sav" (pickles de sklearn) o "compact" (arrays de model_export.py, sin sklearn)
+MODEL_FORMAT = get_setting("MODEL_FORMAT", "sav")
+
+
+def _file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stat_key(path: str):
+    """(mtime, tamaño) del archivo, o None si no existe."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ModelRegistry:
+    """
+    Carga cada modelo una sola vez por proceso, de forma perezosa (la primera
+    vez que se pide su enfermedad), y solo lo recarga si el archivo .sav (o su
+    exportación compacta) cambió.
+
+    El hash de un modelo es siempre el SHA-256 de su .sav, también en formato
+    compacto (el meta.json lo guarda en "source_sha256"): los diagnósticos y
+    el caché de predicciones quedan asociados al mismo modelo sin importar el
+    formato con que se cargó.
+    """
+
+    def __init__(self, models_dir: str = MODELS_DIR, model_files: dict = None,
+                 model_format: str = MODEL_FORMAT):
+        self.models_dir = models_dir
+        self.model_files = dict(model_files or MODEL_FILES)
+        self.model_format = model_format
+        self._entries = {}  # code -> {"model", "path", "signature", "hash"}
+        self._lock = threading.Lock()
+        self._reload_listeners = []
+
+    def path_for(self, disease_code: str) -> str:
+        try:
+            filename = self.model_files[disease_code]
+        except KeyError:
+            raise ValueError(f"No model registered for disease code {disease_code}")
+        if self.model_format == "compact":
+            # El meta.json lleva el hash de cada array: si cambia, cambia el modelo
+            meta_path = os.path.join(
+                self.models_dir, "compact", os.path.splitext(filename)[0], "meta.json"
+            )
+            if os.path.exists(meta_path):
+                return meta_path
+        return self.source_for(disease_code)
+
+    def source_for(self, disease_code: str) -> str:
+        """Ruta del .sav original, también en formato compacto."""
+        return os.path.join(self.models_dir, self.model_files[disease_code])
+
+    def _resolve(self, disease_code: str, path: str):
+        """Retorna (archivo a cargar, hash del modelo)."""
+        source = self.source_for(disease_code)
+        if path == source:
+            if self.model_format == "compact":
+                logger.warning("No compact export for %s, loading %s", disease_code, path)
+            return path, _file_hash(source)
+
+        with open(path) as f:
+            exported_hash = json.load(f).get("source_sha256")
+        if not os.path.exists(source):
+            # Solo se desplegó la exportación compacta
+            return path, exported_hash or _file_hash(path)
+        source_hash = _file_hash(source)
+        if exported_hash != source_hash:
+            # El .sav se reemplazó después de exportar: se usa el .sav hasta re-exportar
+            logger.warning("Compact model for %s is older than %s; loading the .sav, "
+                           "re-run model_export.py", disease_code, self.model_files[disease_code])
+            return source, source_hash
+        return path, source_hash
+
+    def _load(self, disease_code: str, path: str):
+        if not path.endswith(".json"):
+            with open(path, "rb") as f:
+                return pickle.load(f)
+
+        from model_export import load_compact
+        return load_compact(os.path.dirname(path))
+
+    def get(self, disease_code: str):
+        """Retorna el modelo ya cargado para el código dado (DIAB/HEART/PARK)."""
+        return self._entry(disease_code)["model"]
+
+    def get_hash(self, disease_code: str) -> str:
+        """Hash SHA-256 del .sav del modelo actualmente cargado."""
+        return self._entry(disease_code)["hash"]
+
+    def get_with_hash(self, disease_code: str):
+        """Retorna (modelo, hash) con una sola verificación del archivo."""
+        entry = self._entry(disease_code)
+        return entry["model"], entry["hash"]
+
+    def add_reload_listener(self, callback):
+        """callback(disease_code) se llama cada vez que un .sav modificado se recarga."""
+        self._reload_listeners.append(callback)
+
+    def invalidate(self, disease_code: str = None):
+        with self._lock:
+            if disease_code is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(disease_code, None)
+
+    def _entry(self, disease_code: str) -> dict:
+        path = self.path_for(disease_code)
+        signature = (_stat_key(path), _stat_key(self.source_for(disease_code)))
+        if signature[0] is None:
+            raise FileNotFoundError(f"Model file not found: {path}")
+
+        entry = self._entries.get(disease_code)
+        # Camino rápido: mismos mtime y tamaño (exportación y .sav) -> no se toca el disco
+        if entry and entry["signature"] == signature:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(disease_code)
+            if entry and entry["signature"] == signature:
+                return entry
+
+            load_path, model_hash = self._resolve(disease_code, path)
+            if entry and entry["hash"] == model_hash and entry["path"] == load_path:
+                # Los archivos se tocaron pero el modelo es idéntico
+                entry = dict(entry, signature=signature)
+            else:
+                with span("model.load", disease=disease_code, format=self.model_format):
+                    model = self._load(disease_code, load_path)
+                reloaded = entry is not None
+                entry = {
+                    "model": model,
+                    "path": load_path,
+                    "signature": signature,
+                    "hash": model_hash,
+                }
+                if reloaded:
+                    for callback in self._reload_listeners:
+                        callback(disease_code)
+            self._entries[disease_code] = entry
+            return entry
+
+
+# Registro único por proceso (Streamlit re-ejecuta app.py, pero no este módulo)
+registry = ModelRegistry()
+
+
+def get_model(disease_code: str):
+    return registry.get(disease_code)
+
+
+def get_model_hash(disease_code: str) -> str:
+    return registry.get_hash(disease_code)
+
+
+def get_model_with_hash(disease_code: str):
+    return registry.get_with_hash(disease_code)
@@ -1,8 +1,8 @@
 # models.py
 from sqlalchemy import (
-    Column, Integer, String, Text,
+    Column, Integer, BigInteger, String, Text,
     Numeric, ForeignKey, CheckConstraint, UniqueConstraint,
-    DateTime
+    Date, DateTime, Index, LargeBinary
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -17,6 +17,18 @@ class User(Base):
     age = Column(Integer, CheckConstraint("age BETWEEN 0 AND 120"))
     gender = Column(String(1), CheckConstraint("gender IN ('M','F','O')"))
     email = Column(Text, unique=True)
+    # Pacientes sin correo: hash de nombre, edad, género y teléfono (ver
+    # crud.user_identity_key). Permite reutilizarlos en vez de crear uno nuevo
+    # por cada predicción.
+    identity_key = Column(String(64))
+
+    __table_args__ = (
+        # Búsqueda del historial por nombre sin distinguir mayúsculas
+        Index("ix_users_name_lower", func.lower(name)),
+        # Índice único (no constraint) para que migrations.py lo agregue a
+        # tablas existentes; sirve como destino de ON CONFLICT
+        Index("ux_users_identity_key", identity_key, unique=True),
+    )
 
     diagnoses = relationship("Diagnosis", back_populates="user")
 
@@ -54,6 +66,10 @@ class Diagnosis(Base):
 
     __table_args__ = (
         CheckConstraint("status IN ('pending','confirmed','discarded')", name="ck_diagnosis_status"),
+        # Historial general: ORDER BY generated_at DESC (id desempata)
+        Index("ix_diagnoses_generated_at_id", generated_at.desc(), id.desc()),
+        # Historial por paciente: filtro por user_id + orden por fecha
+        Index("ix_diagnoses_user_generated_at", "user_id", "generated_at"),
     )
 
     user = relationship("User", back_populates="diagnoses")
@@ -67,9 +83,16 @@ class DiagnosisDetail(Base):
     diagnosis_id = Column(Integer, ForeignKey("diagnoses.id", ondelete="CASCADE"), nullable=False)
     disease_id = Column(Integer, ForeignKey("diseases.id", ondelete="RESTRICT"), nullable=False)
     probability = Column(Numeric(5, 4), nullable=False)
+    # Vector de entrada del modelo como float32 little-endian empaquetado
+    # (ver features.pack_features), para poder re-puntuar el historial
+    input_vector = Column(LargeBinary)
+    feature_schema_version = Column(Integer)
+    model_hash = Column(String(64))  # SHA-256 del modelo que generó la probabilidad
 
     __table_args__ = (
         CheckConstraint("probability >= 0 AND probability <= 1", name="ck_probability_range"),
+        # El índice de esta restricción (diagnosis_id primero) también sirve
+        # para el join diagnoses -> diagnosis_details.
         UniqueConstraint("diagnosis_id", "disease_id", name="uq_diag_disease"),
     )
 
@@ -85,7 +108,33 @@ class DiagnosisSymptom(Base):
 
     __table_args__ = (
         UniqueConstraint("diagnosis_id", "symptom_id", name="uq_diag_symptom"),
+        # Comprobar si un síntoma del catálogo está en uso antes de borrarlo
+        # (las búsquedas por síntoma usan symptom_index.py, no este índice)
+        Index("ix_diagnosis_symptoms_symptom_id", "symptom_id"),
     )
 
     diagnosis = relationship("Diagnosis", back_populates="symptoms")
     symptom = relationship("Symptom", back_populates="diagnosis_symptoms")
+
+# ------------------------------------------------------------
+# ESTADÍSTICAS AGREGADAS (mantenidas por crud.py al crear/borrar diagnósticos)
+# ------------------------------------------------------------
+class DailyDiseaseStats(Base):
+    """Diagnósticos por día, enfermedad y estado."""
+    __tablename__ = "daily_disease_stats"
+
+    day = Column(Date, primary_key=True)
+    disease_id = Column(Integer, ForeignKey("diseases.id", ondelete="CASCADE"), primary_key=True)
+    status = Column(Text, primary_key=True)
+    diagnoses_count = Column(Integer, nullable=False, server_default="0")
+    # Suma de probabilidades en diezmilésimas (entero: sumar y restar es exacto)
+    probability_sum_e4 = Column(BigInteger, nullable=False, server_default="0")
+
+class DailyProbabilityHistogram(Base):
+    """Histograma de probabilidades por día y enfermedad (100 buckets de 0.01)."""
+    __tablename__ = "daily_probability_histogram"
+
+    day = Column(Date, primary_key=True)
+    disease_id = Column(Integer, ForeignKey("diseases.id", ondelete="CASCADE"), primary_key=True)
+    bucket = Column(Integer, CheckConstraint("bucket BETWEEN 0 AND 99"), primary_key=True)
+    diagnoses_count = Column(Integer, nullable=False, server_default="0")
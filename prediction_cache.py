@@ -0,0 +1,77 @@
+# prediction_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+from database import get_setting
+
+MAX_ENTRIES = int(get_setting("PREDICTION_CACHE_SIZE", 10_000))
+TTL_SECONDS = float(get_setting("PREDICTION_CACHE_TTL", 3600))
+# Decimales con los que se cuantizan las características antes de usarlas como clave
+DECIMALS = int(get_setting("PREDICTION_CACHE_DECIMALS", 6))
+
+
+class PredictionCache:
+    """
+    Caché LRU con expiración (TTL) de resultados de inferencia.
+
+    La clave es (código de enfermedad, hash del .sav, características
+    cuantizadas), así que un modelo nuevo nunca reutiliza resultados del
+    anterior. El tamaño está acotado por max_entries.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = TTL_SECONDS,
+                 decimals: int = DECIMALS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.decimals = decimals
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, disease_code: str, model_hash: str, row) -> tuple:
+        return (disease_code, model_hash, tuple(round(float(v), self.decimals) for v in row))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, disease_code: str = None):
+        """Elimina las entradas de una enfermedad (o todas)."""
+        with self._lock:
+            if disease_code is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == disease_code]:
+                    del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+# Caché único por proceso
+prediction_cache = PredictionCache()
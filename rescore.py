@@ -0,0 +1,174 @@
+# rescore.py
+"""
+Re-puntúa los diagnósticos guardados con el modelo actual de saved_models/.
+
+Después de reemplazar un .sav, las probabilidades del historial siguen siendo
+las del modelo anterior. Este script recorre los detalles de una enfermedad
+por bloques (keyset por id: nunca carga toda la tabla), puntúa cada bloque
+con una sola llamada vectorizada sobre los vectores guardados y actualiza
+probability y model_hash con un UPDATE masivo por bloque. Las estadísticas
+agregadas del tablero se corrigen en la misma transacción de cada bloque
+(se descuenta la probabilidad anterior y se suma la nueva), y si la etiqueta
+cambia se reescribe el mensaje de resultado de esa enfermedad en la
+descripción del diagnóstico (solo si es uno de los mensajes de la app, en
+cualquiera de sus idiomas; un texto escrito a mano se deja igual).
+
+Cada bloque se confirma por separado y la posición se guarda en un archivo de
+checkpoint, así que si se interrumpe basta con volver a ejecutarlo. Los
+detalles ya puntuados con el modelo actual se omiten, y los que no tienen
+vector guardado (anteriores a input_vector) no se pueden re-puntuar.
+
+Uso:
+    python rescore.py HEART
+    python rescore.py PARK --chunk-size 20000 --checkpoint /tmp/park.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from sqlalchemy import func, select
+
+from database import SessionLocal
+from features import FEATURE_ORDERS, RESULT_MESSAGE_KEYS
+from migrations import ensure_schema
+from model_registry import get_model_with_hash
+from models import DiagnosisDetail
+from scoring import predict_with_proba
+from crud import get_disease_id, get_feature_matrix, update_detail_probabilities
+from translations import translations
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+
+def description_updater(disease_code: str):
+    """
+    Retorna describe(descripción, etiqueta): cambia cada línea que sea el
+    mensaje positivo o negativo de la enfermedad (en cualquier idioma) por el
+    de la etiqueta nueva, en el mismo idioma. El panel completo guarda un
+    mensaje por línea, así que solo cambia la línea de esta enfermedad.
+    """
+    positive_key, negative_key = RESULT_MESSAGE_KEYS[disease_code]
+    replacements = {}  # mensaje -> (positivo, negativo) de su idioma
+    for t in translations.values():
+        pair = (t[positive_key], t[negative_key])
+        replacements[pair[0]] = replacements[pair[1]] = pair
+
+    def describe(description: str, label) -> str:
+        return "\n".join(
+            replacements[line][0 if label == 1 else 1] if line in replacements else line
+            for line in description.split("\n")
+        )
+
+    return describe
+
+
+def default_checkpoint_path(disease_code: str) -> str:
+    return f"rescore_{disease_code}.checkpoint.json"
+
+
+def load_checkpoint(path: str, disease_code: str, model_hash: str) -> dict:
+    """Retorna el checkpoint guardado si es de la misma enfermedad y modelo."""
+    if path and os.path.exists(path):
+        with open(path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("disease_code") == disease_code and checkpoint.get("model_hash") == model_hash:
+            return checkpoint
+    return {"disease_code": disease_code, "model_hash": model_hash,
+            "last_detail_id": 0, "updated": 0}
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    if not path:
+        return
+    # Escritura atómica: nunca queda un checkpoint a medio escribir
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def count_without_vector(db, disease_code: str) -> int:
+    return db.execute(
+        select(func.count()).select_from(DiagnosisDetail).where(
+            DiagnosisDetail.disease_id == get_disease_id(db, disease_code),
+            DiagnosisDetail.input_vector.is_(None),
+        )
+    ).scalar_one()
+
+
+def run(disease_code, chunk_size=DEFAULT_CHUNK_SIZE, checkpoint_path=None, dry_run=False):
+    ok, error = ensure_schema()  # columnas de input_vector y enfermedades base
+    if not ok:
+        raise RuntimeError(f"Database unavailable: {error}")
+    model, model_hash = get_model_with_hash(disease_code)
+    checkpoint = load_checkpoint(checkpoint_path, disease_code, model_hash)
+    if checkpoint["last_detail_id"]:
+        print(f"Reanudando desde el detalle {checkpoint['last_detail_id']} "
+              f"({checkpoint['updated']} ya actualizados)", file=sys.stderr)
+
+    total = 0
+    changed = 0
+    describe = description_updater(disease_code)
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        while True:
+            detail_ids, X, _ = get_feature_matrix(
+                db, disease_code, after_detail_id=checkpoint["last_detail_id"],
+                limit=chunk_size, skip_model_hash=model_hash,
+            )
+            if not detail_ids:
+                break
+
+            labels, probas = predict_with_proba(model, X)
+            if not dry_run:
+                # UPDATE y corrección del tablero en la misma transacción
+                changed += update_detail_probabilities(
+                    db, dict(zip(detail_ids, probas)), model_hash,
+                    labels=dict(zip(detail_ids, labels)), describe=describe,
+                )
+                db.commit()
+
+            total += len(detail_ids)
+            checkpoint["last_detail_id"] = detail_ids[-1]
+            checkpoint["updated"] += len(detail_ids)
+            if not dry_run:
+                save_checkpoint(checkpoint_path, checkpoint)
+            elapsed = time.perf_counter() - started
+            print(f"{total} filas ({total / elapsed:,.0f} filas/s)", file=sys.stderr)
+
+        missing = count_without_vector(db, disease_code)
+
+    if not dry_run and checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)  # terminado: la próxima ejecución empieza de cero
+    elapsed = time.perf_counter() - started
+    print(f"{disease_code}: {total} diagnósticos re-puntuados en {elapsed:.1f} s "
+          f"con el modelo {model_hash[:12]} ({changed} con probabilidad distinta)",
+          file=sys.stderr)
+    if missing:
+        print(f"{missing} diagnósticos sin vector de entrada guardado no se pudieron "
+              f"re-puntuar", file=sys.stderr)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-puntúa el historial con el modelo actual.")
+    parser.add_argument("disease_code", choices=sorted(FEATURE_ORDERS))
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--checkpoint",
+                        help="Archivo de checkpoint (por defecto rescore_<CODE>.checkpoint.json)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Puntuar sin escribir en la base de datos")
+    args = parser.parse_args(argv)
+
+    run(
+        args.disease_code,
+        chunk_size=args.chunk_size,
+        checkpoint_path=args.checkpoint or default_checkpoint_path(args.disease_code),
+        dry_run=args.dry_run,
+    )
+
+
+if __name__ == "__main__":
+    main()
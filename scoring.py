@@ -0,0 +1,81 @@
+# scoring.py
+import numpy as np
+
+from model_registry import get_model_with_hash, registry
+from prediction_cache import prediction_cache
+
+# Un .sav recargado deja obsoletas sus entradas del caché: liberarlas de una vez
+registry.add_reload_listener(prediction_cache.invalidate)
+
+
+def predict_with_proba(model, rows):
+    """
+    Etiqueta y probabilidad de la clase positiva en una sola pasada de inferencia.
+
+    Si el modelo expone predict_proba, la etiqueta se deriva de esas mismas
+    probabilidades (argmax) en vez de llamar también a predict. Si no (p. ej.
+    SVC sin probability=True), se usa predict y la probabilidad es 1.0/0.0.
+    Retorna dos arrays NumPy: (labels, positive_probas).
+    """
+    X = np.asarray(rows, dtype=np.float64)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+
+    if hasattr(model, "predict_proba"):
+        probas = model.predict_proba(X)
+        labels = model.classes_[np.argmax(probas, axis=1)]
+        return labels, probas[:, 1].astype(np.float64)
+
+    labels = model.predict(X)
+    return labels, (labels == 1).astype(np.float64)
+
+
+def predict_one(disease_code: str, user_input, use_cache: bool = True):
+    """Puntúa una sola fila con el modelo de la enfermedad. Retorna (label, probability)."""
+    model, model_hash = get_model_with_hash(disease_code)
+    if use_cache:
+        key = prediction_cache.make_key(disease_code, model_hash, user_input)
+        cached = prediction_cache.get(key)
+        if cached is not None:
+            return cached
+
+    labels, probas = predict_with_proba(model, [user_input])
+    result = (int(labels[0]), float(probas[0]))
+    if use_cache:
+        prediction_cache.put(key, result)
+    return result
+
+
+def predict_many(disease_code: str, rows, model=None, use_cache: bool = True):
+    """
+    Puntúa un bloque de filas. Con caché, solo las filas no vistas pasan por el
+    modelo (en una única llamada vectorizada). Retorna (labels, positive_probas).
+    """
+    if model is None:
+        model, model_hash = get_model_with_hash(disease_code)
+    else:
+        use_cache = False  # modelo ajeno al registro: no hay hash confiable
+    if not use_cache:
+        return predict_with_proba(model, rows)
+
+    X = np.asarray(rows, dtype=np.float64)
+    labels = np.empty(len(X), dtype=np.int64)
+    probas = np.empty(len(X), dtype=np.float64)
+    keys = [prediction_cache.make_key(disease_code, model_hash, row) for row in X]
+
+    missing = []
+    for i, key in enumerate(keys):
+        cached = prediction_cache.get(key)
+        if cached is None:
+            missing.append(i)
+        else:
+            labels[i], probas[i] = cached
+
+    if missing:
+        miss_labels, miss_probas = predict_with_proba(model, X[missing])
+        labels[missing] = miss_labels
+        probas[missing] = miss_probas
+        for i, label, proba in zip(missing, miss_labels, miss_probas):
+            prediction_cache.put(keys[i], (int(label), float(proba)))
+
+    return labels, probas
@@ -1,20 +1,43 @@
 # seed_dummy_data.py
-from datetime import datetime, timedelta
+"""
+Datos de prueba.
+
+Sin argumentos crea 3 pacientes demo con un diagnóstico de cada enfermedad.
+Con --users genera un volumen sintético para pruebas de capacidad (índices,
+paginación): pacientes y diagnósticos se insertan por bloques con INSERT
+masivos (bulk_create_diagnoses) y cada bloque se confirma por separado. La
+base de datos es la de DATABASE_URL (SQLite o PostgreSQL).
+
+Uso:
+    python seed_dummy_data.py
+    python seed_dummy_data.py --users 100000 --per-user 100 --days 730 \
+        --mix DIAB=0.5,HEART=0.3,PARK=0.2 --probability beta:2,5 --seed 7
+    python seed_dummy_data.py --users 10000 --per-user 100 --symptoms 5
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta, timezone
 import random
 
-from database import SessionLocal, engine
-from models import Base, User
-from crud import seed_default_diseases, get_or_create_user, create_diagnosis_with_single_candidate
+from sqlalchemy import func, insert, select
+
+from database import SessionLocal
+from models import User
+from crud import (
+    seed_default_diseases, get_or_create_user, bulk_create_diagnoses, get_symptom_ids,
+    DiagnosisRecord,
+)
 
 def seed():
-    # Asegurarse de que las tablas existen
-    Base.metadata.create_all(bind=engine)
+    # Tablas, columnas e índices al día (create_all no agrega columnas nuevas
+    # a tablas existentes, como users.identity_key) y enfermedades base
+    from migrations import upgrade
+
+    upgrade()
 
     db = SessionLocal()
     try:
-        # Asegurar enfermedades base DIAB / HEART / PARK
-        seed_default_diseases(db)
-
         # ---------- 1. Crear algunos usuarios dummy ----------
         usuarios_demo = [
             {
@@ -74,38 +97,32 @@ def seed():
             "Patrones vocales con ligeras alteraciones, seguimiento sugerido.",
         ]
 
-        # Creamos 1 diagnóstico de cada tipo por usuario
-        now = datetime.utcnow()
+        # Creamos 1 diagnóstico de cada tipo por usuario (en un solo bloque)
+        now = datetime.now(timezone.utc)
+        records = []
         for idx, user in enumerate(users):
-            # Diabetes
-            diag_diab = create_diagnosis_with_single_candidate(
-                db=db,
-                user_id=user.id,
+            records.append(DiagnosisRecord(
+                user=user,
                 disease_code="DIAB",
                 probability=probs_diab[idx],
-                final_description=mensajes_diab[idx],
-            )
-            diag_diab.generated_at = now - timedelta(days=7 - idx)
-
-            # Heart
-            diag_heart = create_diagnosis_with_single_candidate(
-                db=db,
-                user_id=user.id,
+                description=mensajes_diab[idx],
+                generated_at=now - timedelta(days=7 - idx),
+            ))
+            records.append(DiagnosisRecord(
+                user=user,
                 disease_code="HEART",
                 probability=probs_heart[idx],
-                final_description=mensajes_heart[idx],
-            )
-            diag_heart.generated_at = now - timedelta(days=4 - idx)
-
-            # Parkinson
-            diag_park = create_diagnosis_with_single_candidate(
-                db=db,
-                user_id=user.id,
+                description=mensajes_heart[idx],
+                generated_at=now - timedelta(days=4 - idx),
+            ))
+            records.append(DiagnosisRecord(
+                user=user,
                 disease_code="PARK",
                 probability=probs_park[idx],
-                final_description=mensajes_park[idx],
-            )
-            diag_park.generated_at = now - timedelta(days=2 - idx)
+                description=mensajes_park[idx],
+                generated_at=now - timedelta(days=2 - idx),
+            ))
+        bulk_create_diagnoses(db, records)
 
         db.commit()
         print("Datos dummy insertados correctamente en meddiag.db")
@@ -115,5 +132,196 @@ def seed():
     finally:
         db.close()
 
+# ------------------------------------------------------------
+# GENERADOR SINTÉTICO (pruebas de capacidad)
+# ------------------------------------------------------------
+DEFAULT_CHUNK_SIZE = 10_000
+
+NOMBRES = ["Juan", "María", "Carlos", "Ana", "Luis", "Laura", "Jorge", "Sofía", "Andrés",
+           "Valentina", "Diego", "Camila", "Felipe", "Daniela", "Santiago", "Paula"]
+APELLIDOS = ["Pérez", "López", "Gómez", "Rodríguez", "Martínez", "García", "Hernández",
+             "Díaz", "Torres", "Ramírez", "Castaño", "Moreno", "Rojas", "Vargas"]
+
+SINTOMAS = [
+    "Sed excesiva", "Micción frecuente", "Visión borrosa", "Fatiga", "Pérdida de peso",
+    "Dolor en el pecho", "Falta de aire", "Palpitaciones", "Mareo", "Hinchazón de piernas",
+    "Temblor en reposo", "Rigidez muscular", "Lentitud de movimientos", "Voz baja",
+    "Alteraciones del sueño", "Dolor de cabeza",
+]
+
+DESCRIPCIONES = {
+    "DIAB": "Diagnóstico sintético de diabetes.",
+    "HEART": "Diagnóstico sintético de enfermedad cardíaca.",
+    "PARK": "Diagnóstico sintético de Parkinson.",
+}
+
+
+def parse_mix(value: str) -> dict:
+    """'DIAB=0.5,HEART=0.3,PARK=0.2' -> {'DIAB': 0.5, ...} (pesos relativos)."""
+    mix = {}
+    for part in value.split(","):
+        key, _, weight = part.partition("=")
+        mix[key.strip()] = float(weight) if weight else 1.0
+    if not mix or any(w < 0 for w in mix.values()) or sum(mix.values()) <= 0:
+        raise ValueError(f"Invalid mix {value!r}")
+    return mix
+
+
+def make_probability_sampler(spec: str, rng: random.Random):
+    """'uniform' o 'beta:A,B' -> función sin argumentos que retorna una probabilidad."""
+    kind, _, params = spec.partition(":")
+    if kind == "uniform":
+        return rng.random
+    if kind == "beta":
+        alpha, beta = (float(x) for x in params.split(","))
+        return lambda: rng.betavariate(alpha, beta)
+    raise ValueError(f"Unknown probability distribution {spec!r}")
+
+
+def _probability_spec(spec: str) -> str:
+    make_probability_sampler(spec, random.Random())  # valida antes de insertar nada
+    return spec
+
+
+def _symptom_count(value: str) -> int:
+    count = int(value)
+    if not 0 <= count <= len(SINTOMAS):
+        raise argparse.ArgumentTypeError(
+            f"debe estar entre 0 y {len(SINTOMAS)} (síntomas del catálogo)")
+    return count
+
+
+def insert_users(db, n_users: int, rng: random.Random, chunk_size: int = DEFAULT_CHUNK_SIZE) -> list:
+    """Inserta n_users pacientes sintéticos por bloques. Retorna sus ids."""
+    # Los correos continúan después del mayor id existente: se puede volver a
+    # ejecutar sobre la misma base sin chocar con el UNIQUE de email
+    offset = db.execute(select(func.coalesce(func.max(User.id), 0))).scalar_one() + 1
+    user_ids = []
+    for start in range(0, n_users, chunk_size):
+        rows = [
+            {
+                "name": f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}",
+                "email": f"paciente{offset + i}@loadtest.example",
+                "age": rng.randint(18, 90),
+                "gender": rng.choice("MF"),
+            }
+            for i in range(start, min(n_users, start + chunk_size))
+        ]
+        user_ids.extend(db.execute(insert(User).returning(User.id), rows).scalars())
+        db.commit()
+    return user_ids
+
+
+def generate(db, users: int, per_user: float = 10, days: int = 365, mix: dict = None,
+             status_mix: dict = None, probability: str = "uniform", seed: int = 42,
+             chunk_size: int = DEFAULT_CHUNK_SIZE, progress=None, symptoms: int = 0) -> dict:
+    """
+    Genera `users` pacientes y users * per_user diagnósticos repartidos en los
+    últimos `days` días. Cada diagnóstico es de un paciente al azar (per_user
+    es el promedio). Los bloques avanzan en el tiempo y dentro de cada uno las
+    filas van ordenadas por fecha, como llegarían los diagnósticos reales
+    (ids y fechas crecen juntos). Con `symptoms` > 0 cada diagnóstico recibe
+    entre 0 y `symptoms` síntomas al azar de SINTOMAS.
+    `progress(insertados, total, segundos)` se llama después de cada bloque.
+    Retorna conteos y tiempos.
+    """
+    rng = random.Random(seed)
+    mix = mix or {"DIAB": 1, "HEART": 1, "PARK": 1}
+    status_mix = status_mix or {"pending": 1}
+    sample_probability = make_probability_sampler(probability, rng)
+    codes, code_weights = zip(*mix.items())
+    statuses, status_weights = zip(*status_mix.items())
+
+    seed_default_diseases(db)
+    if symptoms:
+        get_symptom_ids(db, SINTOMAS, create_missing=True)
+        db.commit()
+    started = time.perf_counter()
+    user_ids = insert_users(db, users, rng, chunk_size)
+    users_seconds = time.perf_counter() - started
+
+    total = int(users * per_user)
+    end = datetime.now(timezone.utc)
+    span = timedelta(days=days).total_seconds()
+    started = time.perf_counter()
+    for chunk_start in range(0, total, chunk_size):
+        n = min(chunk_size, total - chunk_start)
+        # Segundos hacia atrás desde `end`: el primer bloque es el más antiguo
+        window_start = span * (total - chunk_start - n) / total
+        window_end = span * (total - chunk_start) / total
+        offsets = sorted((rng.uniform(window_start, window_end) for _ in range(n)), reverse=True)
+
+        # Un solo lote con el estado de cada registro: ids y fechas crecen juntos
+        records = [
+            DiagnosisRecord(
+                user=rng.choice(user_ids),
+                disease_code=code,
+                probability=sample_probability(),
+                description=DESCRIPCIONES.get(code, "Diagnóstico sintético."),
+                symptoms=rng.sample(SINTOMAS, rng.randint(0, symptoms)) if symptoms else (),
+                generated_at=end - timedelta(seconds=offset),
+                status=status,
+            )
+            for offset, code, status in zip(offsets, rng.choices(codes, code_weights, k=n),
+                                            rng.choices(statuses, status_weights, k=n))
+        ]
+        bulk_create_diagnoses(db, records, chunk_size=chunk_size)
+        db.commit()
+        if progress:
+            progress(chunk_start + n, total, time.perf_counter() - started)
+
+    return {
+        "users": len(user_ids),
+        "users_seconds": users_seconds,
+        "diagnoses": total,
+        "diagnoses_seconds": time.perf_counter() - started,
+    }
+
+
+def _report(inserted: int, total: int, elapsed: float):
+    print(f"\r{inserted:,}/{total:,} diagnósticos ({inserted / elapsed:,.0f} filas/s)",
+          end="", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int,
+                        help="Pacientes sintéticos a generar (sin esta opción: datos demo)")
+    parser.add_argument("--per-user", type=float, default=10,
+                        help="Diagnósticos por paciente, en promedio")
+    parser.add_argument("--days", type=int, default=365, help="Días hacia atrás que cubren las fechas")
+    parser.add_argument("--mix", type=parse_mix, default="DIAB=1,HEART=1,PARK=1",
+                        help="Proporción de enfermedades")
+    parser.add_argument("--status-mix", type=parse_mix, default="pending=1",
+                        help="Proporción de estados (pending/confirmed/discarded)")
+    parser.add_argument("--probability", type=_probability_spec, default="uniform",
+                        help="Distribución de probabilidades: uniform o beta:A,B")
+    parser.add_argument("--symptoms", type=_symptom_count, default=0,
+                        help=f"Máximo de síntomas por diagnóstico (0-{len(SINTOMAS)})")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.users is None:
+        seed()
+        return
+
+    from migrations import upgrade
+
+    upgrade()
+    with SessionLocal() as db:
+        result = generate(
+            db, args.users, per_user=args.per_user, days=args.days, mix=args.mix,
+            status_mix=args.status_mix, probability=args.probability, seed=args.seed,
+            chunk_size=args.chunk_size, progress=_report, symptoms=args.symptoms,
+        )
+    print(file=sys.stderr)
+    print(f"{result['users']:,} pacientes en {result['users_seconds']:.1f} s "
+          f"({result['users'] / max(result['users_seconds'], 1e-9):,.0f} filas/s)")
+    print(f"{result['diagnoses']:,} diagnósticos en {result['diagnoses_seconds']:.1f} s "
+          f"({result['diagnoses'] / max(result['diagnoses_seconds'], 1e-9):,.0f} filas/s)")
+
+
 if __name__ == "__main__":
-    seed()
+    main()
@@ -0,0 +1,289 @@
+# symptom_index.py
+"""
+Índice invertido síntoma -> diagnósticos, en memoria.
+
+Para cada síntoma guarda un arreglo ordenado de NumPy (int64) con los ids de
+los diagnósticos que lo tienen, y para cada diagnóstico con síntomas su fecha
+(segundos epoch, UTC). "Diagnósticos con los síntomas A y B en los últimos 30
+días" se resuelve intersecando los arreglos, del más corto al más largo (una
+búsqueda binaria por candidato), y filtrando por fecha: sin JOIN a
+diagnosis_symptoms por cada síntoma.
+
+Mantenimiento incremental: el índice recuerda el último diagnosis_symptoms.id
+cargado y antes de cada consulta trae solo las filas nuevas (un rango sobre la
+clave primaria), así ve lo que guarden el escritor en segundo plano,
+batch_score.py u otros procesos. Los diagnósticos borrados en este proceso se
+descartan al confirmarse la transacción (crud.delete_diagnosis_by_id); para
+los borrados por otros procesos el índice se recarga completo cada
+SYMPTOM_INDEX_MAX_AGE segundos.
+
+En SQLite las escrituras son serializadas y los ids se confirman en orden. En
+PostgreSQL no: una transacción puede tomar un id de la secuencia y confirmar
+después que otra con un id mayor, y esa fila quedaría bajo la marca. Por eso
+ahí cada actualización vuelve a leer las últimas SYMPTOM_INDEX_OVERLAP filas
+bajo la marca y descarta las ya cargadas. Una fila que se confirme con más
+retraso que ese margen aparece con la siguiente recarga completa.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import BigInteger, Integer, cast, event, func, select
+from sqlalchemy.orm import Session
+
+from database import get_setting
+from models import Diagnosis, DiagnosisSymptom
+from crud import DELETED_DIAGNOSES_KEY
+
+MAX_AGE = float(get_setting("SYMPTOM_INDEX_MAX_AGE", 3600))
+OVERLAP = int(get_setting("SYMPTOM_INDEX_OVERLAP", 10_000))
+LOAD_BATCH_SIZE = 100_000
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+# Consultas sobre las tablas (Core) y no sobre las clases: con millones de
+# filas el ORM arma cada fila por el mapeo y la carga inicial tarda el doble
+_diagnoses = Diagnosis.__table__
+_diagnosis_symptoms = DiagnosisSymptom.__table__
+
+
+def _epoch_seconds(db: Session, column):
+    """Fecha como segundos epoch calculados en la BD (evita crear un datetime por fila)."""
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite guarda la fecha en UTC sin zona horaria
+        return cast(func.strftime("%s", column), Integer)
+    return cast(func.extract("epoch", column), BigInteger)
+
+
+def _to_epoch(value) -> int:
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _union(existing: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """Unión de dos arreglos ordenados sin repetidos."""
+    if not len(existing):
+        return new
+    if new[0] > existing[-1]:
+        # Caso normal: los diagnósticos nuevos tienen ids mayores
+        return np.concatenate((existing, new))
+    return np.union1d(existing, new)
+
+
+class SymptomIndex:
+    def __init__(self, max_age: float = MAX_AGE, overlap: int = OVERLAP):
+        self.max_age = max_age
+        self.overlap = overlap
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._postings = {}  # symptom_id -> ids de diagnóstico (ordenados)
+        self._diagnosis_ids = _EMPTY  # ordenados, alineados con _generated_at
+        self._generated_at = _EMPTY
+        self._removed = set()  # borrados aún presentes en los arreglos
+        self.watermark = 0  # último diagnosis_symptoms.id cargado
+        self._recent_rows = _EMPTY  # ids cargados dentro del margen bajo `watermark`
+        self._tail_diagnosis = None  # diagnóstico dueño de la fila `watermark`
+        self._stale = False
+        self.rows = 0
+        self.loaded_at = None
+
+    # ---------------- Carga ----------------
+    def refresh(self, db: Session) -> int:
+        """Carga las filas de diagnosis_symptoms nuevas. Retorna cuántas."""
+        with self._lock:
+            if (self._stale or self.loaded_at is None
+                    or time.monotonic() - self.loaded_at > self.max_age):
+                self.clear()
+                self.loaded_at = time.monotonic()
+            overlap = self._overlap(db)
+            data = self._fetch(db, max(self.watermark - overlap, 0))
+            if overlap and len(data):
+                data = data[~np.isin(data[:, 0], self._recent_rows)]
+            if len(data) and self._removed and np.isin(data[:, 2], list(self._removed)).any():
+                # SQLite puede reutilizar el id de un diagnóstico borrado: se
+                # recarga todo para no mezclar los síntomas viejos con los nuevos
+                self.clear()
+                self.loaded_at = time.monotonic()
+                data = self._fetch(db, 0)
+            if len(data):
+                self._merge(data, overlap)
+            return len(data)
+
+    def _overlap(self, db: Session) -> int:
+        # En SQLite los ids se confirman en orden: no hace falta releer
+        return 0 if db.get_bind().dialect.name == "sqlite" else self.overlap
+
+    def _fetch(self, db: Session, after_id: int) -> np.ndarray:
+        """Filas (id, symptom_id, diagnosis_id, epoch) con id > after_id."""
+        connection = db.connection()
+        generated_at = _epoch_seconds(db, _diagnoses.c.generated_at)
+        blocks = []
+        while True:
+            # Por bloques con keyset sobre la clave primaria: memoria acotada
+            # sin cursores del lado del servidor
+            stmt = (
+                select(
+                    _diagnosis_symptoms.c.id,
+                    _diagnosis_symptoms.c.symptom_id,
+                    _diagnosis_symptoms.c.diagnosis_id,
+                    generated_at,
+                )
+                .join(_diagnoses, _diagnoses.c.id == _diagnosis_symptoms.c.diagnosis_id)
+                .where(_diagnosis_symptoms.c.id > after_id)
+                .order_by(_diagnosis_symptoms.c.id)
+                .limit(LOAD_BATCH_SIZE)
+            )
+            result = connection.execute(stmt)
+            try:
+                # Tuplas leídas directo del cursor DBAPI: armar un Row por fila
+                # cuesta más que la consulta cuando son millones
+                rows = result.cursor.fetchall()
+            finally:
+                result.close()
+            if not rows:
+                break
+            # fromiter sobre las tuplas aplanadas: np.array(rows) es mucho más lento
+            block = np.fromiter(chain.from_iterable(rows), dtype=np.int64,
+                                count=4 * len(rows)).reshape(-1, 4)
+            blocks.append(block)
+            after_id = int(block[-1, 0])
+            if len(rows) < LOAD_BATCH_SIZE:
+                break
+        if not blocks:
+            return np.empty((0, 4), dtype=np.int64)
+        return np.concatenate(blocks)
+
+    def _merge(self, data: np.ndarray, overlap: int = 0):
+        if data[-1, 0] > self.watermark:
+            self.watermark = int(data[-1, 0])
+            self._tail_diagnosis = int(data[-1, 2])
+        if overlap:
+            recent = np.union1d(self._recent_rows, data[:, 0])
+            self._recent_rows = recent[recent > self.watermark - overlap]
+        self.rows += len(data)
+
+        # Listas por síntoma: ordenar por (síntoma, diagnóstico) y partir
+        order = np.lexsort((data[:, 2], data[:, 1]))
+        symptoms = data[order, 1]
+        diagnoses = data[order, 2]
+        bounds = np.flatnonzero(np.diff(symptoms)) + 1
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(symptoms)]):
+            symptom_id = int(symptoms[start])
+            self._postings[symptom_id] = _union(
+                self._postings.get(symptom_id, _EMPTY), diagnoses[start:end]
+            )
+
+        # Fecha de cada diagnóstico
+        new_ids, first = np.unique(data[:, 2], return_index=True)
+        new_times = data[first, 3]
+        if not len(self._diagnosis_ids) or new_ids[0] > self._diagnosis_ids[-1]:
+            self._diagnosis_ids = np.concatenate((self._diagnosis_ids, new_ids))
+            self._generated_at = np.concatenate((self._generated_at, new_times))
+        else:
+            ids = np.concatenate((self._diagnosis_ids, new_ids))
+            times = np.concatenate((self._generated_at, new_times))
+            self._diagnosis_ids, first = np.unique(ids, return_index=True)
+            self._generated_at = times[first]
+
+    def discard(self, diagnosis_ids):
+        """Marca diagnósticos borrados; se filtran de los resultados."""
+        with self._lock:
+            self._removed.update(int(i) for i in diagnosis_ids)
+            if self._tail_diagnosis in self._removed:
+                # Se borraron las últimas filas cargadas y SQLite reutiliza
+                # esos ids: las filas nuevas quedarían bajo `watermark`
+                self._stale = True
+
+    # ---------------- Consultas ----------------
+    def search(self, symptom_ids, since: int = None, until: int = None, limit: int = None):
+        """
+        Diagnósticos que tienen TODOS los síntomas, con fecha en [since, until)
+        (segundos epoch). Retorna (total, ids) con los ids del más reciente al
+        más antiguo, recortados a `limit`.
+        """
+        symptom_ids = set(symptom_ids)
+        if not symptom_ids:
+            raise ValueError("At least one symptom is required")
+        with self._lock:
+            postings = sorted((self._postings.get(s, _EMPTY) for s in symptom_ids), key=len)
+            diagnosis_ids, generated_at = self._diagnosis_ids, self._generated_at
+            removed = list(self._removed)
+
+        # Los arreglos nunca se modifican (cada carga crea otros): se puede
+        # intersecar fuera del lock
+        result = postings[0]
+        for other in postings[1:]:
+            if not len(result):
+                break
+            if not len(other):
+                result = _EMPTY
+                break
+            positions = np.minimum(np.searchsorted(other, result), len(other) - 1)
+            result = result[other[positions] == result]
+
+        times = generated_at[np.searchsorted(diagnosis_ids, result)]
+        keep = np.ones(len(result), dtype=bool)
+        if since is not None:
+            keep &= times >= since
+        if until is not None:
+            keep &= times < until
+        if removed:
+            keep &= ~np.isin(result, removed)
+        result, times = result[keep], times[keep]
+
+        order = np.lexsort((-result, -times))  # fecha DESC, id DESC
+        if limit is not None:
+            order = order[:limit]
+        return len(result), result[order].tolist()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "symptoms": len(self._postings),
+                "diagnoses": len(self._diagnosis_ids),
+                "rows": self.rows,
+                "bytes": sum(p.nbytes for p in self._postings.values())
+                + self._diagnosis_ids.nbytes + self._generated_at.nbytes,
+            }
+
+
+# Índice único por proceso (Streamlit re-ejecuta app.py, pero no este módulo)
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_symptom_index() -> SymptomIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SymptomIndex()
+        return _index
+
+
+def find_diagnosis_ids(db: Session, symptom_ids, date_from=None, date_to=None, limit=None):
+    """Actualiza el índice con lo nuevo de la BD y lo consulta (ver SymptomIndex.search)."""
+    index = get_symptom_index()
+    index.refresh(db)
+    return index.search(symptom_ids, since=_to_epoch(date_from), until=_to_epoch(date_to),
+                        limit=limit)
+
+
+@event.listens_for(Session, "after_commit")
+def _discard_deleted(session):
+    deleted = session.info.pop(DELETED_DIAGNOSES_KEY, None)
+    if deleted and _index is not None:
+        _index.discard(deleted)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_deleted(session):
+    session.info.pop(DELETED_DIAGNOSES_KEY, None)
@@ -0,0 +1,75 @@
+# tabular_files.py
+"""
+Escritura por bloques de archivos CSV o Parquet (según la extensión), usada
+por batch_score.py y la exportación del historial. Cada bloque es un dict
+{columna: lista de valores}; en Parquet cada bloque queda como un row group,
+así que nunca hace falta tener el archivo completo en memoria.
+
+`schema` es una lista de (columna, tipo), con el tipo como alias de pyarrow
+("int64", "float64", "string", "timestamp[us]") o un pyarrow.DataType. Con
+schema el archivo se crea al abrir el escritor, con sus columnas aunque no se
+escriba ninguna fila, y en Parquet los tipos no dependen del primer bloque (una
+columna toda vacía en ese bloque no queda como tipo null).
+"""
+import csv
+
+
+def is_parquet(path: str) -> bool:
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("Se requiere pyarrow para leer/escribir Parquet (pip install pyarrow).")
+    return pyarrow
+
+
+class CsvResultWriter:
+    def __init__(self, path: str, schema: list = None):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._header_written = False
+        if schema is not None:
+            self._writer.writerow(name for name, _ in schema)
+            self._header_written = True
+
+    def write(self, columns: dict):
+        if not self._header_written:
+            self._writer.writerow(columns.keys())
+            self._header_written = True
+        self._writer.writerows(zip(*columns.values()))
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetResultWriter:
+    def __init__(self, path: str, schema: list = None):
+        self._pa = import_pyarrow()
+        self._path = path
+        self._writer = None
+        self._schema = None
+        if schema is not None:
+            self._schema = self._pa.schema([
+                (name, self._pa.type_for_alias(kind) if isinstance(kind, str) else kind)
+                for name, kind in schema
+            ])
+            self._writer = self._pa.parquet.ParquetWriter(self._path, self._schema)
+
+    def write(self, columns: dict):
+        table = self._pa.table(columns, schema=self._schema)
+        if self._writer is None:
+            self._writer = self._pa.parquet.ParquetWriter(self._path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def open_result_writer(path: str, schema: list = None):
+    writer = ParquetResultWriter if is_parquet(path) else CsvResultWriter
+    return writer(path, schema)
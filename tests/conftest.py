@@ -0,0 +1,13 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+# Los módulos viven en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Nunca tocar meddiag.db: cada corrida usa una base SQLite temporal
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+)
+os.environ.setdefault("INFERENCE_WORKERS", "0")
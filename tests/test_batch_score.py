@@ -0,0 +1,87 @@
+# tests/test_batch_score.py
+import csv
+
+import pytest
+
+import batch_score
+from features import FEATURE_DEFAULTS
+
+# DiabetesPedigreeFunction al final: es la celda que le falta a la fila corta
+HEADER = ["patient_id", "Pregnancies", "Glucose", "BloodPressure", "SkinThickness",
+          "Insulin", "BMI", "Age", "DiabetesPedigreeFunction"]
+
+
+def _write_csv(path, rows, header=HEADER):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_ragged_csv_row_only_loses_its_own_cells(tmp_path):
+    path = _write_csv(tmp_path / "in.csv", [
+        ["a", 1, 150, 80, 20, 80, 31, 50, 1.0],
+        ["b", 2, 90, 70, 20, 80, 22, 30],  # sin DiabetesPedigreeFunction
+        ["c", 3, 120, 75, 20, 80, 27, 40, 1.0],
+    ])
+    columns = next(batch_score.iter_input_chunks(path))
+    X = batch_score.build_feature_block("DIAB", columns, 3)
+
+    dpf = batch_score.FEATURE_ORDERS["DIAB"].index("DiabetesPedigreeFunction")
+    assert X[0, dpf] == 1.0
+    assert X[1, dpf] == FEATURE_DEFAULTS["DIAB"]["DiabetesPedigreeFunction"]
+    assert X[2, dpf] == 1.0
+    assert columns["patient_id"] == ["a", "b", "c"]
+
+
+def test_non_numeric_cell_reports_column_and_row(tmp_path):
+    path = _write_csv(tmp_path / "in.csv", [
+        ["a", 1, 150, 80, 20, 80, 31, 50, 1.0],
+        ["b", 2, 150, 80, 20, 80, 31, 50, 1.0],
+        ["c", 3, "alta", 70, 20, 80, 22, 30, 1.0],
+    ])
+    # Con bloques de 2 filas la fila mala es la primera del segundo bloque
+    with pytest.raises(ValueError, match=r"'alta' en la columna 'Glucose', fila 3"):
+        batch_score.run("DIAB", path, str(tmp_path / "out.csv"), chunk_size=2, workers=0)
+
+
+def test_missing_id_column_fails_before_creating_output(tmp_path):
+    path = _write_csv(tmp_path / "in.csv", [["a", 1, 150, 80, 20, 80, 31, 50, 1.0]])
+    output = tmp_path / "out.csv"
+    with pytest.raises(ValueError, match="--id-column"):
+        batch_score.run("DIAB", path, str(output), id_column="nope", workers=0)
+    assert not output.exists()
+
+
+def test_parquet_output_without_rows_has_columns(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet  # noqa: F401
+
+    path = _write_csv(tmp_path / "in.csv", [])
+    output = tmp_path / "out.parquet"
+    assert batch_score.run("DIAB", path, str(output), id_column="patient_id", workers=0) == 0
+    table = pa.parquet.read_table(output)
+    assert table.num_rows == 0
+    assert table.column_names == ["row", "patient_id", "prediction", "probability"]
+
+
+def test_parquet_id_column_null_in_first_chunk(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet  # noqa: F401
+
+    features = HEADER[1:]
+    table = pa.table({
+        "patient_id": pa.array([None, None, "c", "d"], type=pa.string()),
+        **{name: [1.0, 2.0, 3.0, 4.0] for name in features},
+    })
+    source = tmp_path / "in.parquet"
+    pa.parquet.write_table(table, source)
+    output = tmp_path / "out.parquet"
+
+    total = batch_score.run("DIAB", str(source), str(output), chunk_size=2,
+                            id_column="patient_id", workers=0)
+    result = pa.parquet.read_table(output)
+    assert total == 4
+    assert result.column("patient_id").to_pylist() == [None, None, "c", "d"]
+    assert result.schema.field("patient_id").type == pa.string()
@@ -0,0 +1,56 @@
+# tests/test_history_export.py
+import shlex
+from datetime import datetime
+
+import pytest
+
+import crud
+from database import SessionLocal
+from history_export import ExportTooLarge, cli_command, export_history
+from migrations import upgrade
+
+
+@pytest.fixture(scope="module")
+def patient_without_email():
+    upgrade()
+    with SessionLocal() as db:
+        user_id = crud.get_or_create_user(db, name="Export Test").id
+        crud.bulk_create_diagnoses(db, [
+            crud.DiagnosisRecord(user_id, "PARK", 0.5, "d", generated_at=datetime(2026, 3, i + 1))
+            for i in range(5)
+        ])
+        db.commit()
+    return "Export Test"
+
+
+def test_export_stops_over_max_rows(tmp_path, patient_without_email):
+    with SessionLocal() as db:
+        with pytest.raises(ExportTooLarge):
+            export_history(db, str(tmp_path / "out.csv"), batch_size=2, max_rows=3,
+                           name=patient_without_email)
+        assert export_history(db, str(tmp_path / "out.csv"), max_rows=5,
+                              name=patient_without_email) == 5
+
+
+def test_parquet_export_keeps_types_when_emails_are_empty(tmp_path, patient_without_email):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet  # noqa: F401
+
+    output = tmp_path / "out.parquet"
+    with SessionLocal() as db:
+        export_history(db, str(output), batch_size=2, name=patient_without_email)
+        export_history(db, str(tmp_path / "empty.parquet"), name="nadie")
+    table = pa.parquet.read_table(output)
+    assert table.num_rows == 5
+    assert table.schema.field("email").type == pa.string()
+    assert pa.parquet.read_table(tmp_path / "empty.parquet").column_names == \
+        table.column_names
+
+
+def test_cli_command_repeats_the_filters():
+    command = cli_command("h.csv", name="Ana María", disease_code="HEART",
+                          date_from=datetime(2026, 1, 1), date_to=datetime(2026, 2, 1))
+    assert shlex.split(command) == [
+        "python", "history_export.py", "-o", "h.csv", "--name", "Ana María",
+        "--disease", "HEART", "--date-from", "2026-01-01", "--date-to", "2026-01-31",
+    ]
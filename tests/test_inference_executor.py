@@ -0,0 +1,51 @@
+# tests/test_inference_executor.py
+import threading
+import time
+
+import inference_executor
+from features import FEATURE_DEFAULTS, FEATURE_ORDERS
+from inference_executor import InferenceExecutor
+
+
+def _default_rows() -> dict:
+    return {
+        code: [FEATURE_DEFAULTS[code].get(feature, 1.0) for feature in order]
+        for code, order in FEATURE_ORDERS.items()
+    }
+
+
+def test_panel_scores_models_concurrently_in_process(monkeypatch):
+    intervals = {}
+    all_started = threading.Barrier(len(FEATURE_ORDERS), timeout=5)
+
+    def slow_score_one(disease_code, row, use_cache):
+        started = time.perf_counter()
+        # Solo pasa si los tres modelos están corriendo al mismo tiempo
+        all_started.wait()
+        time.sleep(0.05)
+        intervals[disease_code] = (started, time.perf_counter())
+        return 0, 0.0, "hash"
+
+    monkeypatch.setattr(inference_executor, "_score_one", slow_score_one)
+    executor = InferenceExecutor(workers=0)
+    try:
+        futures = executor.submit_panel(_default_rows())
+        results = {code: future.result(timeout=5) for code, future in futures.items()}
+    finally:
+        executor.shutdown()
+
+    assert set(results) == set(FEATURE_ORDERS)
+    latest_start = max(start for start, _ in intervals.values())
+    earliest_end = min(end for _, end in intervals.values())
+    assert latest_start < earliest_end
+
+
+def test_panel_matches_single_predictions():
+    executor = InferenceExecutor(workers=0)
+    rows = _default_rows()
+    try:
+        panel = {code: f.result() for code, f in executor.submit_panel(rows).items()}
+        single = {code: executor.submit_one(code, row).result() for code, row in rows.items()}
+    finally:
+        executor.shutdown()
+    assert panel == single
@@ -0,0 +1,54 @@
+# tests/test_inference_server.py
+import json
+import socket
+import threading
+
+import pytest
+
+import inference_server
+
+
+@pytest.fixture(scope="module")
+def server_address():
+    server = inference_server.create_server(port=0, max_wait_ms=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def _post(address, headers: dict, body: bytes = b"", path: str = "/predict/DIAB"):
+    """POST con cabeceras crudas (http.client no deja enviar un Content-Length inválido)."""
+    lines = [f"POST {path} HTTP/1.1", "Host: test", "Connection: close"] + [f"{k}: {v}" for k, v in headers.items()]
+    with socket.create_connection(address, timeout=5) as sock:
+        sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        response = b""
+        while chunk := sock.recv(65536):
+            response += chunk
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+@pytest.mark.parametrize("value", ["abc", "-5", "1.5"])
+def test_invalid_content_length_is_a_400(server_address, value):
+    status, payload = _post(server_address, {"Content-Length": value})
+    assert status == 400
+    assert "Content-Length" in payload["error"]
+
+
+def test_oversized_body_is_rejected_before_reading(server_address):
+    # Se anuncia un cuerpo enorme sin enviarlo: la respuesta llega igual
+    status, payload = _post(server_address,
+                            {"Content-Length": inference_server.MAX_BODY_BYTES + 1})
+    assert status == 413
+    assert "larger than" in payload["error"]
+
+
+def test_valid_request_still_scores(server_address):
+    body = json.dumps({"features": {"Glucose": 150, "BloodPressure": 80, "BMI": 31,
+                                    "Age": 50}}).encode()
+    status, payload = _post(server_address, {"Content-Length": len(body)}, body)
+    assert status == 200
+    assert payload["disease_code"] == "DIAB"
+    assert payload["prediction"] in (0, 1)
@@ -0,0 +1,113 @@
+# tests/test_rescore.py
+import pickle
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+import crud
+import rescore
+from database import SessionLocal
+from migrations import upgrade
+from model_registry import MODELS_DIR, MODEL_FILES
+from models import DailyDiseaseStats, DailyProbabilityHistogram, Diagnosis, DiagnosisDetail
+from scoring import predict_with_proba
+from translations import translations
+
+
+@pytest.fixture(scope="module")
+def heart_model():
+    upgrade()
+    with open(f"{MODELS_DIR}/{MODEL_FILES['HEART']}", "rb") as f:
+        return pickle.load(f)
+
+
+def _stats(db):
+    counts = db.execute(
+        select(DailyDiseaseStats.day, DailyDiseaseStats.disease_id, DailyDiseaseStats.status,
+               DailyDiseaseStats.diagnoses_count, DailyDiseaseStats.probability_sum_e4)
+        .where(DailyDiseaseStats.diagnoses_count != 0)
+    ).all()
+    histogram = db.execute(
+        select(DailyProbabilityHistogram.day, DailyProbabilityHistogram.disease_id,
+               DailyProbabilityHistogram.bucket, DailyProbabilityHistogram.diagnoses_count)
+        .where(DailyProbabilityHistogram.diagnoses_count != 0)
+    ).all()
+    return sorted(map(tuple, counts)), sorted(map(tuple, histogram))
+
+
+def test_rescore_skips_unchanged_rows_and_rewrites_descriptions(heart_model, monkeypatch):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(40, 13)) * 20 + 100
+    labels, probas = predict_with_proba(heart_model, X)
+    es, en = translations["es"], translations["en"]
+
+    # Mitad con la probabilidad que ya da el modelo (sin cambios), mitad con la
+    # etiqueta contraria; descripciones en ambos idiomas y una escrita a mano
+    records = []
+    for i, (row, label, proba) in enumerate(zip(X, labels, probas)):
+        stale = i % 2 == 1
+        stored_label = 1 - label if stale else label
+        t = es if i % 4 < 2 else en
+        description = t["positive_heart" if stored_label == 1 else "negative_heart"]
+        if i == 39:
+            description = "Nota del médico"
+        records.append(crud.DiagnosisRecord(
+            user=None, disease_code="HEART",
+            probability=(1 - proba) if stale else proba,
+            description=f"{es['negative_diabetes']}\n{description}",
+            generated_at=datetime(2026, 1, 1) + timedelta(hours=i),
+            features=row, model_hash="old",
+        ))
+    with SessionLocal() as db:
+        user_id = crud.get_or_create_user(db, name="Rescore Test").id
+        records = [r._replace(user=user_id) for r in records]
+        crud.bulk_create_diagnoses(db, records)
+        db.commit()
+
+    monkeypatch.setattr(rescore, "get_model_with_hash", lambda code: (heart_model, "new"))
+    total = rescore.run("HEART", chunk_size=7)
+    assert total == 40
+
+    with SessionLocal() as db:
+        incremental = _stats(db)
+        crud.rebuild_daily_stats(db)
+        db.flush()
+        assert _stats(db) == incremental
+        db.rollback()
+
+        rows = db.execute(
+            select(DiagnosisDetail.probability, DiagnosisDetail.model_hash,
+                   Diagnosis.final_description)
+            .join(Diagnosis, Diagnosis.id == DiagnosisDetail.diagnosis_id)
+            .where(Diagnosis.user_id == user_id)
+            .order_by(Diagnosis.generated_at)
+        ).all()
+
+    for i, ((probability, model_hash, description), label, proba) in enumerate(
+            zip(rows, labels, probas)):
+        assert model_hash == "new"
+        assert float(probability) == round(float(proba), 4)
+        t = es if i % 4 < 2 else en
+        expected = "Nota del médico" if i == 39 else t[
+            "positive_heart" if label == 1 else "negative_heart"]
+        # La línea de otra enfermedad no cambia
+        assert description == f"{es['negative_diabetes']}\n{expected}"
+
+
+def test_update_detail_probabilities_ignores_equal_values(heart_model):
+    with SessionLocal() as db:
+        user = crud.get_or_create_user(db, name="Rescore Equal")
+        [diagnosis_id] = crud.bulk_create_diagnoses(db, [crud.DiagnosisRecord(
+            user.id, "HEART", 0.1234, "d", features=[1.0] * 13, model_hash="old")])
+        detail_id = db.execute(
+            select(DiagnosisDetail.id).where(DiagnosisDetail.diagnosis_id == diagnosis_id)
+        ).scalar_one()
+        before = _stats(db)
+
+        # 0.12341 queda en 0.1234 a la escala de la columna: no es un cambio
+        assert crud.update_detail_probabilities(db, {detail_id: 0.12341}, "new") == 0
+        assert _stats(db) == before
+        assert db.get(DiagnosisDetail, detail_id).model_hash == "new"
+        db.rollback()
@@ -0,0 +1,254 @@
+# tracing.py
+"""
+Instrumentación ligera del camino caliente (arranque, predicción, guardado).
+
+Con MEDDIAG_TRACING=1 cada etapa envuelta con `span(...)` o `@traced(...)` y
+cada sentencia SQL (eventos de SQLAlchemy sobre el engine de database.py)
+suma su duración a un histograma en memoria. Los histogramas se exponen en
+formato de texto de Prometheus:
+
+- MEDDIAG_METRICS_PORT: servidor HTTP local con GET /metrics.
+- MEDDIAG_METRICS_FILE: archivo que se reescribe cada
+  MEDDIAG_METRICS_INTERVAL segundos y al salir (para node_exporter
+  textfile o para revisarlo a mano).
+
+Desactivado (por defecto) `span()` retorna siempre el mismo context manager
+vacío, `@traced` deja la función sin envolver y no se registra ningún evento
+en el engine: el costo es una llamada a función por etapa.
+"""
+import atexit
+import bisect
+import contextlib
+import functools
+import os
+import threading
+import time
+
+from sqlalchemy import event
+
+from database import engine, get_setting
+
+ENABLED = str(get_setting("MEDDIAG_TRACING", "false")).strip().lower() in ("1", "true", "yes", "on")
+METRICS_PORT = int(get_setting("MEDDIAG_METRICS_PORT", 0))
+METRICS_FILE = get_setting("MEDDIAG_METRICS_FILE")
+METRICS_INTERVAL = float(get_setting("MEDDIAG_METRICS_INTERVAL", 15))
+
+# Límites superiores de los buckets, en segundos (de 0.5 ms a 10 s)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SPAN_METRIC = "meddiag_span_seconds"
+SQL_METRIC = "meddiag_sql_seconds"
+_HELP = {
+    SPAN_METRIC: "Duración de cada etapa instrumentada.",
+    SQL_METRIC: "Duración de cada sentencia SQL por tipo de operación.",
+}
+
+
+class Histogram:
+    """Conteos por bucket (no acumulados), suma y total de observaciones."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}  # (métrica, labels ordenados) -> Histogram
+        self._lock = threading.Lock()
+
+    def observe(self, metric: str, seconds: float, labels: dict):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """Histogramas en el formato de texto de Prometheus (buckets acumulados)."""
+        with self._lock:
+            items = sorted(
+                (key, list(h.counts), h.sum, h.count) for key, h in self._histograms.items()
+            )
+        lines = []
+        current_metric = None
+        for (metric, labels), counts, total, count in items:
+            if metric != current_metric:
+                lines.append(f"# HELP {metric} {_HELP.get(metric, metric)}")
+                lines.append(f"# TYPE {metric} histogram")
+                current_metric = metric
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+            prefix = label_text + "," if label_text else ""
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{label_text}}} {total:.9g}")
+            lines.append(f"{metric}_count{{{label_text}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = MetricsRegistry()
+
+
+# ------------------------------------------------------------
+# SPANS
+# ------------------------------------------------------------
+
+class _Span:
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name: str, labels: dict):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        labels = dict(self.labels, span=self.name)
+        if exc_type is not None:
+            labels["error"] = exc_type.__name__
+        metrics.observe(SPAN_METRIC, time.perf_counter() - self.started, labels)
+        return False
+
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def span(name: str, **labels):
+    """`with span("db.commit"):` mide el bloque (si el tracing está activo)."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, labels)
+
+
+def traced(name: str = None, **labels):
+    """Decorador equivalente a envolver todo el cuerpo de la función en span()."""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(span_name, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ------------------------------------------------------------
+# SENTENCIAS SQL
+# ------------------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("tracing_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["tracing_started"].pop()
+    # Solo la operación (SELECT, INSERT, ...): el texto completo dispararía la
+    # cantidad de series
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    metrics.observe(SQL_METRIC, time.perf_counter() - started,
+                    {"operation": operation, "executemany": str(bool(executemany)).lower()})
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("tracing_started"):
+        conn.info["tracing_started"].pop()
+
+
+def instrument_engine(target_engine):
+    """Registra la duración de cada sentencia que ejecute el engine."""
+    if event.contains(target_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(target_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(target_engine, "handle_error", _handle_error)
+
+
+# ------------------------------------------------------------
+# EXPORTACIÓN
+# ------------------------------------------------------------
+
+def write_metrics(path: str):
+    """Escribe las métricas en path de forma atómica."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(metrics.render())
+    os.replace(tmp_path, path)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    """Sirve GET /metrics en un hilo aparte. Retorna el ThreadingHTTPServer."""
+    # Imports diferidos: con el tracing desactivado no se pagan en el arranque
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def _export_loop(path: str, interval: float):
+    while True:
+        time.sleep(interval)
+        write_metrics(path)
+
+
+def _start_exporters():
+    import multiprocessing
+
+    # Solo el proceso principal: los workers de inference_executor (spawn)
+    # importan este módulo de nuevo y chocarían por el puerto y el archivo. Se
+    # mira el nombre y no parent_process(), que aún es None mientras el worker
+    # importa los módulos de su función inicial.
+    if multiprocessing.current_process().name != "MainProcess":
+        return
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    if METRICS_FILE:
+        threading.Thread(target=_export_loop, args=(METRICS_FILE, METRICS_INTERVAL),
+                         name="metrics-file", daemon=True).start()
+        atexit.register(write_metrics, METRICS_FILE)
+
+
+# Se ejecuta una sola vez por proceso (Streamlit re-ejecuta app.py, no este módulo)
+if ENABLED:
+    instrument_engine(engine)
+    _start_exporters()
@@ -69,10 +69,56 @@ translations = {
         "delete_intro": "Elimina un diagnóstico del historial",
         "history_filter_name": "Filtrar por nombre (opcional)",
         "history_filter_email": "Filtrar por correo (opcional)",
+        "history_filter_disease": "Enfermedad",
+        "history_filter_status": "Estado",
+        "history_filter_date_from": "Desde",
+        "history_filter_date_to": "Hasta",
+        "history_filter_all": "Todas",
         "delete_filter_id": "ID de diagnóstico para eliminar",
         "history_show_button": "Mostrar historial",
         "delete_button": "Eliminar diagnóstico",
         "history_empty": "Aún no hay diagnósticos registrados en la base de datos.",
+        "history_prev": "← Anterior",
+        "history_next": "Siguiente →",
+        "history_page": "Página",
+        "history_export_format": "Formato de exportación",
+        "history_export_button": "Preparar exportación completa",
+        "history_export_download": "Descargar historial",
+        "history_export_done": "filas exportadas con los filtros actuales.",
+        "history_export_too_large": "La exportación supera el límite de descarga desde la app "
+                                    "({rows} filas o {mb} MB). Para exportarla completa, ejecute:",
+        "full_panel": "Panel Completo",
+        "title_full_panel": "Panel completo: diabetes, cardíaco y Parkinson",
+        "full_panel_intro": "Un solo formulario para las tres enfermedades. Los tres modelos se evalúan a la vez y el resultado se guarda como un único diagnóstico.",
+        "button_full_panel": "Resultado del panel completo",
+        "symptoms": "Síntomas",
+        "symptoms_intro": "Busca diagnósticos por combinación de síntomas y administra el catálogo de síntomas.",
+        "symptoms_search": "Buscar por síntomas",
+        "symptoms_search_select": "Diagnósticos que tengan todos estos síntomas",
+        "symptoms_search_days": "Últimos N días",
+        "symptoms_search_limit": "Número de registros",
+        "symptoms_search_button": "Buscar",
+        "symptoms_search_required": "Selecciona al menos un síntoma.",
+        "symptoms_search_total": "diagnósticos encontrados.",
+        "symptoms_catalog": "Catálogo de síntomas",
+        "symptoms_empty": "Aún no hay síntomas registrados.",
+        "symptoms_name": "Nombre",
+        "symptoms_description": "Descripción",
+        "symptoms_add_button": "Agregar síntoma",
+        "symptoms_edit_select": "Síntoma",
+        "symptoms_new_name": "Nuevo nombre",
+        "symptoms_edit_button": "Guardar cambios",
+        "symptoms_delete_button": "Eliminar síntoma",
+        "dashboard": "Tablero",
+        "dashboard_intro": "Volumen de diagnósticos y distribución del riesgo por día (desde las estadísticas agregadas).",
+        "dashboard_empty": "No hay diagnósticos en el rango seleccionado.",
+        "dashboard_total": "Diagnósticos",
+        "dashboard_avg_probability": "Probabilidad promedio",
+        "dashboard_p50": "Mediana (p50)",
+        "dashboard_p90": "Percentil 90",
+        "dashboard_per_day": "Diagnósticos por día y enfermedad",
+        "dashboard_by_disease": "Riesgo por enfermedad",
+        "dashboard_by_status": "Diagnósticos por estado",
     },
     #+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
     "en": {
@@ -145,9 +191,55 @@ translations = {
         "delete_intro": "Delete a diagnosis from the history",
         "history_filter_name": "Filter by name (optional)",
         "history_filter_email": "Filter by email (optional)",
+        "history_filter_disease": "Disease",
+        "history_filter_status": "Status",
+        "history_filter_date_from": "From",
+        "history_filter_date_to": "To",
+        "history_filter_all": "All",
         "delete_filter_id": "Diagnostic ID to delete",
         "history_show_button": "Show history",
         "delete_button": "Remove diagnosis",
         "history_empty": "No diagnoses have been stored yet.",
+        "history_prev": "← Previous",
+        "history_next": "Next →",
+        "history_page": "Page",
+        "history_export_format": "Export format",
+        "history_export_button": "Prepare full export",
+        "history_export_download": "Download history",
+        "history_export_done": "rows exported with the current filters.",
+        "history_export_too_large": "The export exceeds the in-app download limit "
+                                    "({rows} rows or {mb} MB). To export it in full, run:",
+        "full_panel": "Full Panel",
+        "title_full_panel": "Full panel: diabetes, heart and Parkinson's",
+        "full_panel_intro": "A single form for the three diseases. The three models are scored together and the result is saved as a single diagnosis.",
+        "button_full_panel": "Full Panel Result",
+        "symptoms": "Symptoms",
+        "symptoms_intro": "Search diagnoses by a combination of symptoms and manage the symptom catalog.",
+        "symptoms_search": "Search by symptoms",
+        "symptoms_search_select": "Diagnoses that have all of these symptoms",
+        "symptoms_search_days": "Last N days",
+        "symptoms_search_limit": "Number of records",
+        "symptoms_search_button": "Search",
+        "symptoms_search_required": "Select at least one symptom.",
+        "symptoms_search_total": "diagnoses found.",
+        "symptoms_catalog": "Symptom catalog",
+        "symptoms_empty": "There are no symptoms registered yet.",
+        "symptoms_name": "Name",
+        "symptoms_description": "Description",
+        "symptoms_add_button": "Add symptom",
+        "symptoms_edit_select": "Symptom",
+        "symptoms_new_name": "New name",
+        "symptoms_edit_button": "Save changes",
+        "symptoms_delete_button": "Delete symptom",
+        "dashboard": "Dashboard",
+        "dashboard_intro": "Diagnosis volume and risk distribution per day (from the pre-aggregated statistics).",
+        "dashboard_empty": "There are no diagnoses in the selected range.",
+        "dashboard_total": "Diagnoses",
+        "dashboard_avg_probability": "Average probability",
+        "dashboard_p50": "Median (p50)",
+        "dashboard_p90": "90th percentile",
+        "dashboard_per_day": "Diagnoses per day and disease",
+        "dashboard_by_disease": "Risk by disease",
+        "dashboard_by_status": "Diagnoses by status",
     }
 }